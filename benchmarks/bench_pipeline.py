@@ -0,0 +1,230 @@
+""" """
+from __future__ import annotations
+
+import argparse
+import gc
+import importlib
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable
+
+from qgis.core import QgsApplication, QgsCoordinateReferenceSystem, QgsCoordinateTransformContext
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+# recorded responses in Overpass JSON format, included by default
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+STAGES = ["convert", "features", "write", "stream"]
+# British National Grid - the synthetic fixtures sit over London
+EPSG_CODE = 27700
+ORIGIN_LNG = -0.13
+ORIGIN_LAT = 51.5
+DEGREE_SPACING = 0.001
+
+
+def synthetic_osm_json(n_edges: int) -> str:
+    """ """
+    # an Overpass style response for a street grid - one two-node way per edge
+    side = 2
+    while 2 * side * (side - 1) < n_edges:
+        side += 1
+    elements: list[dict[str, Any]] = []
+    for x_idx in range(side):
+        for y_idx in range(side):
+            elements.append(
+                {
+                    "type": "node",
+                    "id": x_idx * side + y_idx + 1,
+                    "lat": ORIGIN_LAT + y_idx * DEGREE_SPACING,
+                    "lon": ORIGIN_LNG + x_idx * DEGREE_SPACING,
+                }
+            )
+    way_id = 0
+    for x_idx in range(side):
+        for y_idx in range(side):
+            for nb_x, nb_y in [(x_idx + 1, y_idx), (x_idx, y_idx + 1)]:
+                if nb_x >= side or nb_y >= side or way_id >= n_edges:
+                    continue
+                way_id += 1
+                elements.append(
+                    {
+                        "type": "way",
+                        "id": way_id,
+                        "nodes": [x_idx * side + y_idx + 1, nb_x * side + nb_y + 1],
+                        "tags": {"highway": "residential", "name": f"street {way_id}"},
+                    }
+                )
+    return json.dumps({"version": 0.6, "elements": elements})
+
+
+def run_stages(
+    osm_json: str, simplify: bool, out_path: str, crs: QgsCoordinateReferenceSystem, measure: Callable
+) -> tuple[int, dict[str, dict[str, float]]]:
+    """ """
+    # the same stages as OsmTab.process_import, minus the Overpass request
+    graph_store = importlib.import_module("cityseer-qgis.graph_store")
+    osm_graph = importlib.import_module("cityseer-qgis.osm_graph")
+    writers = importlib.import_module("cityseer-qgis.writers")
+    results: dict[str, dict[str, float]] = {}
+
+    def convert():
+        nx_multigraph = osm_graph.nx_from_osm_json(osm_json, EPSG_CODE)
+        if simplify:
+            return osm_graph.nx_simplify(nx_multigraph)
+        return osm_graph.nx_simple_geoms(nx_multigraph)
+
+    nx_multigraph, results["convert"] = measure(convert)
+    fields = writers.network_edge_fields()
+    features, results["features"] = measure(lambda: list(writers.network_edge_features(nx_multigraph, fields)))
+
+    def write():
+        edge_writer = writers.NetworkEdgeWriter(out_path, "osm_network", crs, QgsCoordinateTransformContext())
+        for chunk_start in range(0, len(features), edge_writer.chunk_size):
+            edge_writer.add_chunk(features[chunk_start : chunk_start + edge_writer.chunk_size])
+        edge_writer.close()
+
+    _, results["write"] = measure(write)
+    n_features = len(features)
+    features.clear()
+
+    def stream():
+        # the plugin's path - batches converted as written, with the graph sidecar, releasing edge data
+        edge_writer = writers.NetworkEdgeWriter(
+            out_path.replace(".gpkg", "_stream.gpkg"), "osm_network", crs, QgsCoordinateTransformContext()
+        )
+        arrays_writer = graph_store.GraphArraysWriter()
+        edge_writer.write_graph(nx_multigraph, arrays_writer=arrays_writer, release=True)
+        edge_writer.close()
+
+    _, results["stream"] = measure(stream)
+    return n_features, results
+
+
+def measure_time(func: Callable) -> tuple[Any, dict[str, float]]:
+    """ """
+    gc.collect()
+    start = time.perf_counter()
+    result = func()
+    return result, {"seconds": time.perf_counter() - start}
+
+
+def measure_memory(func: Callable) -> tuple[Any, dict[str, float]]:
+    """ """
+    # a separate pass because tracing allocations distorts the timings
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = func()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, {"peak_mb": peak_bytes / 1024**2}
+
+
+def benchmark(osm_json: str, simplify: bool, repeats: int, temp_dir: str, crs: QgsCoordinateReferenceSystem) -> dict:
+    """ """
+    best: dict[str, float] = {stage: float("inf") for stage in STAGES}
+    n_edges = 0
+    for repeat in range(repeats):
+        n_edges, timings = run_stages(osm_json, simplify, f"{temp_dir}/time_{repeat}.gpkg", crs, measure_time)
+        for stage in STAGES:
+            best[stage] = min(best[stage], timings[stage]["seconds"])
+    _, memory = run_stages(osm_json, simplify, f"{temp_dir}/memory.gpkg", crs, measure_memory)
+    return {
+        "edges": n_edges,
+        "stages": {
+            stage: {
+                "seconds": best[stage],
+                "edges_per_second": n_edges / best[stage] if best[stage] > 0 else float("inf"),
+                "peak_mb": memory[stage]["peak_mb"],
+            }
+            for stage in STAGES
+        },
+    }
+
+
+def check_regressions(results: dict[str, dict], baseline: dict[str, dict], tolerance: float) -> list[str]:
+    """ """
+    regressions: list[str] = []
+    for label, result in results.items():
+        if label not in baseline:
+            continue
+        for stage in STAGES:
+            base_stage = baseline[label]["stages"].get(stage)
+            if base_stage is None:
+                continue
+            stage_result = result["stages"][stage]
+            if stage_result["edges_per_second"] < base_stage["edges_per_second"] * (1 - tolerance):
+                regressions.append(
+                    f"{label} {stage}: {stage_result['edges_per_second']:.0f} edges/s "
+                    f"vs baseline {base_stage['edges_per_second']:.0f}"
+                )
+            if stage_result["peak_mb"] > base_stage["peak_mb"] * (1 + tolerance):
+                regressions.append(
+                    f"{label} {stage}: {stage_result['peak_mb']:.1f} MB peak vs baseline {base_stage['peak_mb']:.1f}"
+                )
+    return regressions
+
+
+def main() -> None:
+    """ """
+    parser = argparse.ArgumentParser(description="Headless benchmarks for the OSM import and write pipeline.")
+    parser.add_argument("--edges", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument(
+        "--fixtures",
+        type=Path,
+        nargs="*",
+        default=sorted(FIXTURES_DIR.glob("*.json")),
+        help="Overpass JSON responses to include, defaults to those in benchmarks/fixtures.",
+    )
+    parser.add_argument("--simplify", action="store_true", help="Include graph simplification in the conversion.")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed fraction of slowdown or growth.")
+    args = parser.parse_args()
+    # headless QGIS
+    QgsApplication.setPrefixPath(os.environ.get("QGIS_PREFIX_PATH", "/usr"), True)
+    qgs = QgsApplication([], False)
+    qgs.initQgis()
+    crs = QgsCoordinateReferenceSystem(f"EPSG:{EPSG_CODE}")
+    # offline inputs only - synthetic grids by size and recorded Overpass responses by name
+    # fixtures are projected to the same CRS as the grids - distortion away from it does not affect throughput
+    inputs: list[tuple[str, Callable[[], str]]] = [
+        (f"synthetic_{n_edges}", lambda n_edges=n_edges: synthetic_osm_json(n_edges)) for n_edges in args.edges
+    ]
+    inputs += [(f"fixture_{path.stem}", path.read_text) for path in args.fixtures]
+    results: dict[str, dict] = {}
+    print(f"{'input':>24} {'stage':>9} {'edges':>9} {'seconds':>9} {'edges/s':>11} {'peak MB':>9}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for label, load_input in inputs:
+            results[label] = benchmark(load_input(), args.simplify, args.repeats, temp_dir, crs)
+            for stage, stage_result in results[label]["stages"].items():
+                print(
+                    f"{label:>24} {stage:>9} {results[label]['edges']:>9} {stage_result['seconds']:>9.3f} "
+                    f"{stage_result['edges_per_second']:>11.0f} {stage_result['peak_mb']:>9.1f}"
+                )
+    qgs.exitQgis()
+    if args.save_baseline:
+        baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        baseline.update(results)
+        args.baseline.write_text(json.dumps(baseline, indent=2))
+        print(f"Baseline written to {args.baseline}")
+        return
+    if not args.baseline.exists():
+        sys.exit(f"No baseline at {args.baseline} - run with --save-baseline on the reference machine.")
+    regressions = check_regressions(results, json.loads(args.baseline.read_text()), args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
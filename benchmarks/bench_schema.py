@@ -0,0 +1,108 @@
+""" """
+from __future__ import annotations
+
+import argparse
+import importlib
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+from qgis.core import QgsApplication, QgsCoordinateReferenceSystem, QgsCoordinateTransformContext
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+graph_store = importlib.import_module("cityseer-qgis.graph_store")
+writers = importlib.import_module("cityseer-qgis.writers")
+synthetic_grid_graph = importlib.import_module("bench_writers").synthetic_grid_graph
+
+LAYER_NAME = "osm_network"
+N_LOOKUPS = 1000
+
+
+def write_layout(
+    n_edges: int,
+    out_path: str,
+    compact: bool,
+    crs: QgsCoordinateReferenceSystem,
+    transform_context: QgsCoordinateTransformContext,
+) -> list[Any]:
+    """ """
+    # the edges and node layer as the plugin writes them - returns the node keys as stored in start_nd
+    nx_multigraph = synthetic_grid_graph(n_edges)
+    arrays_writer = graph_store.GraphArraysWriter()
+    writers.write_network_edges(
+        nx_multigraph, out_path, LAYER_NAME, crs, transform_context, arrays_writer=arrays_writer, compact=compact
+    )
+    node_keys, node_xys, degrees = arrays_writer.node_table()
+    writers.write_network_nodes(
+        node_keys, node_xys, degrees, out_path, LAYER_NAME, crs, transform_context, compact=compact
+    )
+    if compact:
+        return list(range(len(node_keys)))
+    return node_keys.tolist()
+
+
+def best_time(func: Callable[[], Any], repeats: int) -> float:
+    """ """
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def query_timings(out_path: str, node_keys: list[Any], compact: bool, repeats: int) -> dict[str, float]:
+    """ """
+    # plain SQLite, so that the timings reflect the storage rather than the QGIS providers
+    nodes_name = writers.nodes_layer_name(LAYER_NAME)
+    join_column = "node_id" if compact else "node_key"
+    sample_keys = random.Random(0).sample(node_keys, min(N_LOOKUPS, len(node_keys)))
+    connection = sqlite3.connect(out_path)
+    try:
+
+        def lookups():
+            for node_key in sample_keys:
+                connection.execute(f"SELECT fid FROM {LAYER_NAME} WHERE start_nd = ?", (node_key,)).fetchall()
+
+        def join():
+            connection.execute(
+                f"SELECT count(*) FROM {LAYER_NAME} AS edges "
+                f"JOIN {nodes_name} AS nodes ON edges.start_nd = nodes.{join_column}"
+            ).fetchall()
+
+        return {"lookups": best_time(lookups, repeats), "join": best_time(join, repeats)}
+    finally:
+        connection.close()
+
+
+def main() -> None:
+    """ """
+    parser = argparse.ArgumentParser(description="Compare the string keyed and compact network schemas.")
+    parser.add_argument("--edges", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    # headless QGIS
+    QgsApplication.setPrefixPath(os.environ.get("QGIS_PREFIX_PATH", "/usr"), True)
+    qgs = QgsApplication([], False)
+    qgs.initQgis()
+    crs = QgsCoordinateReferenceSystem("EPSG:27700")
+    transform_context = QgsCoordinateTransformContext()
+    print(f"{'edges':>10} {'schema':>8} {'size MB':>9} {f'{N_LOOKUPS} lookups s':>15} {'join s':>9}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for n_edges in args.edges:
+            for label, compact in [("string", False), ("compact", True)]:
+                out_path = f"{temp_dir}/{label}_{n_edges}.gpkg"
+                node_keys = write_layout(n_edges, out_path, compact, crs, transform_context)
+                size_mb = Path(out_path).stat().st_size / 1024**2
+                timings = query_timings(out_path, node_keys, compact, args.repeats)
+                print(f"{n_edges:>10} {label:>8} {size_mb:>9.2f} {timings['lookups']:>15.3f} {timings['join']:>9.3f}")
+    qgs.exitQgis()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+""" """
+from __future__ import annotations
+
+import argparse
+import importlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+PLUGIN_PARENT = Path(__file__).parent.parent
+PLUGIN_NAME = "cityseer-qgis"
+
+
+def measure() -> dict[str, float]:
+    """ """
+    # QGIS needs a GUI application for the dock widget - offscreen keeps it headless
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from qgis.core import QgsApplication
+    from qgis.testing.mocked import get_iface
+
+    QgsApplication.setPrefixPath(os.environ.get("QGIS_PREFIX_PATH", "/usr"), True)
+    qgs = QgsApplication([], True)
+    qgs.initQgis()
+    iface = get_iface()
+    sys.path.insert(0, str(PLUGIN_PARENT))
+    timings: dict[str, float] = {}
+    # what QGIS pays at every startup
+    start = time.perf_counter()
+    plugin = importlib.import_module(PLUGIN_NAME)
+    adaptor = plugin.classFactory(iface)
+    adaptor.initGui()
+    timings["startup"] = time.perf_counter() - start
+    timings["cityseer_loaded_at_startup"] = float("cityseer" in sys.modules)
+    # first opening of the dock widget
+    start = time.perf_counter()
+    adaptor.run()
+    timings["first_open"] = time.perf_counter() - start
+    # first operation requiring the cityseer pipeline
+    start = time.perf_counter()
+    importlib.import_module(f"{PLUGIN_NAME}.tasks")
+    timings["pipeline_import"] = time.perf_counter() - start
+    # a second plugin instance once everything is loaded
+    start = time.perf_counter()
+    warm_adaptor = plugin.classFactory(iface)
+    warm_adaptor.initGui()
+    warm_adaptor.run()
+    timings["warm_startup_and_open"] = time.perf_counter() - start
+    warm_adaptor.unload()
+    adaptor.unload()
+    qgs.exitQgis()
+    return timings
+
+
+def main() -> None:
+    """ """
+    parser = argparse.ArgumentParser(description="Plugin startup time - cold (fresh interpreter) and warm.")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(measure()))
+        return
+    # each cold run is a fresh interpreter so that no modules are cached
+    runs: list[dict[str, float]] = []
+    for _ in range(args.repeats):
+        result = subprocess.run(
+            [sys.executable, __file__, "--child"], capture_output=True, text=True, check=True, env=os.environ.copy()
+        )
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    print(f"{'measure':>24} {'median s':>10} {'min s':>10}")
+    for key in ["startup", "first_open", "pipeline_import", "warm_startup_and_open"]:
+        values = [run[key] for run in runs]
+        print(f"{key:>24} {statistics.median(values):>10.3f} {min(values):>10.3f}")
+    loaded = any(run["cityseer_loaded_at_startup"] for run in runs)
+    print(f"cityseer imported during startup: {loaded}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+""" """
+from __future__ import annotations
+
+import argparse
+import importlib
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import networkx as nx
+from qgis.core import (
+    QgsApplication,
+    QgsCoordinateReferenceSystem,
+    QgsCoordinateTransformContext,
+    QgsFeature,
+    QgsLineString,
+    QgsVectorFileWriter,
+    QgsWkbTypes,
+)
+from shapely import geometry
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+writers = importlib.import_module("cityseer-qgis.writers")
+
+
+def synthetic_grid_graph(n_edges: int, spacing: float = 100) -> nx.MultiGraph:
+    """ """
+    side = max(2, int((n_edges / 2) ** 0.5) + 1)
+    nx_multigraph = nx.MultiGraph()
+    for x_idx in range(side):
+        for y_idx in range(side):
+            nx_multigraph.add_node(f"{x_idx}_{y_idx}", x=x_idx * spacing, y=y_idx * spacing)
+    for x_idx in range(side):
+        for y_idx in range(side):
+            for nb_x, nb_y in [(x_idx + 1, y_idx), (x_idx, y_idx + 1)]:
+                if nb_x >= side or nb_y >= side:
+                    continue
+                if nx_multigraph.number_of_edges() >= n_edges:
+                    return nx_multigraph
+                # a mid-point vertex to give the geometries some substance
+                geom = geometry.LineString(
+                    [
+                        (x_idx * spacing, y_idx * spacing),
+                        ((x_idx + nb_x) * spacing / 2 + 1, (y_idx + nb_y) * spacing / 2 + 1),
+                        (nb_x * spacing, nb_y * spacing),
+                    ]
+                )
+                nx_multigraph.add_edge(f"{x_idx}_{y_idx}", f"{nb_x}_{nb_y}", geom=geom)
+    return nx_multigraph
+
+
+def legacy_write_network_edges(
+    nx_multigraph: nx.MultiGraph,
+    out_path: str,
+    layer_name: str,
+    crs: QgsCoordinateReferenceSystem,
+    transform_context: QgsCoordinateTransformContext,
+) -> int:
+    """ """
+    # the original per-feature WKT path, kept as the reference for comparison
+    save_options = QgsVectorFileWriter.SaveVectorOptions()
+    save_options.driverName = "GPKG"
+    save_options.fileEncoding = "UTF-8"
+    save_options.layerName = layer_name
+    writer = QgsVectorFileWriter.create(
+        out_path,
+        writers.network_edge_fields(),
+        QgsWkbTypes.LineString,
+        crs,
+        transform_context,
+        save_options,
+    )
+    counter = 0
+    for start_idx, end_idx, edge_key, data in nx_multigraph.edges(keys=True, data=True):
+        line_geom = QgsLineString()
+        line_geom.fromWkt(data["geom"].wkt)
+        feat = QgsFeature()
+        feat.setGeometry(line_geom)
+        feat.setAttributes([counter, str(start_idx), str(end_idx), int(edge_key)])
+        writer.addFeature(feat)
+        counter += 1
+    del writer
+    return counter
+
+
+def main() -> None:
+    """ """
+    parser = argparse.ArgumentParser(description="Compare the legacy and bulk network edge writers.")
+    parser.add_argument("--edges", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    # headless QGIS
+    QgsApplication.setPrefixPath(os.environ.get("QGIS_PREFIX_PATH", "/usr"), True)
+    qgs = QgsApplication([], False)
+    qgs.initQgis()
+    crs = QgsCoordinateReferenceSystem("EPSG:27700")
+    transform_context = QgsCoordinateTransformContext()
+    print(f"{'edges':>10} {'legacy s':>10} {'bulk s':>10} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for n_edges in args.edges:
+            nx_multigraph = synthetic_grid_graph(n_edges)
+            timings: dict[str, float] = {}
+            for label, write_func in [("legacy", legacy_write_network_edges), ("bulk", writers.write_network_edges)]:
+                best = float("inf")
+                for repeat in range(args.repeats):
+                    out_path = f"{temp_dir}/{label}_{n_edges}_{repeat}.gpkg"
+                    start = time.perf_counter()
+                    write_func(nx_multigraph, out_path, "osm_network", crs, transform_context)
+                    best = min(best, time.perf_counter() - start)
+                timings[label] = best
+            print(
+                f"{nx_multigraph.number_of_edges():>10} {timings['legacy']:>10.3f} {timings['bulk']:>10.3f} "
+                f"{timings['legacy'] / timings['bulk']:>7.1f}x"
+            )
+    qgs.exitQgis()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,15 @@
 """ """
 from __future__ import annotations
 
-from qgis.gui import QgisInterface
+from typing import TYPE_CHECKING
 
-from .adaptor import CityseerAdaptor
+if TYPE_CHECKING:
+    from qgis.gui import QgisInterface
 
 
 def classFactory(iface: QgisInterface):
     """ """
+    # imported when QGIS loads the plugin - importing plugin modules from outside QGIS doesn't pull in the GUI
+    from .adaptor import CityseerAdaptor
+
     return CityseerAdaptor(iface)
@@ -3,7 +3,7 @@ from __future__ import annotations
 
 import os.path
 from pathlib import Path
-from typing import Any, Callable
+from typing import TYPE_CHECKING, Any, Callable
 
 from qgis.core import (
     Qgis,
@@ -26,7 +26,9 @@ from qgis.PyQt.QtCore import QCoreApplication, QSettings, Qt, QTranslator, qVers
 from qgis.PyQt.QtGui import QIcon
 from qgis.PyQt.QtWidgets import QAction, QToolBar, QWidget
 
-from .dialog import CityseerDialog
+if TYPE_CHECKING:
+    from .dialog import CityseerDialog
+    from .processing.provider import CityseerProvider
 
 
 class CityseerAdaptor:
@@ -34,7 +36,8 @@ class CityseerAdaptor:
 
     iface: QgisInterface
     plugin_dir: str
-    dlg: CityseerDialog
+    dlg: CityseerDialog | None
+    provider: CityseerProvider | None
     actions: list[QAction]
     menu: str
     toolbar: QToolBar
@@ -59,7 +62,9 @@ class CityseerAdaptor:
             self.translator.load(locale_path)
             if qVersion() > "4.3.3":
                 QCoreApplication.installTranslator(self.translator)
-        self.dlg = CityseerDialog()
+        # the dialog pulls in cityseer and its dependencies - deferred until the plugin is first opened
+        self.dlg = None
+        self.provider = None
         self.actions = []
         self.menu = self.tr("&Cityseer")
         self.toolbar = self.iface.addToolBar("Cityseer")
@@ -107,8 +112,19 @@ class CityseerAdaptor:
 
         return action
 
+    def initProcessing(self):
+        """ """
+        from .processing.provider import CityseerProvider
+
+        if self.provider is not None:
+            return
+        # processing algorithms for qgis_process, models and batch runs without the dock widget
+        self.provider = CityseerProvider()
+        QgsApplication.processingRegistry().addProvider(self.provider)
+
     def initGui(self):
         """ """
+        self.initProcessing()
         icon_path = Path(os.path.dirname(__file__)) / "icon.png"
         self.add_action(str(icon_path), text=self.tr("Cityseer"), callback=self.run, parent=self.iface.mainWindow())
 
@@ -117,11 +133,24 @@ class CityseerAdaptor:
         for action in self.actions:
             self.iface.removePluginMenu(self.tr("&Cityseer"), action)
             self.iface.removeToolBarIcon(action)
+        if self.provider is not None:
+            QgsApplication.processingRegistry().removeProvider(self.provider)
+            self.provider = None
+        if self.dlg is not None:
+            self.iface.removeDockWidget(self.dlg)
+            self.dlg.deleteLater()
+            self.dlg = None
         del self.toolbar
 
     def run(self):
         """ """
-        self.iface.addDockWidget(Qt.RightDockWidgetArea, self.dlg)
+        if self.dlg is None:
+            from .dialog import CityseerDialog
+
+            self.dlg = CityseerDialog(self.iface.mapCanvas())
+            self.iface.addDockWidget(Qt.RightDockWidgetArea, self.dlg)
+        self.dlg.show()
+        self.dlg.raise_()
         # result: int = self.dlg.exec_()
         # if result:
         #     print("result")
@@ -0,0 +1,90 @@
+""" """
+from __future__ import annotations
+
+import json
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import shapely
+from qgis.core import QgsFeedback
+from shapely import geometry
+
+WORKER_PATH = Path(__file__).parent / "batch_worker.py"
+BATCH_WORKERS = 2
+BATCH_TRIES = 3
+RETRY_BACKOFF = 10
+POLL_INTERVAL = 0.5
+
+
+def python_executable() -> str:
+    """ """
+    # inside QGIS sys.executable can be the QGIS binary rather than its bundled interpreter
+    if Path(sys.executable).name.lower().startswith("python"):
+        return sys.executable
+    for candidate in [
+        Path(sys.exec_prefix) / "python.exe",
+        Path(sys.exec_prefix) / "bin" / f"python{sys.version_info.major}.{sys.version_info.minor}",
+        Path(sys.exec_prefix) / "bin" / "python3",
+    ]:
+        if candidate.is_file():
+            return str(candidate)
+    found = shutil.which("python3") or shutil.which("python")
+    if found is None:
+        raise IOError("Unable to locate a python interpreter for batch workers.")
+    return found
+
+
+def run_area_worker(
+    poly: geometry.Polygon | geometry.MultiPolygon,
+    crs_code: int | str,
+    simplify: bool,
+    out_path: Path,
+    feedback: QgsFeedback,
+    max_tries: int = BATCH_TRIES,
+) -> Path | None:
+    """ """
+    # each attempt is a separate process - the GIL, memory and cityseer state are not shared with QGIS
+    params = json.dumps(
+        {
+            "poly_wkb_hex": shapely.to_wkb(poly, hex=True),
+            "crs_code": crs_code,
+            "simplify": simplify,
+            "out_path": str(out_path),
+        }
+    )
+    # stderr goes to a file so that a chatty worker cannot fill the pipe and stall
+    log_path = out_path.with_suffix(".log")
+    error = ""
+    for attempt in range(1, max_tries + 1):
+        if feedback.isCanceled():
+            return None
+        with open(log_path, "w") as log_file:
+            process = subprocess.Popen(
+                [python_executable(), str(WORKER_PATH)],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=log_file,
+                text=True,
+            )
+            process.stdin.write(params)
+            process.stdin.close()
+            while process.poll() is None:
+                if feedback.isCanceled():
+                    process.kill()
+                    process.wait()
+                    return None
+                time.sleep(POLL_INTERVAL)
+        if process.returncode == 0 and out_path.exists():
+            return out_path
+        stderr = log_path.read_text().strip()
+        error = stderr.splitlines()[-1] if stderr else f"exit code {process.returncode}"
+        # back off before retrying - failures are mostly Overpass rate limits or timeouts
+        retry_at = time.monotonic() + RETRY_BACKOFF * attempt
+        while attempt < max_tries and time.monotonic() < retry_at:
+            if feedback.isCanceled():
+                return None
+            time.sleep(POLL_INTERVAL)
+    raise IOError(f"Failed after {max_tries} attempts: {error}")
@@ -0,0 +1,41 @@
+""" """
+# standalone script run by batch imports in a separate python process - imports neither QGIS nor the plugin package,
+# only the QGIS free osm_graph module beside it so that batch and single imports build graphs the same way
+from __future__ import annotations
+
+import json
+import os
+import pickle
+import sys
+from pathlib import Path
+
+os.environ["CITYSEER_QUIET_MODE"] = "1"
+
+import shapely
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import osm_graph
+
+
+def main() -> None:
+    """ """
+    # arguments arrive as JSON on stdin: poly_wkb_hex, crs_code, simplify and out_path
+    params = json.loads(sys.stdin.read())
+    poly = shapely.from_wkb(bytes.fromhex(params["poly_wkb_hex"]))
+    osm_json = osm_graph.fetch_osm_json(osm_graph.osm_request_from_poly(poly, params["crs_code"]))
+    nx_multigraph = osm_graph.nx_from_osm_json(osm_json, params["crs_code"])
+    del osm_json
+    if params["simplify"]:
+        nx_multigraph = osm_graph.nx_simplify(nx_multigraph)
+    else:
+        # unsimplified graphs still require edge geoms for writing
+        nx_multigraph = osm_graph.nx_simple_geoms(nx_multigraph)
+    temp_path = f"{params['out_path']}.tmp"
+    with open(temp_path, "wb") as out_file:
+        pickle.dump(nx_multigraph, out_file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, params["out_path"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+""" """
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import networkx as nx
+import numpy as np
+import shapely
+from shapely import geometry
+
+if TYPE_CHECKING:
+    from .network import LayerNetwork
+
+CACHE_DIR_NAME = ".cityseer_cache"
+CACHE_MAX_BYTES = 2 * 1024**3
+ASSIGNMENT_CACHE_ENTRIES = 8
+# converted networks are large - a couple of layers at a time
+NETWORK_CACHE_ENTRIES = 2
+# bumped when the request or simplification changes so that graphs built the old way are not reused
+GRAPH_CACHE_VERSION = 4
+
+
+class GraphCache:
+    """ """
+
+    cache_dir: Path
+    max_bytes: int
+
+    def __init__(self, working_dir_path: Path, max_bytes: int = CACHE_MAX_BYTES):
+        """ """
+        self.cache_dir = working_dir_path / CACHE_DIR_NAME
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def make_key(
+        extents_poly: geometry.Polygon | geometry.MultiPolygon,
+        crs_code: int | str,
+        simplify: bool | None = None,
+        source: str = "overpass",
+    ) -> str:
+        """ """
+        # simplify of None keys the raw (unsimplified) graph shared by both simplification settings
+        hasher = hashlib.sha256()
+        hasher.update(shapely.to_wkb(extents_poly, output_dimension=2, byte_order=1))
+        hasher.update(f"|{crs_code}|{simplify}|{source}|{GRAPH_CACHE_VERSION}".encode())
+        return hasher.hexdigest()
+
+    def entry_path(self, key: str) -> Path:
+        """ """
+        return self.cache_dir / f"{key}.pickle"
+
+    def get(self, key: str) -> nx.MultiGraph | None:
+        """ """
+        entry_path = self.entry_path(key)
+        if not entry_path.exists():
+            return None
+        try:
+            with open(entry_path, "rb") as entry_file:
+                nx_multigraph = pickle.load(entry_file)
+        except Exception:
+            # corrupt or incompatible entries are dropped rather than raised
+            entry_path.unlink(missing_ok=True)
+            return None
+        # modification time doubles as the LRU timestamp
+        os.utime(entry_path)
+        return nx_multigraph
+
+    def put(self, key: str, nx_multigraph: nx.MultiGraph) -> None:
+        """ """
+        entry_path = self.entry_path(key)
+        temp_path = entry_path.with_suffix(".tmp")
+        with open(temp_path, "wb") as entry_file:
+            pickle.dump(nx_multigraph, entry_file, protocol=pickle.HIGHEST_PROTOCOL)
+        temp_path.replace(entry_path)
+        self.evict()
+
+    def evict(self) -> None:
+        """ """
+        entries = [(entry.stat(), entry) for entry in self.cache_dir.glob("*.pickle")]
+        total_bytes = sum(entry_stat.st_size for entry_stat, _ in entries)
+        # least recently used first
+        for entry_stat, entry_path in sorted(entries, key=lambda entry: entry[0].st_mtime):
+            if total_bytes <= self.max_bytes:
+                break
+            entry_path.unlink(missing_ok=True)
+            total_bytes -= entry_stat.st_size
+
+    def clear(self) -> None:
+        """ """
+        for entry_path in self.cache_dir.glob("*.pickle"):
+            entry_path.unlink(missing_ok=True)
+
+
+class AssignmentCache:
+    """ """
+
+    # in memory and main thread only - data fids with their nearest and next nearest node keys
+    entries: OrderedDict[tuple, tuple[np.ndarray, np.ndarray, np.ndarray]]
+    max_entries: int
+
+    def __init__(self, max_entries: int = ASSIGNMENT_CACHE_ENTRIES):
+        """ """
+        self.entries = OrderedDict()
+        self.max_entries = max_entries
+
+    @staticmethod
+    def make_key(
+        netw_layer_id: str, netw_count: int, data_layer_id: str, data_count: int, max_assign_dist: int
+    ) -> tuple:
+        """ """
+        # feature counts guard against edits made while the layers were not being watched
+        return (netw_layer_id, netw_count, data_layer_id, data_count, max_assign_dist)
+
+    def get(self, key: tuple) -> tuple[np.ndarray, np.ndarray, np.ndarray] | None:
+        """ """
+        if key not in self.entries:
+            return None
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, key: tuple, assignment: tuple[np.ndarray, np.ndarray, np.ndarray]) -> None:
+        """ """
+        self.entries[key] = assignment
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def invalidate_layer(self, layer_id: str) -> None:
+        """ """
+        for key in [key for key in self.entries if layer_id in (key[0], key[2])]:
+            del self.entries[key]
+
+
+class NetworkCache:
+    """ """
+
+    # in memory and shared by the dialog's tabs - converted networks by layer and data signature
+    entries: OrderedDict[tuple, LayerNetwork]
+    max_entries: int
+
+    def __init__(self, max_entries: int = NETWORK_CACHE_ENTRIES):
+        """ """
+        self.entries = OrderedDict()
+        self.max_entries = max_entries
+
+    @staticmethod
+    def make_key(layer_id: str, signature: tuple) -> tuple:
+        """ """
+        return (layer_id, signature)
+
+    def get(self, key: tuple) -> LayerNetwork | None:
+        """ """
+        if key not in self.entries:
+            return None
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, key: tuple, layer_network: LayerNetwork) -> None:
+        """ """
+        # stale signatures for the same layer are superseded
+        self.invalidate_layer(key[0])
+        self.entries[key] = layer_network
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def invalidate_layer(self, layer_id: str) -> None:
+        """ """
+        for key in [key for key in self.entries if key[0] == layer_id]:
+            del self.entries[key]
@@ -0,0 +1,81 @@
+""" """
+# standalone script run by parallel centrality in a separate python process - imports neither QGIS nor the plugin
+# package
+from __future__ import annotations
+
+import json
+import os
+import sys
+from multiprocessing import resource_tracker, shared_memory
+
+os.environ["CITYSEER_QUIET_MODE"] = "1"
+
+import numpy as np
+from cityseer.algos import centrality
+from numba import njit, types
+from numba.typed import Dict, List
+
+EDGE_LIST_TYPE = types.ListType(types.int64)
+
+
+@njit(cache=True)
+def build_node_edge_map(nodes_n: int, edges_start: np.ndarray) -> Dict:
+    """ """
+    # as NetworkStructure.set_edge builds it - each node's outgoing edges in edge order
+    node_edge_map = Dict.empty(key_type=types.int64, value_type=EDGE_LIST_TYPE)
+    for node_idx in range(nodes_n):
+        node_edge_map[node_idx] = List.empty_list(types.int64)
+    for edge_idx in range(len(edges_start)):
+        node_edge_map[edges_start[edge_idx]].append(edge_idx)
+    return node_edge_map
+
+
+def attach_block(block: dict) -> tuple[shared_memory.SharedMemory, np.ndarray]:
+    """ """
+    # the parent owns the blocks - older pythons would otherwise remove them when this process exits
+    if sys.version_info >= (3, 13):
+        shm = shared_memory.SharedMemory(name=block["name"], track=False)
+    else:
+        shm = shared_memory.SharedMemory(name=block["name"])
+        if os.name == "posix":
+            resource_tracker.unregister(shm._name, "shared_memory")
+    return shm, np.ndarray(block["shape"], dtype=np.dtype(block["dtype"]), buffer=shm.buf)
+
+
+def main() -> None:
+    """ """
+    # arguments arrive as JSON on stdin: shared blocks, measures, distances, betas, angular and this worker's partition
+    params = json.loads(sys.stdin.read())
+    blocks: dict[str, shared_memory.SharedMemory] = {}
+    arrays: dict[str, np.ndarray] = {}
+    for key, block in params["blocks"].items():
+        blocks[key], arrays[key] = attach_block(block)
+    try:
+        # sources are interleaved across workers so that dense areas are spread evenly
+        nodes_n = len(arrays["live"])
+        live = arrays["live"] & (np.arange(nodes_n) % params["n_workers"] == params["worker_idx"])
+        measures_data = centrality.local_node_centrality(
+            np.array(params["distances"], dtype=np.int_),
+            np.array(params["betas"], dtype=np.float32),
+            tuple(params["measures"]),
+            live,
+            arrays["edges_start"],
+            arrays["edges_end"],
+            arrays["edges_length"],
+            arrays["edges_angle_sum"],
+            arrays["edges_imp_factor"],
+            arrays["edges_in_bearing"],
+            arrays["edges_out_bearing"],
+            build_node_edge_map(nodes_n, arrays["edges_start"]),
+            angular=params["angular"],
+        )
+        arrays["out"][:] = measures_data
+    finally:
+        # views have to go before their blocks can close
+        arrays.clear()
+        for shm in blocks.values():
+            shm.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,31 @@
 """ """
 from __future__ import annotations
 
+from functools import partial
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from qgis.core import QgsCoordinateReferenceSystem
-from qgis.gui import QgsFileWidget, QgsProjectionSelectionWidget
+from qgis.core import Qgis, QgsCoordinateReferenceSystem, QgsMessageLog, QgsVectorLayer
+from qgis.gui import QgsFileWidget, QgsMapCanvas, QgsProjectionSelectionWidget
 from qgis.PyQt import QtCore, QtWidgets
 
+from .instrumentation import LOG_TAG, export_profiles
 from .tabs.centrality import CentralityTab
 from .tabs.graphs import GraphsTab
 from .tabs.landuses import LandusesTab
 from .tabs.osm import OsmTab
 
+if TYPE_CHECKING:
+    from .cache import NetworkCache
+    from .network import LayerNetwork
+
 
 class CityseerDialog(QtWidgets.QDockWidget):
     """ """
 
     working_dir: QgsFileWidget
     working_dir_feedback: QtWidgets.QLabel
+    profiles_btn: QtWidgets.QPushButton
     crs_dropdown: QgsProjectionSelectionWidget
     crs_feedback: QtWidgets.QLabel
     osm_tab: OsmTab
@@ -26,12 +34,17 @@ class CityseerDialog(QtWidgets.QDockWidget):
     lus_tab: LandusesTab
     working_dir_path: Path | None
     crs_selection: QgsCoordinateReferenceSystem | None
+    network_cache: NetworkCache | None
+    watched_layer_ids: set[str]
 
-    def __init__(self, parent: QtWidgets.QWidget | None = None) -> None:
+    def __init__(self, canvas: QgsMapCanvas | None = None, parent: QtWidgets.QWidget | None = None) -> None:
         """ """
         super().__init__(parent)
         self.working_dir_path = None
         self.crs_selection = None
+        # networks converted by one tab are reused by the others
+        self.network_cache = None
+        self.watched_layer_ids = set()
         # layout
         self.setWindowTitle("Cityseer QGIS Plugin")
         self.setAllowedAreas(QtCore.Qt.RightDockWidgetArea)
@@ -49,6 +62,11 @@ class CityseerDialog(QtWidgets.QDockWidget):
         self.working_dir_feedback = QtWidgets.QLabel("Specify working directory", self)
         self.working_dir_feedback.setWordWrap(True)
         work_dir_layout.addWidget(self.working_dir_feedback)
+        # stage timings are logged to the Cityseer log tab - exported per run as JSON
+        self.profiles_btn = QtWidgets.QPushButton("Export run profiles")
+        self.profiles_btn.setDisabled(True)
+        self.profiles_btn.pressed.connect(self.export_run_profiles)
+        work_dir_layout.addWidget(self.profiles_btn)
         # add to dock widget layout
         dw_layout.addWidget(work_dir_content)
         # CRS
@@ -72,13 +90,13 @@ class CityseerDialog(QtWidgets.QDockWidget):
         dw_layout.addWidget(crs_content)
         # prepare tabs
         tabs = QtWidgets.QTabWidget()
-        self.osm_tab = OsmTab(self)
+        self.osm_tab = OsmTab(self, canvas)
         tabs.addTab(self.osm_tab, "OSM import")
-        self.graphs_tab = GraphsTab(self)
+        self.graphs_tab = GraphsTab(self, self.shared_network)
         tabs.addTab(self.graphs_tab, "Graphs")
-        self.cent_tab = CentralityTab(self)
+        self.cent_tab = CentralityTab(self, self.shared_network)
         tabs.addTab(self.cent_tab, "Centrality")
-        self.lus_tab = LandusesTab(self)
+        self.lus_tab = LandusesTab(self, self.shared_network)
         tabs.addTab(self.lus_tab, "Land Uses")
         # add to dock widget layout
         dw_layout.addWidget(tabs)
@@ -95,6 +113,7 @@ class CityseerDialog(QtWidgets.QDockWidget):
         else:
             self.working_dir_feedback.setText("")
             self.working_dir_path = out_path.absolute()
+        self.profiles_btn.setDisabled(self.working_dir_path is None)
         self.update_child_tabs()
 
     def handle_crs(self) -> None:
@@ -115,3 +134,52 @@ class CityseerDialog(QtWidgets.QDockWidget):
         if not hasattr(self, "osm_tab"):
             return
         self.osm_tab.update_child(self.working_dir_path, self.crs_selection)
+        self.graphs_tab.update_child(self.working_dir_path, self.crs_selection)
+        self.cent_tab.update_child(self.crs_selection)
+        self.lus_tab.update_child(self.crs_selection)
+
+    def export_run_profiles(self) -> None:
+        """ """
+        if self.working_dir_path is None:
+            return
+        out_paths = export_profiles(self.working_dir_path / "cityseer_profiles")
+        QgsMessageLog.logMessage(
+            f"Exported {len(out_paths)} run profiles to {self.working_dir_path / 'cityseer_profiles'}.",
+            tag=LOG_TAG,
+            level=Qgis.Info,
+            notifyUser=True,
+        )
+
+    def shared_network(self, layer: QgsVectorLayer) -> LayerNetwork:
+        """ """
+        # created on first use - the cache and network modules import the cityseer stack
+        from .cache import NetworkCache
+        from .layer_io import data_signature
+        from .network import LayerNetwork
+
+        if self.network_cache is None:
+            self.network_cache = NetworkCache()
+        self.watch_layer(layer)
+        cache_key = NetworkCache.make_key(layer.id(), data_signature(layer))
+        layer_network = self.network_cache.get(cache_key)
+        if layer_network is None:
+            # converted by the first task to use it
+            layer_network = LayerNetwork()
+            self.network_cache.put(cache_key, layer_network)
+        return layer_network
+
+    def watch_layer(self, layer: QgsVectorLayer) -> None:
+        """ """
+        # edits, provider reloads or removal invalidate the layer's converted network
+        if layer.id() in self.watched_layer_ids:
+            return
+        self.watched_layer_ids.add(layer.id())
+        invalidate = partial(self.handle_layer_edit, layer.id())
+        layer.layerModified.connect(invalidate)
+        layer.dataChanged.connect(invalidate)
+        layer.willBeDeleted.connect(invalidate)
+
+    def handle_layer_edit(self, layer_id: str, *_args) -> None:
+        """ """
+        if self.network_cache is not None:
+            self.network_cache.invalidate_layer(layer_id)
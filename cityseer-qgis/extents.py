@@ -0,0 +1,26 @@
+""" """
+from __future__ import annotations
+
+import shapely
+from shapely import geometry
+
+
+def extents_from_point(easting: float, northing: float, radius: float) -> geometry.Polygon:
+    """ """
+    return geometry.Point(easting, northing).buffer(radius)
+
+
+def extents_from_wkbs(
+    geom_wkbs: list[bytes], simplify_tolerance: float | None = None
+) -> geometry.Polygon | geometry.MultiPolygon | None:
+    """ """
+    # vectorised WKB parsing and union
+    if not geom_wkbs:
+        return None
+    geoms = shapely.from_wkb(geom_wkbs)
+    poly = shapely.union_all(shapely.make_valid(geoms))
+    if simplify_tolerance is not None:
+        poly = poly.simplify(simplify_tolerance, preserve_topology=True)
+    if poly.is_empty or poly.geom_type not in ("Polygon", "MultiPolygon"):
+        return None
+    return poly
@@ -0,0 +1,220 @@
+""" """
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any
+
+import networkx as nx
+import numpy as np
+import shapely
+from qgis.core import QgsProviderRegistry, QgsVectorLayer
+
+GRAPH_SUFFIX = ".npz"
+
+
+def graph_path(out_path: str | Path, layer_name: str) -> Path:
+    """ """
+    out_path = Path(out_path)
+    return out_path.with_name(f"{out_path.stem}.{layer_name}{GRAPH_SUFFIX}")
+
+
+def graph_path_for_layer(layer: QgsVectorLayer) -> Path | None:
+    """ """
+    # only GPKG layers written by the plugin have a sidecar graph
+    uri_parts = QgsProviderRegistry.instance().decodeUri(layer.providerType(), layer.source())
+    if not uri_parts.get("path") or not uri_parts.get("layerName"):
+        return None
+    gpkg_path = Path(uri_parts["path"])
+    sidecar_path = graph_path(gpkg_path, uri_parts["layerName"])
+    if not sidecar_path.exists() or not gpkg_path.exists():
+        return None
+    # edits to the GPKG after the import leave the sidecar stale
+    if sidecar_path.stat().st_mtime < gpkg_path.stat().st_mtime:
+        return None
+    return sidecar_path
+
+
+def edge_geoms(nx_multigraph: nx.MultiGraph, edges: list[tuple[Any, Any, int, dict[str, Any]]]) -> np.ndarray:
+    """ """
+    # edge geoms oriented from start to end node so that node coordinates can be recovered from the lines
+    geoms = np.empty(len(edges), dtype=object)
+    geoms[:] = [data["geom"] for _, _, _, data in edges]
+    # per edge lookups rather than full node attribute dicts - edges can arrive in batches
+    nodes = nx_multigraph.nodes
+    start_xys = np.array([(nodes[start_nd]["x"], nodes[start_nd]["y"]) for start_nd, _, _, _ in edges]).reshape(-1, 2)
+    first_xys = shapely.get_coordinates(shapely.get_point(geoms, 0)).reshape(-1, 2)
+    last_xys = shapely.get_coordinates(shapely.get_point(geoms, -1)).reshape(-1, 2)
+    flip = np.hypot(*(first_xys - start_xys).T) > np.hypot(*(last_xys - start_xys).T)
+    geoms[flip] = shapely.reverse(geoms[flip])
+    return geoms
+
+
+class GraphArraysWriter:
+    """ """
+
+    node_index: dict[str, int]
+    node_keys: list[np.ndarray]
+    node_xys: list[np.ndarray]
+    edge_fids: list[np.ndarray]
+    edge_nodes: list[np.ndarray]
+    edge_keys: list[np.ndarray]
+    edge_n_coords: list[np.ndarray]
+    edge_coords: list[np.ndarray]
+
+    def __init__(self):
+        """ """
+        self.node_index = {}
+        self.node_keys = []
+        self.node_xys = []
+        self.edge_fids = []
+        self.edge_nodes = []
+        self.edge_keys = []
+        self.edge_n_coords = []
+        self.edge_coords = []
+
+    def add_arrays(self, graph_arrays: dict[str, np.ndarray], edge_mask: np.ndarray) -> None:
+        """ """
+        # the masked edges of stored arrays - e.g. the untouched tiles of a patched import
+        # all nodes are carried over in order so that node ids already written to the GPKG stay valid
+        node_offset = len(self.node_index)
+        for nd_label in graph_arrays["node_keys"].tolist():
+            self.node_index[nd_label] = len(self.node_index)
+        self.node_keys.append(graph_arrays["node_keys"])
+        self.node_xys.append(graph_arrays["node_xys"])
+        self.edge_fids.append(graph_arrays["edge_fids"][edge_mask])
+        self.edge_nodes.append(graph_arrays["edge_nodes"][edge_mask].reshape(-1, 2) + node_offset)
+        self.edge_keys.append(graph_arrays["edge_keys"][edge_mask])
+        n_coords = np.diff(graph_arrays["edge_coord_offsets"])
+        self.edge_n_coords.append(n_coords[edge_mask])
+        self.edge_coords.append(graph_arrays["edge_coords"][np.repeat(edge_mask, n_coords)])
+
+    def add_line_arrays(
+        self,
+        node_keys: np.ndarray,
+        node_xys: np.ndarray,
+        edge_nodes: np.ndarray,
+        edge_keys: np.ndarray,
+        geoms: np.ndarray,
+        fids: np.ndarray,
+    ) -> None:
+        """ """
+        # a network built on arrays - edge nodes index node_keys and geoms run from start to end node
+        node_offset = len(self.node_index)
+        for nd_label in node_keys.tolist():
+            self.node_index[nd_label] = len(self.node_index)
+        self.node_keys.append(node_keys)
+        self.node_xys.append(node_xys)
+        self.edge_fids.append(fids)
+        self.edge_nodes.append(edge_nodes.reshape(-1, 2) + node_offset)
+        self.edge_keys.append(edge_keys)
+        self.edge_n_coords.append(shapely.get_num_coordinates(geoms).astype(np.int64))
+        self.edge_coords.append(shapely.get_coordinates(geoms))
+
+    def add_graph(self, nx_multigraph: nx.MultiGraph, start_fid: int | None = 0) -> None:
+        """ """
+        # a start_fid of None takes fids from the edge data
+        self.add_nodes(nx_multigraph)
+        edges = list(nx_multigraph.edges(keys=True, data=True))
+        if start_fid is None:
+            fids = np.array([data["fid"] for _, _, _, data in edges], dtype=np.int64)
+        else:
+            fids = np.arange(start_fid, start_fid + len(edges), dtype=np.int64)
+        self.add_edges(edges, edge_geoms(nx_multigraph, edges), fids)
+
+    def add_nodes(self, nx_multigraph: nx.MultiGraph) -> None:
+        """ """
+        # nodes already added by earlier graphs (e.g. stitched tile boundaries) are reused
+        new_keys: list[str] = []
+        new_xys: list[tuple[float, float]] = []
+        for nd_key, nd_data in nx_multigraph.nodes(data=True):
+            nd_label = str(nd_key)
+            if nd_label in self.node_index:
+                continue
+            self.node_index[nd_label] = len(self.node_index)
+            new_keys.append(nd_label)
+            new_xys.append((nd_data["x"], nd_data["y"]))
+        self.node_keys.append(np.array(new_keys, dtype=str))
+        self.node_xys.append(np.array(new_xys, dtype=np.float64).reshape(-1, 2))
+
+    def add_edges(self, edges: list[tuple[Any, Any, int, dict[str, Any]]], geoms: np.ndarray, fids: np.ndarray) -> None:
+        """ """
+        # edges in the same order as writers.network_edge_batches so that fids line up with the GPKG
+        # nodes have to be added first - geoms are as oriented by edge_geoms
+        self.edge_fids.append(fids)
+        self.edge_nodes.append(
+            np.array(
+                [(self.node_index[str(start_nd)], self.node_index[str(end_nd)]) for start_nd, end_nd, _, _ in edges],
+                dtype=np.int64,
+            ).reshape(-1, 2)
+        )
+        self.edge_keys.append(np.array([edge_key for _, _, edge_key, _ in edges], dtype=np.int64))
+        self.edge_n_coords.append(shapely.get_num_coordinates(geoms).astype(np.int64))
+        self.edge_coords.append(shapely.get_coordinates(geoms))
+
+    def node_table(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """ """
+        # node keys, coordinates and degrees indexed by node id
+        node_keys = np.concatenate(self.node_keys) if self.node_keys else np.empty(0, dtype=str)
+        node_xys = np.concatenate(self.node_xys) if self.node_xys else np.empty((0, 2))
+        edge_nodes = np.concatenate(self.edge_nodes) if self.edge_nodes else np.empty((0, 2), dtype=np.int64)
+        # self loops count twice, as in networkx
+        degrees = np.bincount(edge_nodes.ravel(), minlength=len(node_keys))
+        return node_keys, node_xys, degrees
+
+    def save(self, out_path: Path, crs_authid: str) -> None:
+        """ """
+        edge_n_coords = np.concatenate(self.edge_n_coords) if self.edge_n_coords else np.empty(0, dtype=np.int64)
+        edge_coord_offsets = np.zeros(len(edge_n_coords) + 1, dtype=np.int64)
+        np.cumsum(edge_n_coords, out=edge_coord_offsets[1:])
+        # uncompressed so that reloads are a straight memory read
+        temp_path = out_path.with_name(f"{out_path.stem}.tmp{GRAPH_SUFFIX}")
+        np.savez(
+            temp_path,
+            crs=np.array(crs_authid),
+            node_keys=np.concatenate(self.node_keys) if self.node_keys else np.empty(0, dtype=str),
+            node_xys=np.concatenate(self.node_xys) if self.node_xys else np.empty((0, 2)),
+            edge_fids=np.concatenate(self.edge_fids) if self.edge_fids else np.empty(0, dtype=np.int64),
+            edge_nodes=np.concatenate(self.edge_nodes) if self.edge_nodes else np.empty((0, 2), dtype=np.int64),
+            edge_keys=np.concatenate(self.edge_keys) if self.edge_keys else np.empty(0, dtype=np.int64),
+            edge_coord_offsets=edge_coord_offsets,
+            edge_coords=np.concatenate(self.edge_coords) if self.edge_coords else np.empty((0, 2)),
+        )
+        temp_path.replace(out_path)
+
+
+def save_graph(nx_multigraph: nx.MultiGraph, out_path: Path, crs_authid: str) -> None:
+    """ """
+    arrays_writer = GraphArraysWriter()
+    arrays_writer.add_graph(nx_multigraph)
+    arrays_writer.save(out_path, crs_authid)
+
+
+def load_graph_arrays(in_path: Path) -> dict[str, np.ndarray]:
+    """ """
+    with np.load(in_path, allow_pickle=False) as graph_data:
+        return {key: graph_data[key] for key in graph_data.files}
+
+
+def load_graph(in_path: Path) -> nx.MultiGraph:
+    """ """
+    graph_arrays = load_graph_arrays(in_path)
+    node_keys = graph_arrays["node_keys"].tolist()
+    node_xys = graph_arrays["node_xys"].tolist()
+    edge_nodes = graph_arrays["edge_nodes"]
+    # patched imports carry nodes that no longer have edges
+    used_idxs = np.unique(edge_nodes).tolist()
+    # vectorised geometry construction from the flat coordinate array
+    offsets = graph_arrays["edge_coord_offsets"]
+    geom_idxs = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    geoms = shapely.linestrings(graph_arrays["edge_coords"], indices=geom_idxs) if len(geom_idxs) else []
+    nx_multigraph = nx.MultiGraph()
+    nx_multigraph.add_nodes_from(
+        (node_keys[nd_idx], {"x": node_xys[nd_idx][0], "y": node_xys[nd_idx][1]}) for nd_idx in used_idxs
+    )
+    nx_multigraph.add_edges_from(
+        (node_keys[start_idx], node_keys[end_idx], edge_key, {"geom": geom, "fid": fid})
+        for (start_idx, end_idx), edge_key, geom, fid in zip(
+            edge_nodes.tolist(), graph_arrays["edge_keys"].tolist(), geoms, graph_arrays["edge_fids"].tolist()
+        )
+    )
+    return nx_multigraph
@@ -0,0 +1,162 @@
+""" """
+from __future__ import annotations
+
+import itertools
+import json
+import sys
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from qgis.core import Qgis, QgsMessageLog
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+LOG_TAG = "Cityseer"
+HISTORY_LENGTH = 50
+RUN_IDS = itertools.count(1)
+
+
+def peak_rss_mb() -> float | None:
+    """ """
+    # the process high water mark - a stage's growth is the amount by which it pushed the peak up
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # bytes on macOS, kilobytes elsewhere
+        return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+    try:
+        import psutil
+    except ImportError:
+        return None
+    memory_info = psutil.Process().memory_info()
+    return getattr(memory_info, "peak_wset", memory_info.rss) / 1024**2
+
+
+class RunProfile:
+    """ """
+
+    run_id: int
+    operation: str
+    started: str
+    status: str | None
+    stages: list[dict[str, Any]]
+    current: dict[str, Any] | None
+    exported: bool
+    wall_start: float
+    cpu_start: float
+    rss_start: float | None
+
+    def __init__(self, operation: str):
+        """ """
+        self.run_id = next(RUN_IDS)
+        self.operation = operation
+        self.started = datetime.now().isoformat(timespec="seconds")
+        self.status = None
+        self.stages = []
+        self.current = None
+        self.exported = False
+
+    def begin(self, stage: str) -> None:
+        """ """
+        # stages are sequential - starting one closes the last
+        self.end()
+        self.current = {"stage": stage, "items": None}
+        self.wall_start = time.perf_counter()
+        # CPU time of the thread running the stage, so that QGIS rendering on the main thread is excluded
+        self.cpu_start = time.thread_time()
+        self.rss_start = peak_rss_mb()
+
+    def add_items(self, n_items: int) -> None:
+        """ """
+        if self.current is None:
+            return
+        self.current["items"] = (self.current["items"] or 0) + n_items
+
+    def end(self) -> None:
+        """ """
+        if self.current is None:
+            return
+        rss_end = peak_rss_mb()
+        self.current["wall_s"] = time.perf_counter() - self.wall_start
+        self.current["cpu_s"] = time.thread_time() - self.cpu_start
+        self.current["peak_rss_mb"] = rss_end
+        self.current["rss_growth_mb"] = None if rss_end is None or self.rss_start is None else rss_end - self.rss_start
+        self.stages.append(self.current)
+        self.current = None
+
+    def totals(self) -> dict[str, dict[str, Any]]:
+        """ """
+        # tiled imports repeat stages - totals per stage name in order of first appearance
+        totals: dict[str, dict[str, Any]] = {}
+        for stage in self.stages:
+            total = totals.setdefault(
+                stage["stage"], {"runs": 0, "wall_s": 0.0, "cpu_s": 0.0, "items": None, "peak_rss_mb": None}
+            )
+            total["runs"] += 1
+            total["wall_s"] += stage["wall_s"]
+            total["cpu_s"] += stage["cpu_s"]
+            if stage["items"] is not None:
+                total["items"] = (total["items"] or 0) + stage["items"]
+            if stage["peak_rss_mb"] is not None:
+                total["peak_rss_mb"] = max(total["peak_rss_mb"] or 0, stage["peak_rss_mb"])
+        return totals
+
+    def summary(self) -> str:
+        """ """
+        lines = [f"{self.operation} ({self.status}) started {self.started}"]
+        for stage_name, total in self.totals().items():
+            line = f"  {stage_name}: {total['wall_s']:.3f}s wall, {total['cpu_s']:.3f}s CPU"
+            if total["runs"] > 1:
+                line += f", {total['runs']} runs"
+            if total["items"] is not None:
+                line += f", {total['items']} items"
+                if total["wall_s"] > 0:
+                    line += f" ({total['items'] / total['wall_s']:.0f}/s)"
+            if total["peak_rss_mb"] is not None:
+                line += f", peak RSS {total['peak_rss_mb']:.0f} MB"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def to_dict(self) -> dict[str, Any]:
+        """ """
+        return {
+            "run_id": self.run_id,
+            "operation": self.operation,
+            "started": self.started,
+            "status": self.status,
+            "totals": self.totals(),
+            "stages": self.stages,
+        }
+
+    def finish(self, status: str) -> None:
+        """ """
+        self.end()
+        self.status = status
+        PROFILE_HISTORY.append(self)
+        QgsMessageLog.logMessage(self.summary(), tag=LOG_TAG, level=Qgis.Info)
+
+
+# completed runs awaiting export - main thread only
+PROFILE_HISTORY: deque[RunProfile] = deque(maxlen=HISTORY_LENGTH)
+
+
+def export_profiles(out_dir: Path) -> list[Path]:
+    """ """
+    # one JSON file per run, skipping runs already exported
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_paths: list[Path] = []
+    for profile in PROFILE_HISTORY:
+        if profile.exported:
+            continue
+        operation_label = profile.operation.lower().replace(" ", "_")
+        out_path = out_dir / f"{profile.started.replace(':', '')}_{profile.run_id}_{operation_label}.json"
+        out_path.write_text(json.dumps(profile.to_dict(), indent=2))
+        profile.exported = True
+        out_paths.append(out_path)
+    return out_paths
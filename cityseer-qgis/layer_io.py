@@ -0,0 +1,294 @@
+""" """
+from __future__ import annotations
+
+import os
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+import shapely
+from qgis.core import (
+    NULL,
+    QgsCoordinateReferenceSystem,
+    QgsFeature,
+    QgsFeatureRequest,
+    QgsFeedback,
+    QgsField,
+    QgsProviderRegistry,
+    QgsVectorLayer,
+    QgsVectorLayerFeatureSource,
+)
+from qgis.PyQt.QtCore import QVariant
+
+from . import graph_store
+
+# attribute only updates are light - larger batches than feature writes
+WRITE_BATCH_SIZE = 50000
+SQLITE_TIMEOUT = 5
+
+
+class LayerSource:
+    """ """
+
+    # captured on the main thread - layers are not thread safe, but feature sources and file paths are
+    layer_id: str
+    layer_name: str
+    crs: QgsCoordinateReferenceSystem
+    field_names: list[str]
+    feature_source: QgsVectorLayerFeatureSource
+    ogr_path: str | None
+    ogr_layer_name: str | None
+    graph_path: Path | None
+
+    def __init__(self, layer: QgsVectorLayer):
+        """ """
+        self.layer_id = layer.id()
+        self.layer_name = layer.name()
+        self.crs = layer.crs()
+        self.field_names = layer.fields().names()
+        self.feature_source = QgsVectorLayerFeatureSource(layer)
+        self.ogr_path = None
+        self.ogr_layer_name = None
+        # direct OGR reads are only equivalent when nothing is filtered or pending
+        if layer.providerType() == "ogr" and not layer.subsetString() and not layer.isModified():
+            uri_parts = QgsProviderRegistry.instance().decodeUri("ogr", layer.source())
+            if uri_parts.get("path"):
+                self.ogr_path = uri_parts["path"]
+                self.ogr_layer_name = uri_parts.get("layerName") or None
+        self.graph_path = graph_store.graph_path_for_layer(layer) if self.ogr_path is not None else None
+
+    def read_arrays(
+        self, field_names: list[str], feedback: QgsFeedback | None = None
+    ) -> tuple[np.ndarray, np.ndarray, dict[str, np.ndarray]]:
+        """ """
+        field_names = [field_name for field_name in field_names if field_name in self.field_names]
+        if self.ogr_path is not None:
+            arrays = read_ogr_arrays(self.ogr_path, self.ogr_layer_name, field_names, feedback)
+            if arrays is not None:
+                return arrays
+        # fallback - per feature iteration but without geometry or attribute conversion beyond WKB
+        request = QgsFeatureRequest().setSubsetOfAttributes(field_names, self.feature_source.fields())
+        fids: list[int] = []
+        wkbs: list[bytes] = []
+        values: dict[str, list] = {field_name: [] for field_name in field_names}
+        field_idxs = [self.feature_source.fields().indexOf(field_name) for field_name in field_names]
+        feature: QgsFeature
+        for counter, feature in enumerate(self.feature_source.getFeatures(request)):
+            if feedback is not None and counter % 10000 == 0 and feedback.isCanceled():
+                break
+            fids.append(feature.id())
+            wkbs.append(bytes(feature.geometry().asWkb()))
+            attributes = feature.attributes()
+            for field_name, field_idx in zip(field_names, field_idxs):
+                values[field_name].append(attributes[field_idx])
+        geoms = shapely.from_wkb(wkbs) if wkbs else np.empty(0, dtype=object)
+        return (
+            np.array(fids, dtype=np.int64),
+            geoms,
+            {
+                field_name: field_array(field_values, self.feature_source.fields().field(field_name))
+                for field_name, field_values in values.items()
+            },
+        )
+
+    def read_coords(
+        self, field_names: list[str], feedback: QgsFeedback | None = None
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, dict[str, np.ndarray]]:
+        """ """
+        # flat 2D coordinates with per feature offsets - the layout of the graph sidecar's edge coordinates
+        fids, geoms, values = self.read_arrays(field_names, feedback)
+        coords, offsets = geometry_coords(geoms)
+        return fids, coords, offsets, values
+
+
+def field_array(field_values: list, field: QgsField) -> np.ndarray:
+    """ """
+    # per feature reads return QVariant NULLs - numeric fields become contiguous arrays with NaN for NULL
+    if not field.isNumeric():
+        return np.array([None if value == NULL else value for value in field_values], dtype=object)
+    if any(value == NULL for value in field_values):
+        return np.array([np.nan if value == NULL else value for value in field_values], dtype=np.float64)
+    if field.type() in (QVariant.Int, QVariant.LongLong, QVariant.UInt, QVariant.ULongLong):
+        return np.array(field_values, dtype=np.int64)
+    return np.array(field_values, dtype=np.float64)
+
+
+def ogr_field_array(field_values: np.ndarray) -> np.ndarray:
+    """ """
+    # arrow stream reads return masked arrays for NULLs - converted the same way as field_array
+    if field_values.dtype.kind not in "iuf":
+        mask = np.ma.getmaskarray(field_values)
+        # strings arrive as bytes
+        return np.array(
+            [
+                None if is_null or value is None else value.decode() if isinstance(value, bytes) else value
+                for value, is_null in zip(np.ma.getdata(field_values), mask)
+            ],
+            dtype=object,
+        )
+    if np.ma.is_masked(field_values):
+        return np.ma.filled(field_values.astype(np.float64), np.nan)
+    field_values = np.ma.getdata(field_values)
+    if field_values.dtype.kind in "iu":
+        return field_values.astype(np.int64)
+    return field_values.astype(np.float64)
+
+
+def geometry_coords(geoms: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """ """
+    # offsets has one more entry than geoms - coords[offsets[i]:offsets[i + 1]] belong to geoms[i]
+    coords, geom_idxs = shapely.get_coordinates(geoms, return_index=True)
+    offsets = np.zeros(len(geoms) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(geom_idxs, minlength=len(geoms)), out=offsets[1:])
+    return coords, offsets
+
+
+def data_signature(layer: QgsVectorLayer) -> tuple:
+    """ """
+    # main thread only - guards cached conversions against changes made while the layer was not being watched
+    extent = layer.extent()
+    return (
+        layer.source(),
+        layer.subsetString(),
+        layer.featureCount(),
+        (extent.xMinimum(), extent.yMinimum(), extent.xMaximum(), extent.yMaximum()),
+    )
+
+
+def read_ogr_arrays(
+    ogr_path: str, ogr_layer_name: str | None, field_names: list[str], feedback: QgsFeedback | None = None
+) -> tuple[np.ndarray, np.ndarray, dict[str, np.ndarray]] | None:
+    """ """
+    # columnar reads through the OGR arrow stream, available from GDAL 3.6
+    try:
+        from osgeo import ogr
+    except ImportError:
+        return None
+    data_source = ogr.Open(ogr_path)
+    if data_source is None:
+        return None
+    ogr_layer = data_source.GetLayerByName(ogr_layer_name) if ogr_layer_name else data_source.GetLayer(0)
+    if ogr_layer is None or not hasattr(ogr_layer, "GetArrowStreamAsNumPy"):
+        return None
+    ogr_layer.SetIgnoredFields(
+        [
+            ogr_layer.GetLayerDefn().GetFieldDefn(field_idx).GetName()
+            for field_idx in range(ogr_layer.GetLayerDefn().GetFieldCount())
+            if ogr_layer.GetLayerDefn().GetFieldDefn(field_idx).GetName() not in field_names
+        ]
+    )
+    geom_column = ogr_layer.GetGeometryColumn() or "wkb_geometry"
+    fid_column = ogr_layer.GetFIDColumn() or "OGC_FID"
+    fid_batches: list[np.ndarray] = []
+    wkb_batches: list[np.ndarray] = []
+    value_batches: dict[str, list[np.ndarray]] = {field_name: [] for field_name in field_names}
+    stream = ogr_layer.GetArrowStreamAsNumPy(options=["GEOMETRY_ENCODING=WKB"])
+    for batch in stream:
+        if feedback is not None and feedback.isCanceled():
+            break
+        fid_batches.append(batch[fid_column])
+        wkb_batches.append(batch[geom_column])
+        for field_name in field_names:
+            value_batches[field_name].append(batch[field_name])
+    if not wkb_batches:
+        return (
+            np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=object),
+            {field_name: np.empty(0) for field_name in field_names},
+        )
+    fids = np.concatenate(fid_batches).astype(np.int64)
+    geoms = shapely.from_wkb(np.concatenate(wkb_batches))
+    values = {field_name: ogr_field_array(np.ma.concatenate(batches)) for field_name, batches in value_batches.items()}
+    return fids, geoms, values
+
+
+def write_columns(
+    layer: QgsVectorLayer, fids: np.ndarray, columns: dict[str, np.ndarray], batch_size: int = WRITE_BATCH_SIZE
+) -> None:
+    """ """
+    # main thread only - new fields, then a single SQLite transaction for GPKG layers or batched provider updates
+    sidecar_path = graph_store.graph_path_for_layer(layer)
+    provider = layer.dataProvider()
+    new_fields = [QgsField(col_name, QVariant.Double) for col_name in columns if layer.fields().indexOf(col_name) == -1]
+    if new_fields:
+        if not provider.addAttributes(new_fields):
+            raise IOError(f"Unable to add fields to layer: {layer.name()}")
+        layer.updateFields()
+    valid = fids >= 0
+    fids = fids[valid]
+    columns = {col_name: col_arr[valid] for col_name, col_arr in columns.items()}
+    gpkg_table = gpkg_table_for_layer(layer)
+    if gpkg_table is not None and update_gpkg_columns(*gpkg_table, fids, columns):
+        # the provider's cached features predate the update - the topology is unchanged,
+        # so the reload is not reported as a data change that would drop converted networks
+        signals_blocked = layer.blockSignals(True)
+        try:
+            layer.reload()
+        finally:
+            layer.blockSignals(signals_blocked)
+    else:
+        change_attribute_batches(layer, fids, columns, batch_size)
+    # attribute updates leave the topology untouched - keep the graph sidecar current
+    if sidecar_path is not None:
+        os.utime(sidecar_path)
+    layer.triggerRepaint()
+
+
+def gpkg_table_for_layer(layer: QgsVectorLayer) -> tuple[str, str] | None:
+    """ """
+    # direct writes bypass the edit buffer - only for GPKG tables without pending edits
+    if layer.providerType() != "ogr" or layer.isEditable() or layer.isModified():
+        return None
+    uri_parts = QgsProviderRegistry.instance().decodeUri("ogr", layer.source())
+    gpkg_path = uri_parts.get("path")
+    if not gpkg_path or Path(gpkg_path).suffix.lower() != ".gpkg" or not uri_parts.get("layerName"):
+        return None
+    return gpkg_path, uri_parts["layerName"]
+
+
+def update_gpkg_columns(gpkg_path: str, table_name: str, fids: np.ndarray, columns: dict[str, np.ndarray]) -> bool:
+    """ """
+    # False where the table can't be updated directly, e.g. locked by another connection or an unusual schema
+    try:
+        connection = sqlite3.connect(gpkg_path, timeout=SQLITE_TIMEOUT)
+    except sqlite3.Error:
+        return False
+    try:
+        table_info = connection.execute(f'PRAGMA table_info("{table_name}")').fetchall()
+        pk_names = [col_name for _, col_name, _, _, _, pk in table_info if pk]
+        col_names = {col_name for _, col_name, _, _, _, _ in table_info}
+        if len(pk_names) != 1 or any(col_name not in col_names for col_name in columns):
+            return False
+        set_clause = ", ".join(f'"{col_name}" = ?' for col_name in columns)
+        # SQLite stores NaN as NULL
+        rows = zip(*[col_arr.astype(np.float64).tolist() for col_arr in columns.values()], fids.tolist())
+        # one transaction - committed on success and rolled back on failure
+        with connection:
+            connection.executemany(f'UPDATE "{table_name}" SET {set_clause} WHERE "{pk_names[0]}" = ?', rows)
+        return True
+    except sqlite3.Error:
+        return False
+    finally:
+        connection.close()
+
+
+def change_attribute_batches(
+    layer: QgsVectorLayer, fids: np.ndarray, columns: dict[str, np.ndarray], batch_size: int = WRITE_BATCH_SIZE
+) -> None:
+    """ """
+    # bounded attribute maps rather than one dict for the whole layer
+    provider = layer.dataProvider()
+    col_idxs = [layer.fields().indexOf(col_name) for col_name in columns]
+    for batch_start in range(0, len(fids), batch_size):
+        batch_end = batch_start + batch_size
+        # NaN for unreachable nodes is written as NULL
+        col_values = [
+            [None if value != value else value for value in col_arr[batch_start:batch_end].tolist()]
+            for col_arr in columns.values()
+        ]
+        attr_map = {
+            fid: {col_idx: col_vals[row_idx] for col_idx, col_vals in zip(col_idxs, col_values)}
+            for row_idx, fid in enumerate(fids[batch_start:batch_end].tolist())
+        }
+        if not provider.changeAttributeValues(attr_map):
+            raise IOError(f"Unable to write attributes to layer: {layer.name()}")
@@ -0,0 +1,533 @@
+""" """
+from __future__ import annotations
+
+import os
+import threading
+from typing import Any
+
+os.environ["CITYSEER_QUIET_MODE"] = "1"
+
+import geopandas as gpd
+import networkx as nx
+import numpy as np
+import pandas as pd
+import shapely
+from cityseer import config
+from cityseer.metrics import layers, networks
+from cityseer.tools import graphs
+from qgis.core import QgsFeedback
+
+from . import graph_store, parallel
+from .layer_io import LayerSource
+
+MAX_ASSIGN_DIST = 400
+# line layer imports - endpoints within the tolerance share a node, shorter dead ends are removed
+SNAP_TOLERANCE = 0.5
+DESPINE_DIST = 15
+
+
+def nx_from_line_geoms(
+    geoms: np.ndarray,
+    start_keys: np.ndarray | None = None,
+    end_keys: np.ndarray | None = None,
+    edge_keys: np.ndarray | None = None,
+    fids: np.ndarray | None = None,
+    snap_decimals: int = 2,
+) -> nx.MultiGraph:
+    """ """
+    if fids is None:
+        fids = np.arange(len(geoms))
+    if start_keys is None or end_keys is None:
+        # without node keys the topology comes from coincident endpoints
+        geoms, part_idxs = shapely.get_parts(geoms, return_index=True)
+        fids = fids[part_idxs]
+        edge_keys = None
+    start_xys = shapely.get_coordinates(shapely.get_point(geoms, 0))
+    end_xys = shapely.get_coordinates(shapely.get_point(geoms, -1))
+    nx_multigraph = nx.MultiGraph()
+    if start_keys is None or end_keys is None:
+        end_points = np.round(np.vstack([start_xys, end_xys]), snap_decimals)
+        node_xys, node_idxs = np.unique(end_points, axis=0, return_inverse=True)
+        node_idxs = node_idxs.reshape(-1)
+        start_keys = node_idxs[: len(geoms)]
+        end_keys = node_idxs[len(geoms) :]
+        nx_multigraph.add_nodes_from((nd_idx, {"x": x, "y": y}) for nd_idx, (x, y) in enumerate(node_xys.tolist()))
+    else:
+        # geoms are written oriented from start to end node
+        node_xys = dict(zip(end_keys.tolist(), end_xys.tolist()))
+        node_xys.update(zip(start_keys.tolist(), start_xys.tolist()))
+        nx_multigraph.add_nodes_from((nd_key, {"x": x, "y": y}) for nd_key, (x, y) in node_xys.items())
+    if edge_keys is None:
+        nx_multigraph.add_edges_from(
+            (start_nd, end_nd, {"geom": geom, "fid": fid})
+            for start_nd, end_nd, geom, fid in zip(start_keys.tolist(), end_keys.tolist(), geoms, fids.tolist())
+        )
+    else:
+        nx_multigraph.add_edges_from(
+            (start_nd, end_nd, edge_key, {"geom": geom, "fid": fid})
+            for start_nd, end_nd, edge_key, geom, fid in zip(
+                start_keys.tolist(), end_keys.tolist(), edge_keys.tolist(), geoms, fids.tolist()
+            )
+        )
+    return nx_multigraph
+
+
+def connected_labels(n_items: int, pair_as: np.ndarray, pair_bs: np.ndarray) -> np.ndarray:
+    """ """
+    # connected components by label propagation with pointer jumping - each item ends labelled with its smallest member
+    labels = np.arange(n_items)
+    while True:
+        new_labels = labels.copy()
+        np.minimum.at(new_labels, pair_as, labels[pair_bs])
+        np.minimum.at(new_labels, pair_bs, labels[pair_as])
+        new_labels = new_labels[new_labels]
+        if np.array_equal(new_labels, labels):
+            return labels
+        labels = new_labels
+
+
+def snap_points(points: np.ndarray, tolerance: float) -> tuple[np.ndarray, np.ndarray]:
+    """ """
+    # spatial hash grid with tolerance sized cells - points sharing a cell snap together,
+    # and neighbouring cells join where the mean positions of their points are within tolerance
+    cells = np.floor(points / tolerance).astype(np.int64)
+    # a margin of one cell keeps neighbour codes positive
+    cells -= cells.min(axis=0) - 1
+    y_span = int(cells[:, 1].max()) + 2
+    cell_codes, point_cells = np.unique(cells[:, 0] * y_span + cells[:, 1], return_inverse=True)
+    point_cells = point_cells.reshape(-1)
+    n_cells = len(cell_codes)
+    cell_counts = np.bincount(point_cells, minlength=n_cells)
+    cell_xys = np.column_stack(
+        [np.bincount(point_cells, weights=points[:, dim], minlength=n_cells) / cell_counts for dim in (0, 1)]
+    )
+    # half of the eight neighbours - the other half are the same pairs seen from the other cell
+    pair_as: list[np.ndarray] = []
+    pair_bs: list[np.ndarray] = []
+    for x_offset, y_offset in ((1, 0), (0, 1), (1, 1), (1, -1)):
+        nb_codes = cell_codes + x_offset * y_span + y_offset
+        nb_idxs = np.minimum(np.searchsorted(cell_codes, nb_codes), n_cells - 1)
+        cell_idxs = np.flatnonzero(cell_codes[nb_idxs] == nb_codes)
+        nb_idxs = nb_idxs[cell_idxs]
+        close = np.hypot(*(cell_xys[cell_idxs] - cell_xys[nb_idxs]).T) <= tolerance
+        pair_as.append(cell_idxs[close])
+        pair_bs.append(nb_idxs[close])
+    cell_labels = connected_labels(n_cells, np.concatenate(pair_as), np.concatenate(pair_bs))
+    _, point_nodes = np.unique(cell_labels[point_cells], return_inverse=True)
+    point_nodes = point_nodes.reshape(-1)
+    n_nodes = int(point_nodes.max()) + 1
+    node_counts = np.bincount(point_nodes, minlength=n_nodes)
+    node_xys = np.column_stack(
+        [np.bincount(point_nodes, weights=points[:, dim], minlength=n_nodes) / node_counts for dim in (0, 1)]
+    )
+    return node_xys, point_nodes
+
+
+def line_ends(geoms: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """ """
+    # 2D coordinates of lines, with the coordinate indices of each line's first and last vertex
+    coords, coord_idxs = shapely.get_coordinates(geoms, return_index=True)
+    n_coords = np.bincount(coord_idxs, minlength=len(geoms))
+    first_idxs = np.cumsum(n_coords) - n_coords
+    return coords, first_idxs, first_idxs + n_coords - 1
+
+
+def node_idxs_at(node_xys: np.ndarray, xys: np.ndarray) -> np.ndarray:
+    """ """
+    # exact coordinate lookups - complex numbers sort by x and then by y
+    node_codes = node_xys[:, 0] + 1j * node_xys[:, 1]
+    order = np.argsort(node_codes)
+    return order[np.searchsorted(node_codes[order], xys[:, 0] + 1j * xys[:, 1])]
+
+
+def merge_filler_edges(
+    geoms: np.ndarray, start_nds: np.ndarray, end_nds: np.ndarray, node_xys: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """ """
+    # edges meeting at nodes of degree two form chains - each chain is merged into a single edge
+    n_edges = len(geoms)
+    edge_ends = np.concatenate([start_nds, end_nds])
+    degrees = np.bincount(edge_ends, minlength=len(node_xys))
+    filler_ends = np.flatnonzero(degrees[edge_ends] == 2)
+    filler_ends = filler_ends[np.argsort(edge_ends[filler_ends], kind="stable")]
+    filler_pairs = (filler_ends % n_edges).reshape(-1, 2)
+    _, edge_chains, chain_sizes = np.unique(
+        connected_labels(n_edges, filler_pairs[:, 0], filler_pairs[:, 1]), return_inverse=True, return_counts=True
+    )
+    edge_chains = edge_chains.reshape(-1)
+    chained = chain_sizes[edge_chains] > 1
+    if not chained.any():
+        return geoms, start_nds, end_nds
+    chained_idxs = np.flatnonzero(chained)
+    chained_idxs = chained_idxs[np.argsort(edge_chains[chained_idxs], kind="stable")]
+    _, chain_idxs = np.unique(edge_chains[chained_idxs], return_inverse=True)
+    chain_idxs = chain_idxs.reshape(-1)
+    merged = shapely.line_merge(shapely.multilinestrings(geoms[chained_idxs], indices=chain_idxs))
+    # chains that do not resolve to a single line keep their edges
+    merged_lines = shapely.get_type_id(merged) == shapely.GeometryType.LINESTRING
+    keep = ~chained
+    keep[chained_idxs[~merged_lines[chain_idxs]]] = True
+    merged = merged[merged_lines]
+    coords, first_idxs, last_idxs = line_ends(merged)
+    return (
+        np.concatenate([geoms[keep], merged]),
+        np.concatenate([start_nds[keep], node_idxs_at(node_xys, coords[first_idxs])]),
+        np.concatenate([end_nds[keep], node_idxs_at(node_xys, coords[last_idxs])]),
+    )
+
+
+def line_network_arrays(
+    geoms: np.ndarray,
+    snap_tolerance: float = SNAP_TOLERANCE,
+    despine: float = DESPINE_DIST,
+    merge_fillers: bool = True,
+    feedback: QgsFeedback | None = None,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray] | None:
+    """ """
+    # network topology for an arbitrary line layer, built on arrays rather than networkx
+    # returns edge geoms oriented from start to end node, start and end node indices, and node coordinates
+    geoms = geoms[~shapely.is_missing(geoms)]
+    # splitting parts copies every geometry - skipped unless there are multi-part lines
+    if (shapely.get_type_id(geoms) != shapely.GeometryType.LINESTRING).any():
+        geoms = shapely.get_parts(geoms)
+    geoms = geoms[shapely.get_num_coordinates(geoms) >= 2]
+    if len(geoms) == 0:
+        return np.empty(0, dtype=object), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty((0, 2))
+    n_geoms = len(geoms)
+    coords, first_idxs, last_idxs = line_ends(geoms)
+    node_xys, point_nodes = snap_points(np.vstack([coords[first_idxs], coords[last_idxs]]), snap_tolerance)
+    start_nds = point_nodes[:n_geoms]
+    end_nds = point_nodes[n_geoms:]
+    # end vertices moved onto their snapped nodes - Z values are dropped
+    coords[first_idxs] = node_xys[start_nds]
+    coords[last_idxs] = node_xys[end_nds]
+    geoms = shapely.linestrings(coords, indices=np.repeat(np.arange(n_geoms), last_idxs - first_idxs + 1))
+    del coords
+    if feedback is not None:
+        if feedback.isCanceled():
+            return None
+        feedback.setProgress(40)
+    # edges collapsed onto a single node by snapping
+    lengths = shapely.length(geoms)
+    keep = (start_nds != end_nds) | (lengths > snap_tolerance)
+    # short dead ends - a single pass, as spurs left behind are usually digitising noise
+    if despine > 0:
+        degrees = np.bincount(np.concatenate([start_nds[keep], end_nds[keep]]), minlength=len(node_xys))
+        dangling = (degrees[start_nds] == 1) | (degrees[end_nds] == 1)
+        keep &= ~(dangling & (lengths < despine))
+    geoms = geoms[keep]
+    start_nds = start_nds[keep]
+    end_nds = end_nds[keep]
+    if merge_fillers and len(geoms):
+        geoms, start_nds, end_nds = merge_filler_edges(geoms, start_nds, end_nds, node_xys)
+    if feedback is not None:
+        if feedback.isCanceled():
+            return None
+        feedback.setProgress(80)
+    # nodes left without edges are dropped
+    node_ids, node_idxs = np.unique(np.concatenate([start_nds, end_nds]), return_inverse=True)
+    node_idxs = node_idxs.reshape(-1)
+    return geoms, node_idxs[: len(geoms)], node_idxs[len(geoms) :], node_xys[node_ids]
+
+
+def parallel_edge_keys(start_nds: np.ndarray, end_nds: np.ndarray) -> np.ndarray:
+    """ """
+    # networkx style keys - parallel edges between the same pair of nodes are numbered from zero
+    pair_lows = np.minimum(start_nds, end_nds)
+    pair_highs = np.maximum(start_nds, end_nds)
+    order = np.lexsort((pair_highs, pair_lows))
+    new_pairs = np.ones(len(order), dtype=bool)
+    new_pairs[1:] = (np.diff(pair_lows[order]) != 0) | (np.diff(pair_highs[order]) != 0)
+    group_starts = np.maximum.accumulate(np.where(new_pairs, np.arange(len(order)), 0))
+    edge_keys = np.empty(len(order), dtype=np.int64)
+    edge_keys[order] = np.arange(len(order)) - group_starts
+    return edge_keys
+
+
+def nx_from_layer(layer_source: LayerSource, feedback: QgsFeedback | None = None) -> nx.MultiGraph:
+    """ """
+    # layers imported by the plugin reload from their graph sidecar
+    if layer_source.graph_path is not None:
+        return graph_store.load_graph(layer_source.graph_path)
+    fids, geoms, values = layer_source.read_arrays(["start_nd", "end_nd", "edge_key"], feedback)
+    if "start_nd" in values and "end_nd" in values:
+        return nx_from_line_geoms(geoms, values["start_nd"], values["end_nd"], values.get("edge_key"), fids=fids)
+    return nx_from_line_geoms(geoms, fids=fids)
+
+
+class LayerNetwork:
+    """ """
+
+    # a network layer converted once and shared across runs - filled on first use from whichever task needs it
+    nx_multigraph: nx.MultiGraph | None
+    crs_code: int | str | None
+    nodes_gdf: gpd.GeoDataFrame | None
+    network_structure: Any
+    lock: threading.Lock
+
+    def __init__(self):
+        """ """
+        self.nx_multigraph = None
+        self.crs_code = None
+        self.nodes_gdf = None
+        self.network_structure = None
+        # tasks sharing an entry may run concurrently - the first converts, the others wait
+        self.lock = threading.Lock()
+
+    def graph(self, layer_source: LayerSource, feedback: QgsFeedback | None = None) -> nx.MultiGraph | None:
+        """ """
+        with self.lock:
+            if self.nx_multigraph is None:
+                nx_multigraph = nx_from_layer(layer_source, feedback)
+                # cancelled reads can be partial and are not kept
+                if feedback is not None and feedback.isCanceled():
+                    return None
+                self.nx_multigraph = nx_multigraph
+            return self.nx_multigraph
+
+    def structure(self, crs_code: int | str) -> tuple[gpd.GeoDataFrame, Any]:
+        """ """
+        with self.lock:
+            if self.nodes_gdf is None or self.crs_code != crs_code:
+                self.nodes_gdf, self.network_structure = graphs.network_structure_from_nx(
+                    self.nx_multigraph, crs=crs_code
+                )
+                self.crs_code = crs_code
+            # cityseer writes metrics into the nodes frame - each run works on a copy
+            return self.nodes_gdf.copy(), self.network_structure
+
+
+def nx_decompose(
+    nx_multigraph: nx.MultiGraph, decompose_max: float, feedback: QgsFeedback | None = None
+) -> nx.MultiGraph | None:
+    """ """
+    # a vectorised equivalent of cityseer's graphs.nx_decompose:
+    # each edge is split into the fewest equal length parts not exceeding decompose_max
+    edges = list(nx_multigraph.edges(keys=True, data=True))
+    n_edges = len(edges)
+    geoms = graph_store.edge_geoms(nx_multigraph, edges)
+    if feedback is not None:
+        if feedback.isCanceled():
+            return None
+        feedback.setProgress(20)
+    # vertex distances along each edge
+    lengths = shapely.length(geoms)
+    n_parts = np.maximum(1, np.ceil(lengths / decompose_max)).astype(np.int64)
+    part_lengths = lengths / n_parts
+    coords, coord_edge_idxs = shapely.get_coordinates(geoms, return_index=True)
+    seg_lengths = np.hypot(*np.diff(coords, axis=0).T)
+    seg_lengths[coord_edge_idxs[1:] != coord_edge_idxs[:-1]] = 0
+    cum_dists = np.concatenate([[0], np.cumsum(seg_lengths)])
+    first_coord_idxs = np.searchsorted(coord_edge_idxs, np.arange(n_edges))
+    vert_dists = cum_dists - cum_dists[first_coord_idxs][coord_edge_idxs]
+    safe_part_lengths = np.where(part_lengths > 0, part_lengths, 1)[coord_edge_idxs]
+    vert_parts = np.minimum(np.floor(vert_dists / safe_part_lengths), n_parts[coord_edge_idxs] - 1).astype(np.int64)
+    # cut points between parts
+    n_cuts = n_parts - 1
+    cut_offsets = np.cumsum(n_cuts) - n_cuts
+    cut_edge_idxs = np.repeat(np.arange(n_edges), n_cuts)
+    cut_nums = np.arange(len(cut_edge_idxs)) - cut_offsets[cut_edge_idxs] + 1
+    cut_dists = cut_nums * part_lengths[cut_edge_idxs]
+    cut_xys = shapely.get_coordinates(shapely.line_interpolate_point(geoms[cut_edge_idxs], cut_dists)).reshape(-1, 2)
+    if feedback is not None:
+        if feedback.isCanceled():
+            return None
+        feedback.setProgress(50)
+    # cut points end one part and start the next
+    all_edge_idxs = np.concatenate([coord_edge_idxs, cut_edge_idxs, cut_edge_idxs])
+    all_parts = np.concatenate([vert_parts, cut_nums - 1, cut_nums])
+    all_dists = np.concatenate([vert_dists, cut_dists, cut_dists])
+    all_xys = np.vstack([coords, cut_xys, cut_xys])
+    order = np.lexsort((all_dists, all_parts, all_edge_idxs))
+    part_offsets = np.cumsum(n_parts) - n_parts
+    part_geoms = shapely.linestrings(all_xys[order], indices=(part_offsets[all_edge_idxs] + all_parts)[order])
+    if feedback is not None:
+        if feedback.isCanceled():
+            return None
+        feedback.setProgress(80)
+    # new nodes at cut points - labelled as per cityseer's decomposition
+    cut_labels = np.empty(len(cut_edge_idxs) + 1, dtype=object)
+    cut_labels[:-1] = [
+        f"{edges[edge_idx][0]}±{edges[edge_idx][1]}±{edges[edge_idx][2]}±{cut_num}"
+        for edge_idx, cut_num in zip(cut_edge_idxs.tolist(), cut_nums.tolist())
+    ]
+    decomposed = nx.MultiGraph()
+    decomposed.add_nodes_from(nx_multigraph.nodes(data=True))
+    decomposed.add_nodes_from(
+        (cut_label, {"x": x, "y": y}) for cut_label, (x, y) in zip(cut_labels[:-1], cut_xys.tolist())
+    )
+    edge_starts = np.empty(n_edges, dtype=object)
+    edge_starts[:] = [start_nd for start_nd, _, _, _ in edges]
+    edge_ends = np.empty(n_edges, dtype=object)
+    edge_ends[:] = [end_nd for _, end_nd, _, _ in edges]
+    part_edge_idxs = np.repeat(np.arange(n_edges), n_parts)
+    part_nums = np.arange(len(part_edge_idxs)) - part_offsets[part_edge_idxs]
+    # the trailing sentinel keeps indexing valid where an edge has no cuts
+    prev_cut_idxs = np.where(part_nums > 0, cut_offsets[part_edge_idxs] + part_nums - 1, -1)
+    next_cut_idxs = np.where(part_nums < n_parts[part_edge_idxs] - 1, cut_offsets[part_edge_idxs] + part_nums, -1)
+    part_starts = np.where(part_nums == 0, edge_starts[part_edge_idxs], cut_labels[prev_cut_idxs])
+    part_ends = np.where(part_nums == n_parts[part_edge_idxs] - 1, edge_ends[part_edge_idxs], cut_labels[next_cut_idxs])
+    decomposed.add_edges_from(
+        (start_nd, end_nd, {"geom": geom}) for start_nd, end_nd, geom in zip(part_starts, part_ends, part_geoms)
+    )
+    return decomposed
+
+
+def validate_measures(measures: list[str], angular: bool) -> None:
+    """ """
+    # the measure checks of cityseer's networks.node_centrality, with the same errors
+    if not angular:
+        heuristic = "shortest (non-angular)"
+        options = (
+            "node_density",
+            "node_farness",
+            "node_cycles",
+            "node_harmonic",
+            "node_beta",
+            "node_betweenness",
+            "node_betweenness_beta",
+        )
+    else:
+        heuristic = "simplest (angular)"
+        options = ("node_harmonic_angular", "node_betweenness_angular")
+    if not measures:
+        raise ValueError("Please select at least one measure to compute.")
+    for measure_idx, measure in enumerate(measures):
+        if measure not in options:
+            raise ValueError(
+                f"Invalid network measure: {measure}. "
+                f'Must be one of {", ".join(options)} when using {heuristic} path heuristic.'
+            )
+        if measure in measures[:measure_idx]:
+            raise ValueError(f"Please remove duplicate measure: {measure}.")
+
+
+def compute_centrality(
+    layer_network: LayerNetwork,
+    crs_code: int | str,
+    measures: list[str],
+    distances: list[int],
+    angular: bool = False,
+    workers: int = 1,
+    feedback: QgsFeedback | None = None,
+) -> pd.DataFrame | None:
+    """ """
+    # cityseer computes every distance threshold in one traversal from each node
+    nodes_gdf, network_structure = layer_network.structure(crs_code)
+    if workers > 1 and network_structure.nodes.count >= parallel.PARALLEL_MIN_NODES:
+        # the same traversals split by source node across worker processes
+        # checked here as networks.node_centrality would - workers would otherwise only report errors on stderr
+        network_structure.validate()
+        validate_measures(measures, angular)
+        pair_distances, betas = networks.pair_distances_betas(distances)
+        measures_data = parallel.node_centrality(
+            network_structure, measures, pair_distances, betas, angular, n_workers=workers, feedback=feedback
+        )
+        if measures_data is None:
+            return None
+        for measure_idx, measure in enumerate(measures):
+            for dist_idx, dist in enumerate(pair_distances):
+                nodes_gdf[config.prep_gdf_key(f"{measure}_{dist}")] = measures_data[measure_idx][dist_idx]
+    else:
+        nodes_gdf = networks.node_centrality(
+            measures=measures,
+            network_structure=network_structure,
+            nodes_gdf=nodes_gdf,
+            distances=distances,
+            angular=angular,
+        )
+    metric_cols = [col for col in nodes_gdf.columns if col.startswith("cc_metric_")]
+    return pd.DataFrame(nodes_gdf[metric_cols])
+
+
+def edge_values_from_nodes(nx_multigraph: nx.MultiGraph, nodes_df: pd.DataFrame) -> tuple[np.ndarray, pd.DataFrame]:
+    """ """
+    # network layers hold edges - each edge takes the mean of its two nodes
+    edges = list(nx_multigraph.edges(keys=True, data=True))
+    fids = np.array([data.get("fid", -1) for _, _, _, data in edges], dtype=np.int64)
+    start_idxs = nodes_df.index.get_indexer([start_nd for start_nd, _, _, _ in edges])
+    end_idxs = nodes_df.index.get_indexer([end_nd for _, end_nd, _, _ in edges])
+    node_values = nodes_df.to_numpy(dtype=np.float64)
+    edge_values = (node_values[start_idxs] + node_values[end_idxs]) / 2
+    return fids, pd.DataFrame(edge_values, columns=nodes_df.columns)
+
+
+def assign_data_to_network(
+    nx_multigraph: nx.MultiGraph, data_geoms: np.ndarray, max_assign_dist: int = MAX_ASSIGN_DIST
+) -> tuple[np.ndarray, np.ndarray]:
+    """ """
+    # nearest street via an STRtree - data takes the closer node along that street and the far node as fallback
+    edges = list(nx_multigraph.edges(keys=True, data=True))
+    nearest_keys = np.full(len(data_geoms), None, dtype=object)
+    next_nearest_keys = np.full(len(data_geoms), None, dtype=object)
+    if not edges or not len(data_geoms):
+        return nearest_keys, next_nearest_keys
+    geoms = graph_store.edge_geoms(nx_multigraph, edges)
+    start_keys = np.empty(len(edges), dtype=object)
+    start_keys[:] = [start_nd for start_nd, _, _, _ in edges]
+    end_keys = np.empty(len(edges), dtype=object)
+    end_keys[:] = [end_nd for _, end_nd, _, _ in edges]
+    data_points = shapely.centroid(data_geoms)
+    data_idxs, edge_idxs = shapely.STRtree(geoms).query_nearest(data_points, max_distance=max_assign_dist)
+    # ties return several edges per point - keep the first
+    data_idxs, first_idxs = np.unique(data_idxs, return_index=True)
+    edge_idxs = edge_idxs[first_idxs]
+    dist_along = shapely.line_locate_point(geoms[edge_idxs], data_points[data_idxs])
+    near_start = dist_along <= shapely.length(geoms[edge_idxs]) / 2
+    nearest_keys[data_idxs] = np.where(near_start, start_keys[edge_idxs], end_keys[edge_idxs])
+    next_nearest_keys[data_idxs] = np.where(near_start, end_keys[edge_idxs], start_keys[edge_idxs])
+    return nearest_keys, next_nearest_keys
+
+
+def compute_landuses(
+    layer_network: LayerNetwork,
+    crs_code: int | str,
+    data_geoms: np.ndarray,
+    landuse_labels: np.ndarray,
+    nearest_keys: np.ndarray,
+    next_nearest_keys: np.ndarray,
+    accessibility_keys: list[str],
+    mixed_uses: bool,
+    distances: list[int],
+    max_assign_dist: int = MAX_ASSIGN_DIST,
+) -> pd.DataFrame:
+    """ """
+    nodes_gdf, network_structure = layer_network.structure(crs_code)
+    base_cols = set(nodes_gdf.columns)
+    # network structure node indices follow the graph's node order
+    node_index = pd.Index(list(layer_network.nx_multigraph.nodes()))
+    # NULL land uses would otherwise count as a "None" class in the mixed use and accessibility results
+    assigned = pd.notna(nearest_keys) & pd.notna(landuse_labels)
+    # cityseer skips its own assignment when the assignment columns are present
+    data_gdf = gpd.GeoDataFrame(
+        {
+            "landuse": landuse_labels[assigned].astype(str),
+            "nearest_assign": node_index.get_indexer(nearest_keys[assigned]),
+            "next_nearest_assign": node_index.get_indexer(next_nearest_keys[assigned]),
+        },
+        geometry=shapely.centroid(data_geoms[assigned]),
+        crs=crs_code,
+    )
+    if accessibility_keys:
+        nodes_gdf, data_gdf = layers.compute_accessibilities(
+            data_gdf,
+            landuse_column_label="landuse",
+            accessibility_keys=accessibility_keys,
+            nodes_gdf=nodes_gdf,
+            network_structure=network_structure,
+            max_netw_assign_dist=max_assign_dist,
+            distances=distances,
+        )
+    if mixed_uses:
+        nodes_gdf, data_gdf = layers.compute_mixed_uses(
+            data_gdf,
+            landuse_column_label="landuse",
+            nodes_gdf=nodes_gdf,
+            network_structure=network_structure,
+            max_netw_assign_dist=max_assign_dist,
+            distances=distances,
+        )
+    metric_cols = [
+        col for col in nodes_gdf.columns if col not in base_cols and pd.api.types.is_numeric_dtype(nodes_gdf[col])
+    ]
+    return pd.DataFrame(nodes_gdf[metric_cols])
@@ -0,0 +1,175 @@
+""" """
+from __future__ import annotations
+
+import json
+import re
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import shapely
+from pyproj import Transformer
+from qgis.core import QgsFeedback
+from shapely import geometry
+
+# padding in degrees around the extents so that ways crossing the boundary keep their outer nodes
+BBOX_PADDING = 0.01
+
+# way tags read by cityseer's graphs.nx_from_osm - the names, routes and highways edge attributes
+GRAPH_TAGS = ("name", "ref", "highway")
+# python equivalents of the tag filters in osm_graph.OSM_WAY_FILTER_TEMPLATE
+EXCLUDED_TAGS: dict[str, re.Pattern[str]] = {
+    "highway": re.compile(
+        "motorway|motorway_link|bus_guideway|escape|raceway|proposed|planned|abandoned|platform|construction"
+    ),
+    "service": re.compile("parking_aisle"),
+    "amenity": re.compile("charging_station|parking|fuel|motorcycle_parking|parking_entrance|parking_space"),
+    "access": re.compile("private|customers"),
+}
+
+
+def way_matches(tags: dict[str, str]) -> bool:
+    """ """
+    if "highway" not in tags:
+        return False
+    if tags.get("area") == "yes" or tags.get("indoor") == "yes":
+        return False
+    for tag_key, pattern in EXCLUDED_TAGS.items():
+        if tag_key in tags and pattern.search(tags[tag_key]):
+            return False
+    return True
+
+
+class OsmExtractCollector:
+    """ """
+
+    bbox: tuple[float, float, float, float]
+    nodes: dict[int, tuple[float, float]]
+    ways: list[tuple[int, list[int], dict[str, str]]]
+
+    def __init__(self, bbox: tuple[float, float, float, float]):
+        """ """
+        self.bbox = bbox
+        self.nodes = {}
+        self.ways = []
+
+    def add_node(self, node_id: int, lng: float, lat: float) -> None:
+        """ """
+        min_lng, min_lat, max_lng, max_lat = self.bbox
+        if min_lng <= lng <= max_lng and min_lat <= lat <= max_lat:
+            self.nodes[node_id] = (lng, lat)
+
+    def add_way(self, way_id: int, node_refs: list[int], tags: dict[str, str]) -> None:
+        """ """
+        # nodes precede ways in OSM extracts, so ways entirely outside the bbox can be dropped immediately
+        if not way_matches(tags):
+            return
+        if not any(node_ref in self.nodes for node_ref in node_refs):
+            return
+        # only the tags read into the graph are kept - names also steer node consolidation when simplifying
+        self.ways.append((way_id, node_refs, {key: tags[key] for key in GRAPH_TAGS if key in tags}))
+
+    def osm_json(self, extents_poly: geometry.Polygon | geometry.MultiPolygon, crs_code: int | str) -> str:
+        """ """
+        # keep ways with at least one node inside the extents - same as the overpass poly filter
+        node_ids = np.fromiter(self.nodes.keys(), dtype=np.int64, count=len(self.nodes))
+        lng_lats = np.array(list(self.nodes.values()), dtype=np.float64).reshape(-1, 2)
+        transformer = Transformer.from_crs(4326, crs_code, always_xy=True)
+        xs, ys = transformer.transform(lng_lats[:, 0], lng_lats[:, 1])
+        inside_ids = set(node_ids[shapely.contains_xy(extents_poly, xs, ys)].tolist())
+        elements: list[dict[str, Any]] = []
+        used_ids: set[int] = set()
+        for way_id, node_refs, tags in self.ways:
+            if not any(node_ref in inside_ids for node_ref in node_refs):
+                continue
+            # split ways wherever nodes fall outside the padded bbox
+            run: list[int] = []
+            for node_ref in node_refs + [None]:
+                if node_ref is not None and node_ref in self.nodes:
+                    run.append(node_ref)
+                    continue
+                if len(run) > 1:
+                    elements.append({"type": "way", "id": way_id, "nodes": run, "tags": tags})
+                    used_ids.update(run)
+                run = []
+        for node_id in sorted(used_ids):
+            lng, lat = self.nodes[node_id]
+            elements.append({"type": "node", "id": node_id, "lat": lat, "lon": lng})
+        return json.dumps({"elements": elements})
+
+
+def parse_osm_xml(file_path: Path, collector: OsmExtractCollector, feedback: QgsFeedback | None = None) -> None:
+    """ """
+    file_size = file_path.stat().st_size
+    with open(file_path, "rb") as osm_file:
+        context = ET.iterparse(osm_file, events=("start", "end"))
+        _, root = next(context)
+        counter = 0
+        for event, elem in context:
+            if event != "end":
+                continue
+            if elem.tag == "node":
+                collector.add_node(int(elem.get("id")), float(elem.get("lon")), float(elem.get("lat")))
+            elif elem.tag == "way":
+                node_refs = [int(nd.get("ref")) for nd in elem.iter("nd")]
+                tags = {tag.get("k"): tag.get("v") for tag in elem.iter("tag")}
+                collector.add_way(int(elem.get("id")), node_refs, tags)
+            elif elem.tag == "relation":
+                # relations follow ways - nothing further is needed
+                break
+            else:
+                continue
+            # discard parsed elements so that memory stays flat
+            root.clear()
+            counter += 1
+            if feedback is not None and counter % 100000 == 0:
+                if feedback.isCanceled():
+                    return
+                feedback.setProgress(100 * osm_file.tell() / file_size)
+
+
+def parse_osm_pbf(file_path: Path, collector: OsmExtractCollector, feedback: QgsFeedback | None = None) -> None:
+    """ """
+    try:
+        import osmium
+    except ImportError as err:
+        raise ImportError(
+            "Reading .osm.pbf files requires the osmium package, e.g. install per: pip install osmium"
+        ) from err
+
+    class PbfHandler(osmium.SimpleHandler):
+        """ """
+
+        def node(self, node: Any) -> None:
+            """ """
+            if node.location.valid():
+                collector.add_node(node.id, node.location.lon, node.location.lat)
+
+        def way(self, way: Any) -> None:
+            """ """
+            if feedback is not None and feedback.isCanceled():
+                return
+            tags = {tag.k: tag.v for tag in way.tags}
+            collector.add_way(way.id, [node_ref.ref for node_ref in way.nodes], tags)
+
+    PbfHandler().apply_file(str(file_path))
+
+
+def osm_json_from_file(
+    file_path: Path,
+    extents_poly: geometry.Polygon | geometry.MultiPolygon,
+    crs_code: int | str,
+    feedback: QgsFeedback | None = None,
+) -> str:
+    """ """
+    transformer = Transformer.from_crs(crs_code, 4326, always_xy=True)
+    min_lng, min_lat, max_lng, max_lat = transformer.transform_bounds(*extents_poly.bounds)
+    collector = OsmExtractCollector(
+        (min_lng - BBOX_PADDING, min_lat - BBOX_PADDING, max_lng + BBOX_PADDING, max_lat + BBOX_PADDING)
+    )
+    if file_path.name.endswith(".pbf"):
+        parse_osm_pbf(file_path, collector, feedback)
+    else:
+        parse_osm_xml(file_path, collector, feedback)
+    return collector.osm_json(extents_poly, crs_code)
@@ -0,0 +1,174 @@
+""" """
+# the Overpass request and graph build shared by imports in QGIS and by batch workers - imports neither QGIS nor the
+# plugin package
+from __future__ import annotations
+
+import json
+import os
+from typing import TYPE_CHECKING
+
+os.environ["CITYSEER_QUIET_MODE"] = "1"
+
+import networkx as nx
+import numpy as np
+import shapely
+from cityseer.tools import graphs, io
+from pyproj import CRS, Transformer
+from shapely import geometry
+
+if TYPE_CHECKING:
+    from qgis.core import QgsFeedback
+
+# the filters of cityseer's default io.osm_graph_from_poly request - the highway exclusions split over two lines
+OSM_WAY_FILTER_TEMPLATE = """
+way["highway"]
+["area"!="yes"]
+["highway"!~"motorway|motorway_link|bus_guideway|escape|raceway"]
+["highway"!~"proposed|planned|abandoned|platform|construction"]
+["service"!~"parking_aisle"]
+["amenity"!~"charging_station|parking|fuel|motorcycle_parking|parking_entrance|parking_space"]
+["access"!~"private|customers"]
+["indoor"!="yes"]
+(poly:"{geom_osm}");
+"""
+OSM_REQUEST_TEMPLATE = """
+[out:json];
+({way_filters});
+out body;
+>;
+out qt;
+"""
+# way counts for a tile - all ways, then ways edited since the last fetch
+OSM_PROBE_TEMPLATE = """
+[out:json];
+({way_filters});
+out count;
+({newer_way_filters});
+out count;
+"""
+
+
+def osm_way_filters(
+    extents_poly: geometry.Polygon | geometry.MultiPolygon, crs_code: int | str, newer: str | None = None
+) -> str:
+    """ """
+    transformer = Transformer.from_crs(crs_code, 4326, always_xy=True)
+    # overpass poly filters take a single ring - multipolygons are requested as a union of their parts
+    polys = extents_poly.geoms if isinstance(extents_poly, geometry.MultiPolygon) else [extents_poly]
+    way_filters = ""
+    for poly in polys:
+        coords = [transformer.transform(easting, northing) for easting, northing in poly.exterior.coords]
+        geom_osm = str.join(" ", [f"{lat} {lng}" for lng, lat in coords])
+        way_filters += OSM_WAY_FILTER_TEMPLATE.format(geom_osm=geom_osm)
+    if newer is not None:
+        way_filters = way_filters.replace('way["highway"]', f'way(newer:"{newer}")["highway"]')
+    return way_filters
+
+
+def osm_request_from_poly(extents_poly: geometry.Polygon | geometry.MultiPolygon, crs_code: int | str) -> str:
+    """ """
+    return OSM_REQUEST_TEMPLATE.format(way_filters=osm_way_filters(extents_poly, crs_code))
+
+
+def osm_probe_from_poly(
+    extents_poly: geometry.Polygon | geometry.MultiPolygon, crs_code: int | str, newer: str
+) -> tuple[int, int]:
+    """ """
+    # counts are a fraction of the size of a full response - edits show as newer ways, deletions as a lower total
+    osm_request = OSM_PROBE_TEMPLATE.format(
+        way_filters=osm_way_filters(extents_poly, crs_code),
+        newer_way_filters=osm_way_filters(extents_poly, crs_code, newer=newer),
+    )
+    total_count, newer_count = [
+        int(element["tags"]["ways"]) for element in json.loads(fetch_osm_json(osm_request))["elements"]
+    ]
+    return total_count, newer_count
+
+
+def osm_json_stats(osm_json: str) -> tuple[int, str | None]:
+    """ """
+    # way count and the time up to which Overpass had applied edits - later newer filters start from there
+    osm_data = json.loads(osm_json)
+    way_count = sum(1 for element in osm_data["elements"] if element["type"] == "way")
+    return way_count, osm_data.get("osm3s", {}).get("timestamp_osm_base")
+
+
+def fetch_osm_json(osm_request: str, timeout: int = 300, max_tries: int = 3) -> str:
+    """ """
+    osm_response = io.fetch_osm_network(osm_request, timeout=timeout, max_tries=max_tries)
+    if osm_response is None:
+        raise IOError("Unable to fetch OSM data from the Overpass API.")
+    return osm_response.text
+
+
+def nx_from_osm_json(osm_json: str, to_crs_code: int | str) -> nx.MultiGraph:
+    """ """
+    nx_wgs = graphs.nx_from_osm(osm_json=osm_json)
+    return nx_crs_conversion(nx_wgs, 4326, to_crs_code)
+
+
+def nx_crs_conversion(nx_multigraph: nx.MultiGraph, from_crs_code: int | str, to_crs_code: int | str) -> nx.MultiGraph:
+    """ """
+    # cityseer's nx_epsg_conversion only takes EPSG codes - pyproj also takes other authids and WKT
+    if not CRS.from_user_input(to_crs_code).is_projected:
+        raise ValueError("Networks require a projected CRS.")
+    transformer = Transformer.from_crs(from_crs_code, to_crs_code, always_xy=True)
+    # converted in place - the graph is freshly built from the OSM response
+    node_keys = list(nx_multigraph.nodes())
+    xs = np.array([nx_multigraph.nodes[node_key]["x"] for node_key in node_keys], dtype=np.float64)
+    ys = np.array([nx_multigraph.nodes[node_key]["y"] for node_key in node_keys], dtype=np.float64)
+    eastings, northings = transformer.transform(xs, ys)
+    for node_key, easting, northing in zip(node_keys, eastings.tolist(), northings.tolist()):
+        nx_multigraph.nodes[node_key]["x"] = easting
+        nx_multigraph.nodes[node_key]["y"] = northing
+    edge_data = [data for _, _, data in nx_multigraph.edges(data=True) if "geom" in data]
+    if edge_data:
+        geoms = shapely.transform(
+            np.array([data["geom"] for data in edge_data], dtype=object),
+            lambda coords: np.column_stack(transformer.transform(coords[:, 0], coords[:, 1])),
+        )
+        for data, geom in zip(edge_data, geoms):
+            data["geom"] = geom
+    return nx_multigraph
+
+
+def nx_simplify(
+    nx_multigraph: nx.MultiGraph,
+    buffer_dist: int = 15,
+    remove_parallel: bool = True,
+    iron_edges: bool = True,
+    remove_disconnected: bool = True,
+    feedback: QgsFeedback | None = None,
+) -> nx.MultiGraph:
+    """ """
+    # same steps and arguments as cityseer's io.osm_graph_from_poly, split so that cancellation is checked in between
+    steps = [
+        lambda g: graphs.nx_simple_geoms(g),
+        lambda g: graphs.nx_remove_filler_nodes(g),
+        lambda g: graphs.nx_remove_dangling_nodes(g, despine=20, remove_disconnected=remove_disconnected),
+        lambda g: graphs.nx_consolidate_nodes(
+            g, buffer_dist=buffer_dist, crawl=True, min_node_group=4, cent_min_degree=4, cent_min_names=4
+        ),
+    ]
+    if remove_parallel:
+        steps += [
+            lambda g: graphs.nx_split_opposing_geoms(g, buffer_dist=buffer_dist),
+            lambda g: graphs.nx_consolidate_nodes(
+                g, buffer_dist=buffer_dist, crawl=False, min_node_degree=2, cent_min_degree=4, cent_min_names=4
+            ),
+        ]
+    if iron_edges:
+        steps.append(lambda g: graphs.nx_iron_edges(g))
+    for step_idx, step in enumerate(steps):
+        if feedback is not None:
+            if feedback.isCanceled():
+                break
+            feedback.setProgress(100 * step_idx / len(steps))
+        nx_multigraph = step(nx_multigraph)
+    return nx_multigraph
+
+
+def nx_simple_geoms(nx_multigraph: nx.MultiGraph) -> nx.MultiGraph:
+    """ """
+    # unsimplified graphs still require edge geoms for writing
+    return graphs.nx_simple_geoms(nx_multigraph)
@@ -0,0 +1,142 @@
+""" """
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import tempfile
+import time
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from qgis.core import QgsFeedback
+
+from .batch import POLL_INTERVAL, python_executable
+
+WORKER_PATH = Path(__file__).parent / "centrality_worker.py"
+CENTRALITY_WORKERS = os.cpu_count() or 1
+# smaller networks are computed in process - worker start up would outweigh the traversals
+PARALLEL_MIN_NODES = 20000
+# workers share numba's compiled functions - the plugin directory is not necessarily writable
+NUMBA_CACHE_DIR = Path(tempfile.gettempdir()) / "cityseer_numba_cache"
+
+
+def shared_block(arr: np.ndarray) -> tuple[shared_memory.SharedMemory, dict[str, Any]]:
+    """ """
+    # copied once - workers map the block rather than receiving pickled copies
+    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[:] = arr
+    return shm, {"name": shm.name, "dtype": arr.dtype.str, "shape": list(arr.shape)}
+
+
+def worker_error(log_path: Path, returncode: int) -> str:
+    """ """
+    stderr = log_path.read_text().strip() if log_path.exists() else ""
+    return stderr.splitlines()[-1] if stderr else f"exit code {returncode}"
+
+
+def node_centrality(
+    network_structure: Any,
+    measures: list[str],
+    distances: np.ndarray,
+    betas: np.ndarray,
+    angular: bool,
+    n_workers: int = CENTRALITY_WORKERS,
+    feedback: QgsFeedback | None = None,
+) -> np.ndarray | None:
+    """ """
+    # source nodes are partitioned across worker processes: closeness accrues to each worker's own sources and
+    # betweenness is counted from the lower indexed node of each pair, so the sum of the workers' arrays is exact
+    nodes = network_structure.nodes
+    edges = network_structure.edges
+    n_workers = max(1, min(n_workers, nodes.count))
+    network_arrays = {
+        "live": nodes.live,
+        "edges_start": edges.start,
+        "edges_end": edges.end,
+        "edges_length": edges.length,
+        "edges_angle_sum": edges.angle_sum,
+        "edges_imp_factor": edges.imp_factor,
+        "edges_in_bearing": edges.in_bearing,
+        "edges_out_bearing": edges.out_bearing,
+    }
+    measures_data = np.zeros((len(measures), len(distances), nodes.count), dtype=np.float32)
+    out_info = {"dtype": measures_data.dtype.str, "shape": list(measures_data.shape)}
+    # one thread per worker - the processes provide the parallelism
+    env = dict(os.environ)
+    env["NUMBA_NUM_THREADS"] = "1"
+    env.setdefault("NUMBA_CACHE_DIR", str(NUMBA_CACHE_DIR))
+    blocks: list[shared_memory.SharedMemory] = []
+    processes: list[subprocess.Popen] = []
+    log_files: list[Any] = []
+    with tempfile.TemporaryDirectory() as log_dir:
+        try:
+            block_infos: dict[str, dict[str, Any]] = {}
+            for key, arr in network_arrays.items():
+                shm, block_infos[key] = shared_block(arr)
+                blocks.append(shm)
+            out_blocks: list[shared_memory.SharedMemory] = []
+            for worker_idx in range(n_workers):
+                if feedback is not None and feedback.isCanceled():
+                    return None
+                out_shm = shared_memory.SharedMemory(create=True, size=measures_data.nbytes)
+                blocks.append(out_shm)
+                out_blocks.append(out_shm)
+                params = json.dumps(
+                    {
+                        "blocks": {**block_infos, "out": {"name": out_shm.name, **out_info}},
+                        "measures": measures,
+                        "distances": [int(dist) for dist in distances],
+                        "betas": [float(beta) for beta in betas],
+                        "angular": angular,
+                        "worker_idx": worker_idx,
+                        "n_workers": n_workers,
+                    }
+                )
+                # stderr goes to a file so that a chatty worker cannot fill the pipe and stall
+                log_files.append(open(Path(log_dir) / f"worker_{worker_idx}.log", "w"))
+                process = subprocess.Popen(
+                    [python_executable(), str(WORKER_PATH)],
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.DEVNULL,
+                    stderr=log_files[-1],
+                    text=True,
+                    env=env,
+                )
+                process.stdin.write(params)
+                process.stdin.close()
+                processes.append(process)
+            # results are summed as workers finish, so that only running workers hold a copy
+            pending = set(range(n_workers))
+            while pending:
+                if feedback is not None and feedback.isCanceled():
+                    return None
+                for worker_idx in sorted(pending):
+                    process = processes[worker_idx]
+                    if process.poll() is None:
+                        continue
+                    pending.discard(worker_idx)
+                    if process.returncode != 0:
+                        log_files[worker_idx].close()
+                        error = worker_error(Path(log_dir) / f"worker_{worker_idx}.log", process.returncode)
+                        raise IOError(f"Centrality worker {worker_idx} failed: {error}")
+                    measures_data += np.ndarray(
+                        measures_data.shape, dtype=measures_data.dtype, buffer=out_blocks[worker_idx].buf
+                    )
+                    if feedback is not None:
+                        feedback.setProgress(100 * (n_workers - len(pending)) / n_workers)
+                if pending:
+                    time.sleep(POLL_INTERVAL)
+        finally:
+            for process in processes:
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+            for log_file in log_files:
+                log_file.close()
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
+    return measures_data
@@ -0,0 +1,638 @@
+""" """
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable
+
+from qgis.core import (
+    QgsFeature,
+    QgsFeatureRequest,
+    QgsFeatureSink,
+    QgsField,
+    QgsFields,
+    QgsProcessing,
+    QgsProcessingAlgorithm,
+    QgsProcessingContext,
+    QgsProcessingException,
+    QgsProcessingFeedback,
+    QgsProcessingOutputVectorLayer,
+    QgsProcessingParameterBoolean,
+    QgsProcessingParameterCrs,
+    QgsProcessingParameterEnum,
+    QgsProcessingParameterFeatureSink,
+    QgsProcessingParameterFeatureSource,
+    QgsProcessingParameterField,
+    QgsProcessingParameterFile,
+    QgsProcessingParameterFileDestination,
+    QgsProcessingParameterNumber,
+    QgsProcessingParameterString,
+    QgsProcessingParameterVectorLayer,
+)
+from qgis.PyQt.QtCore import QVariant
+
+from ..tabs.centrality import ANGULAR_MEASURES, SHORTEST_MEASURES
+
+# the cityseer pipeline is only imported once an algorithm runs
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+    from ..layer_io import LayerSource
+    from ..workflows import Stages
+
+CENTRALITY_MEASURES = SHORTEST_MEASURES + ANGULAR_MEASURES
+
+
+def parse_distances(distances_text: str) -> list[int]:
+    """ """
+    try:
+        distances = sorted({int(dist.strip()) for dist in distances_text.split(",") if dist.strip()})
+    except ValueError:
+        raise QgsProcessingException(f"Unable to parse distances: {distances_text}")
+    if not distances or distances[0] <= 0:
+        raise QgsProcessingException("Specify one or more positive distances.")
+    return distances
+
+
+class CityseerAlgorithm(QgsProcessingAlgorithm):
+    """ """
+
+    algorithm_name: str = ""
+    display_name: str = ""
+
+    def name(self) -> str:
+        """ """
+        return self.algorithm_name
+
+    def displayName(self) -> str:
+        """ """
+        return self.display_name
+
+    def group(self) -> str:
+        """ """
+        return "Network"
+
+    def groupId(self) -> str:
+        """ """
+        return "network"
+
+    def createInstance(self) -> CityseerAlgorithm:
+        """ """
+        return type(self)()
+
+    def run_stages(self, workflow: Callable[[Stages], Any], feedback: QgsProcessingFeedback) -> Any:
+        """ """
+        from ..instrumentation import RunProfile
+        from ..workflows import Stages
+
+        # same stage instrumentation as the dock widget tasks
+        profile = RunProfile(f"Cityseer {self.display_name}")
+        try:
+            result = workflow(Stages(feedback, profile))
+        except Exception as err:
+            profile.finish("failed")
+            raise QgsProcessingException(str(err))
+        profile.finish("cancelled" if feedback.isCanceled() else "completed")
+        return result
+
+    def check_layer_crs(self, layer_source: LayerSource) -> None:
+        """ """
+        if not layer_source.crs.isValid() or layer_source.crs.isGeographic():
+            raise QgsProcessingException(f"{layer_source.layer_name} requires a projected (not geographic) CRS.")
+
+
+class EdgeValuesAlgorithm(CityseerAlgorithm):
+    """ """
+
+    # node measures are written to a copy of the network rather than in place
+    layer_source: LayerSource | None
+
+    def __init__(self):
+        """ """
+        super().__init__()
+        self.layer_source = None
+
+    def prepareAlgorithm(
+        self, parameters: dict[str, Any], context: QgsProcessingContext, feedback: QgsProcessingFeedback
+    ) -> bool:
+        """ """
+        from ..layer_io import LayerSource
+
+        # runs on the main thread - capture a thread safe source for processAlgorithm
+        layer = self.parameterAsVectorLayer(parameters, "NETWORK", context)
+        if layer is None:
+            raise QgsProcessingException("Invalid network layer.")
+        self.layer_source = LayerSource(layer)
+        self.check_layer_crs(self.layer_source)
+        return True
+
+    def write_edge_values(
+        self,
+        parameters: dict[str, Any],
+        context: QgsProcessingContext,
+        fids: np.ndarray,
+        edge_values: pd.DataFrame,
+    ) -> str:
+        """ """
+        from ..writers import WRITE_CHUNK_SIZE
+
+        feature_source = self.layer_source.feature_source
+        fields = QgsFields(feature_source.fields())
+        for col_name in edge_values.columns:
+            if fields.indexOf(col_name) == -1:
+                fields.append(QgsField(col_name, QVariant.Double))
+        sink, dest_id = self.parameterAsSink(
+            parameters, "OUTPUT", context, fields, feature_source.wkbType(), feature_source.sourceCrs()
+        )
+        if sink is None:
+            raise QgsProcessingException("Invalid output.")
+        col_idxs = [fields.indexOf(col_name) for col_name in edge_values.columns]
+        values_by_fid = dict(zip(fids.tolist(), edge_values.to_numpy(dtype=float).tolist()))
+        chunk: list[QgsFeature] = []
+        feature: QgsFeature
+        for feature in feature_source.getFeatures(QgsFeatureRequest()):
+            attributes = feature.attributes()
+            attributes += [None] * (fields.count() - len(attributes))
+            for col_idx, value in zip(col_idxs, values_by_fid.get(feature.id(), [])):
+                # NaN for unreachable nodes is written as NULL
+                attributes[col_idx] = None if value != value else value
+            out_feature = QgsFeature(fields)
+            out_feature.setGeometry(feature.geometry())
+            out_feature.setAttributes(attributes)
+            chunk.append(out_feature)
+            if len(chunk) >= WRITE_CHUNK_SIZE:
+                sink.addFeatures(chunk, QgsFeatureSink.FastInsert)
+                chunk = []
+        if chunk:
+            sink.addFeatures(chunk, QgsFeatureSink.FastInsert)
+        return dest_id
+
+
+class OsmImportAlgorithm(CityseerAlgorithm):
+    """ """
+
+    algorithm_name = "osm_import"
+    display_name = "OSM network import"
+
+    def shortHelpString(self) -> str:
+        """ """
+        return (
+            "Imports the OSM street network for the union of the extents polygons, "
+            "from the Overpass API or a local OSM extract, into a GeoPackage layer."
+        )
+
+    def initAlgorithm(self, config: dict[str, Any] | None = None) -> None:
+        """ """
+        self.addParameter(
+            QgsProcessingParameterFeatureSource("EXTENTS", "Extents polygons", [QgsProcessing.TypeVectorPolygon])
+        )
+        self.addParameter(QgsProcessingParameterCrs("CRS", "Projected CRS for the network", "ProjectCrs"))
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                "BUFFER", "Buffer distance", QgsProcessingParameterNumber.Double, defaultValue=0, minValue=0
+            )
+        )
+        self.addParameter(QgsProcessingParameterBoolean("SIMPLIFY", "Simplify network", defaultValue=True))
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                "TILE_SIZE",
+                "Tile size (0 to import in a single request)",
+                QgsProcessingParameterNumber.Integer,
+                defaultValue=0,
+                minValue=0,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterFile(
+                "OSM_FILE",
+                "Local OSM extract (in place of the Overpass API)",
+                fileFilter="OSM extracts (*.osm.pbf *.pbf *.osm)",
+                optional=True,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterFile(
+                "CACHE_DIR", "Graph cache directory", behavior=QgsProcessingParameterFile.Folder, optional=True
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterBoolean("COMPACT", "Compact schema (integer node keys)", defaultValue=False)
+        )
+        self.addParameter(QgsProcessingParameterString("LAYER_NAME", "Layer name", defaultValue="osm_network"))
+        self.addParameter(QgsProcessingParameterFileDestination("OUTPUT", "Output GeoPackage", "GeoPackage (*.gpkg)"))
+        self.addOutput(QgsProcessingOutputVectorLayer("NETWORK", "Network"))
+        self.addOutput(QgsProcessingOutputVectorLayer("NODES", "Network nodes"))
+
+    def processAlgorithm(
+        self, parameters: dict[str, Any], context: QgsProcessingContext, feedback: QgsProcessingFeedback
+    ) -> dict[str, Any]:
+        """ """
+        from ..extents import extents_from_wkbs
+        from ..workflows import import_osm_network
+        from ..writers import nodes_layer_name
+
+        crs = self.parameterAsCrs(parameters, "CRS", context)
+        if not crs.isValid() or crs.isGeographic():
+            raise QgsProcessingException("A projected (not geographic) CRS is required.")
+        source = self.parameterAsSource(parameters, "EXTENTS", context)
+        if source is None:
+            raise QgsProcessingException("Invalid extents layer.")
+        request = QgsFeatureRequest().setNoAttributes().setDestinationCrs(crs, context.transformContext())
+        feature: QgsFeature
+        extents_poly = extents_from_wkbs(
+            [bytes(feature.geometry().asWkb()) for feature in source.getFeatures(request) if feature.hasGeometry()]
+        )
+        if extents_poly is None:
+            raise QgsProcessingException("Unable to derive an extents polygon from the features.")
+        buffer_dist = self.parameterAsDouble(parameters, "BUFFER", context)
+        if buffer_dist > 0:
+            extents_poly = extents_poly.buffer(buffer_dist)
+        tile_size = self.parameterAsInt(parameters, "TILE_SIZE", context)
+        osm_file = self.parameterAsFile(parameters, "OSM_FILE", context)
+        cache_dir = self.parameterAsFile(parameters, "CACHE_DIR", context)
+        layer_name = self.parameterAsString(parameters, "LAYER_NAME", context)
+        out_path = self.parameterAsFileOutput(parameters, "OUTPUT", context)
+        self.run_stages(
+            lambda stages: import_osm_network(
+                extents_poly,
+                crs,
+                out_path,
+                context.transformContext(),
+                layer_name=layer_name,
+                simplify=self.parameterAsBoolean(parameters, "SIMPLIFY", context),
+                cache_dir_path=Path(cache_dir) if cache_dir else None,
+                tile_size=tile_size if tile_size > 0 else None,
+                osm_file_path=Path(osm_file) if osm_file else None,
+                compact=self.parameterAsBoolean(parameters, "COMPACT", context),
+                stages=stages,
+            ),
+            feedback,
+        )
+        return {
+            "OUTPUT": out_path,
+            "NETWORK": f"{out_path}|layername={layer_name}",
+            "NODES": f"{out_path}|layername={nodes_layer_name(layer_name)}",
+        }
+
+
+class DecomposeAlgorithm(CityseerAlgorithm):
+    """ """
+
+    algorithm_name = "decompose"
+    display_name = "Network decomposition"
+    layer_source: LayerSource | None
+
+    def __init__(self):
+        """ """
+        super().__init__()
+        self.layer_source = None
+
+    def shortHelpString(self) -> str:
+        """ """
+        return "Splits network edges into segments no longer than the decomposition distance."
+
+    def initAlgorithm(self, config: dict[str, Any] | None = None) -> None:
+        """ """
+        self.addParameter(QgsProcessingParameterVectorLayer("NETWORK", "Network", [QgsProcessing.TypeVectorLine]))
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                "DISTANCE", "Decomposition distance", QgsProcessingParameterNumber.Integer, defaultValue=20, minValue=1
+            )
+        )
+        self.addParameter(QgsProcessingParameterString("LAYER_NAME", "Layer name", defaultValue="decomposed_network"))
+        self.addParameter(QgsProcessingParameterFileDestination("OUTPUT", "Output GeoPackage", "GeoPackage (*.gpkg)"))
+        self.addOutput(QgsProcessingOutputVectorLayer("DECOMPOSED", "Decomposed network"))
+        self.addOutput(QgsProcessingOutputVectorLayer("NODES", "Decomposed network nodes"))
+
+    def prepareAlgorithm(
+        self, parameters: dict[str, Any], context: QgsProcessingContext, feedback: QgsProcessingFeedback
+    ) -> bool:
+        """ """
+        from ..layer_io import LayerSource
+
+        layer = self.parameterAsVectorLayer(parameters, "NETWORK", context)
+        if layer is None:
+            raise QgsProcessingException("Invalid network layer.")
+        self.layer_source = LayerSource(layer)
+        self.check_layer_crs(self.layer_source)
+        return True
+
+    def processAlgorithm(
+        self, parameters: dict[str, Any], context: QgsProcessingContext, feedback: QgsProcessingFeedback
+    ) -> dict[str, Any]:
+        """ """
+        from ..workflows import decompose_network
+        from ..writers import nodes_layer_name
+
+        layer_name = self.parameterAsString(parameters, "LAYER_NAME", context)
+        out_path = self.parameterAsFileOutput(parameters, "OUTPUT", context)
+        self.run_stages(
+            lambda stages: decompose_network(
+                self.layer_source,
+                self.parameterAsInt(parameters, "DISTANCE", context),
+                self.layer_source.crs,
+                out_path,
+                context.transformContext(),
+                layer_name=layer_name,
+                stages=stages,
+            ),
+            feedback,
+        )
+        return {
+            "OUTPUT": out_path,
+            "DECOMPOSED": f"{out_path}|layername={layer_name}",
+            "NODES": f"{out_path}|layername={nodes_layer_name(layer_name)}",
+        }
+
+
+class LineImportAlgorithm(CityseerAlgorithm):
+    """ """
+
+    algorithm_name = "line_import"
+    display_name = "Network import from line layer"
+    layer_source: LayerSource | None
+
+    def __init__(self):
+        """ """
+        super().__init__()
+        self.layer_source = None
+
+    def shortHelpString(self) -> str:
+        """ """
+        return (
+            "Builds a network from any line layer. Line endpoints within the snapping tolerance share a node. "
+            "Simplification removes short dead ends and merges edges meeting at nodes of degree two."
+        )
+
+    def initAlgorithm(self, config: dict[str, Any] | None = None) -> None:
+        """ """
+        self.addParameter(QgsProcessingParameterVectorLayer("LINES", "Line layer", [QgsProcessing.TypeVectorLine]))
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                "SNAP_TOLERANCE",
+                "Endpoint snapping tolerance",
+                QgsProcessingParameterNumber.Double,
+                defaultValue=0.5,
+                minValue=0.001,
+            )
+        )
+        self.addParameter(QgsProcessingParameterBoolean("SIMPLIFY", "Simplify network", defaultValue=True))
+        self.addParameter(
+            QgsProcessingParameterBoolean("COMPACT", "Compact schema (integer node keys)", defaultValue=False)
+        )
+        self.addParameter(QgsProcessingParameterString("LAYER_NAME", "Layer name", defaultValue="line_network"))
+        self.addParameter(QgsProcessingParameterFileDestination("OUTPUT", "Output GeoPackage", "GeoPackage (*.gpkg)"))
+        self.addOutput(QgsProcessingOutputVectorLayer("NETWORK", "Network"))
+        self.addOutput(QgsProcessingOutputVectorLayer("NODES", "Network nodes"))
+
+    def prepareAlgorithm(
+        self, parameters: dict[str, Any], context: QgsProcessingContext, feedback: QgsProcessingFeedback
+    ) -> bool:
+        """ """
+        from ..layer_io import LayerSource
+
+        layer = self.parameterAsVectorLayer(parameters, "LINES", context)
+        if layer is None:
+            raise QgsProcessingException("Invalid line layer.")
+        self.layer_source = LayerSource(layer)
+        self.check_layer_crs(self.layer_source)
+        return True
+
+    def processAlgorithm(
+        self, parameters: dict[str, Any], context: QgsProcessingContext, feedback: QgsProcessingFeedback
+    ) -> dict[str, Any]:
+        """ """
+        from ..workflows import import_line_network
+        from ..writers import nodes_layer_name
+
+        layer_name = self.parameterAsString(parameters, "LAYER_NAME", context)
+        out_path = self.parameterAsFileOutput(parameters, "OUTPUT", context)
+        self.run_stages(
+            lambda stages: import_line_network(
+                self.layer_source,
+                out_path,
+                context.transformContext(),
+                layer_name=layer_name,
+                snap_tolerance=self.parameterAsDouble(parameters, "SNAP_TOLERANCE", context),
+                merge_fillers=self.parameterAsBoolean(parameters, "SIMPLIFY", context),
+                compact=self.parameterAsBoolean(parameters, "COMPACT", context),
+                stages=stages,
+            ),
+            feedback,
+        )
+        return {
+            "OUTPUT": out_path,
+            "NETWORK": f"{out_path}|layername={layer_name}",
+            "NODES": f"{out_path}|layername={nodes_layer_name(layer_name)}",
+        }
+
+
+class CompactSchemaAlgorithm(CityseerAlgorithm):
+    """ """
+
+    algorithm_name = "compact_schema"
+    display_name = "Migrate network to compact schema"
+    layer_source: LayerSource | None
+
+    def __init__(self):
+        """ """
+        super().__init__()
+        self.layer_source = None
+
+    def shortHelpString(self) -> str:
+        """ """
+        return (
+            "Rewrites a network layer with string node keys using integer node keys, "
+            "with an indexed node layer and a lookup table from node ids to OSM ids. "
+            "Fids and any computed columns are carried over."
+        )
+
+    def initAlgorithm(self, config: dict[str, Any] | None = None) -> None:
+        """ """
+        self.addParameter(QgsProcessingParameterVectorLayer("NETWORK", "Network", [QgsProcessing.TypeVectorLine]))
+        self.addParameter(QgsProcessingParameterString("LAYER_NAME", "Layer name", defaultValue="osm_network"))
+        self.addParameter(QgsProcessingParameterFileDestination("OUTPUT", "Output GeoPackage", "GeoPackage (*.gpkg)"))
+        self.addOutput(QgsProcessingOutputVectorLayer("NETWORK_OUT", "Compact network"))
+        self.addOutput(QgsProcessingOutputVectorLayer("NODES", "Compact network nodes"))
+
+    def prepareAlgorithm(
+        self, parameters: dict[str, Any], context: QgsProcessingContext, feedback: QgsProcessingFeedback
+    ) -> bool:
+        """ """
+        from ..layer_io import LayerSource
+
+        layer = self.parameterAsVectorLayer(parameters, "NETWORK", context)
+        if layer is None:
+            raise QgsProcessingException("Invalid network layer.")
+        self.layer_source = LayerSource(layer)
+        return True
+
+    def processAlgorithm(
+        self, parameters: dict[str, Any], context: QgsProcessingContext, feedback: QgsProcessingFeedback
+    ) -> dict[str, Any]:
+        """ """
+        from ..workflows import migrate_network
+        from ..writers import nodes_layer_name
+
+        layer_name = self.parameterAsString(parameters, "LAYER_NAME", context)
+        out_path = self.parameterAsFileOutput(parameters, "OUTPUT", context)
+        self.run_stages(
+            lambda stages: migrate_network(
+                self.layer_source, out_path, context.transformContext(), layer_name=layer_name, stages=stages
+            ),
+            feedback,
+        )
+        return {
+            "OUTPUT": out_path,
+            "NETWORK_OUT": f"{out_path}|layername={layer_name}",
+            "NODES": f"{out_path}|layername={nodes_layer_name(layer_name)}",
+        }
+
+
+class CentralityAlgorithm(EdgeValuesAlgorithm):
+    """ """
+
+    algorithm_name = "centrality"
+    display_name = "Network centrality"
+
+    def shortHelpString(self) -> str:
+        """ """
+        return (
+            "Computes multi-distance node centrality and writes the mean of each edge's two nodes "
+            "to a copy of the network. Shortest and angular (simplest path) measures are computed separately."
+        )
+
+    def initAlgorithm(self, config: dict[str, Any] | None = None) -> None:
+        """ """
+        self.addParameter(QgsProcessingParameterVectorLayer("NETWORK", "Network", [QgsProcessing.TypeVectorLine]))
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                "MEASURES", "Measures", options=CENTRALITY_MEASURES, allowMultiple=True, defaultValue=[0]
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterString("DISTANCES", "Distances (comma separated)", defaultValue="400,800")
+        )
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                "WORKERS",
+                "Worker processes (1 to compute in process)",
+                QgsProcessingParameterNumber.Integer,
+                defaultValue=os.cpu_count() or 1,
+                minValue=1,
+            )
+        )
+        self.addParameter(QgsProcessingParameterFeatureSink("OUTPUT", "Centrality", QgsProcessing.TypeVectorLine))
+
+    def processAlgorithm(
+        self, parameters: dict[str, Any], context: QgsProcessingContext, feedback: QgsProcessingFeedback
+    ) -> dict[str, Any]:
+        """ """
+        from ..workflows import network_centrality
+
+        measures = [CENTRALITY_MEASURES[idx] for idx in self.parameterAsEnums(parameters, "MEASURES", context)]
+        angular = [measure in ANGULAR_MEASURES for measure in measures]
+        if not measures or (any(angular) and not all(angular)):
+            raise QgsProcessingException("Select either shortest or angular measures.")
+        distances = parse_distances(self.parameterAsString(parameters, "DISTANCES", context))
+        result = self.run_stages(
+            lambda stages: network_centrality(
+                self.layer_source,
+                measures,
+                distances,
+                angular=all(angular),
+                workers=self.parameterAsInt(parameters, "WORKERS", context),
+                stages=stages,
+            ),
+            feedback,
+        )
+        if result is None:
+            return {}
+        return {"OUTPUT": self.write_edge_values(parameters, context, *result)}
+
+
+class LanduseAlgorithm(EdgeValuesAlgorithm):
+    """ """
+
+    algorithm_name = "landuses"
+    display_name = "Land use accessibility and mixed uses"
+    data_source: LayerSource | None
+
+    def __init__(self):
+        """ """
+        super().__init__()
+        self.data_source = None
+
+    def shortHelpString(self) -> str:
+        """ """
+        return (
+            "Assigns land uses to their nearest street and computes accessibilities for the given categories "
+            "and / or mixed uses, written to a copy of the network."
+        )
+
+    def initAlgorithm(self, config: dict[str, Any] | None = None) -> None:
+        """ """
+        self.addParameter(QgsProcessingParameterVectorLayer("NETWORK", "Network", [QgsProcessing.TypeVectorLine]))
+        self.addParameter(
+            QgsProcessingParameterVectorLayer(
+                "LANDUSES", "Land uses", [QgsProcessing.TypeVectorPoint, QgsProcessing.TypeVectorPolygon]
+            )
+        )
+        self.addParameter(QgsProcessingParameterField("FIELD", "Land use field", parentLayerParameterName="LANDUSES"))
+        self.addParameter(
+            QgsProcessingParameterString(
+                "CATEGORIES", "Accessibility categories (comma separated)", defaultValue="", optional=True
+            )
+        )
+        self.addParameter(QgsProcessingParameterBoolean("MIXED_USES", "Mixed uses", defaultValue=True))
+        self.addParameter(
+            QgsProcessingParameterString("DISTANCES", "Distances (comma separated)", defaultValue="400,800")
+        )
+        self.addParameter(QgsProcessingParameterFeatureSink("OUTPUT", "Land uses", QgsProcessing.TypeVectorLine))
+
+    def prepareAlgorithm(
+        self, parameters: dict[str, Any], context: QgsProcessingContext, feedback: QgsProcessingFeedback
+    ) -> bool:
+        """ """
+        from ..layer_io import LayerSource
+
+        super().prepareAlgorithm(parameters, context, feedback)
+        layer = self.parameterAsVectorLayer(parameters, "LANDUSES", context)
+        if layer is None:
+            raise QgsProcessingException("Invalid land use layer.")
+        self.data_source = LayerSource(layer)
+        if self.data_source.crs != self.layer_source.crs:
+            raise QgsProcessingException("The land use layer CRS must match the network layer CRS.")
+        return True
+
+    def processAlgorithm(
+        self, parameters: dict[str, Any], context: QgsProcessingContext, feedback: QgsProcessingFeedback
+    ) -> dict[str, Any]:
+        """ """
+        from ..network import MAX_ASSIGN_DIST
+        from ..workflows import network_landuses
+
+        categories_text = self.parameterAsString(parameters, "CATEGORIES", context)
+        categories = [category.strip() for category in categories_text.split(",") if category.strip()]
+        mixed_uses = self.parameterAsBoolean(parameters, "MIXED_USES", context)
+        if not categories and not mixed_uses:
+            raise QgsProcessingException("Specify accessibility categories and / or mixed uses.")
+        distances = parse_distances(self.parameterAsString(parameters, "DISTANCES", context))
+        result = self.run_stages(
+            lambda stages: network_landuses(
+                self.layer_source,
+                self.data_source,
+                self.parameterAsString(parameters, "FIELD", context),
+                categories,
+                mixed_uses,
+                distances,
+                max_assign_dist=MAX_ASSIGN_DIST,
+                stages=stages,
+            ),
+            feedback,
+        )
+        if result is None:
+            return {}
+        fids, edge_values, _ = result
+        return {"OUTPUT": self.write_edge_values(parameters, context, fids, edge_values)}
@@ -0,0 +1,44 @@
+""" """
+from __future__ import annotations
+
+import os.path
+
+from qgis.core import QgsProcessingProvider
+from qgis.PyQt.QtGui import QIcon
+
+from .algorithms import (
+    CentralityAlgorithm,
+    CompactSchemaAlgorithm,
+    DecomposeAlgorithm,
+    LanduseAlgorithm,
+    LineImportAlgorithm,
+    OsmImportAlgorithm,
+)
+
+
+class CityseerProvider(QgsProcessingProvider):
+    """ """
+
+    def loadAlgorithms(self) -> None:
+        """ """
+        for algorithm in [
+            OsmImportAlgorithm(),
+            LineImportAlgorithm(),
+            DecomposeAlgorithm(),
+            CompactSchemaAlgorithm(),
+            CentralityAlgorithm(),
+            LanduseAlgorithm(),
+        ]:
+            self.addAlgorithm(algorithm)
+
+    def id(self) -> str:
+        """ """
+        return "cityseer"
+
+    def name(self) -> str:
+        """ """
+        return "Cityseer"
+
+    def icon(self) -> QIcon:
+        """ """
+        return QIcon(os.path.join(os.path.dirname(os.path.dirname(__file__)), "icon.png"))
@@ -1,17 +1,188 @@
 """ """
 from __future__ import annotations
 
-from qgis.core import QgsVectorLayer
+import os
+from typing import TYPE_CHECKING, Callable
+
+from qgis.core import (
+    Qgis,
+    QgsApplication,
+    QgsCoordinateReferenceSystem,
+    QgsMapLayerProxyModel,
+    QgsMessageLog,
+    QgsVectorLayer,
+)
+from qgis.gui import QgsMapLayerComboBox
 from qgis.PyQt import QtWidgets
+from qgis.PyQt.QtCore import Qt
+
+if TYPE_CHECKING:
+    from ..network import LayerNetwork
+    from ..tasks import CentralityTask
+
+# cityseer node centrality measure keys
+SHORTEST_MEASURES = [
+    "node_density",
+    "node_farness",
+    "node_cycles",
+    "node_harmonic",
+    "node_beta",
+    "node_betweenness",
+    "node_betweenness_beta",
+]
+ANGULAR_MEASURES = [
+    "node_harmonic_angular",
+    "node_betweenness_angular",
+]
 
 
 class CentralityTab(QtWidgets.QWidget):
+    """ """
+
     cent_input_netw: QgsVectorLayer | None
     cent_methods: list[str] | None
     cent_distances: list[int] | None
     cent_angular: bool
+    parent_crs_selection: QgsCoordinateReferenceSystem | None
+    cent_input: QgsMapLayerComboBox
+    cent_angular_input: QtWidgets.QCheckBox
+    cent_methods_input: QtWidgets.QListWidget
+    cent_distances_input: QtWidgets.QLineEdit
+    cent_workers_input: QtWidgets.QSpinBox
+    cent_feedback: QtWidgets.QLabel
+    cent_btn: QtWidgets.QPushButton
+    cent_task: CentralityTask | None
+    shared_network: Callable[[QgsVectorLayer], LayerNetwork] | None
 
-    def __init__(self, parent: QtWidgets.QWidget | None = None):
+    def __init__(
+        self,
+        parent: QtWidgets.QWidget | None = None,
+        shared_network: Callable[[QgsVectorLayer], LayerNetwork] | None = None,
+    ):
         """ """
         super().__init__(parent)
+        self.cent_input_netw = None
+        self.cent_methods = None
+        self.cent_distances = None
+        self.cent_angular = False
+        self.parent_crs_selection = None
+        self.cent_task = None
+        # the dialog's network cache - a layer converted by another tab or an earlier run is reused
+        self.shared_network = shared_network
         layout = QtWidgets.QVBoxLayout(self)
+        layout.addWidget(QtWidgets.QLabel("Network"))
+        self.cent_input = QgsMapLayerComboBox(self)
+        self.cent_input.setFilters(QgsMapLayerProxyModel.LineLayer)
+        self.cent_input.setShowCrs(True)
+        self.cent_input.layerChanged.connect(self.handle_params)
+        layout.addWidget(self.cent_input)
+        self.cent_angular_input = QtWidgets.QCheckBox("Angular (simplest path)")
+        self.cent_angular_input.stateChanged.connect(self.handle_angular)
+        layout.addWidget(self.cent_angular_input)
+        layout.addWidget(QtWidgets.QLabel("Measures"))
+        self.cent_methods_input = QtWidgets.QListWidget()
+        self.cent_methods_input.itemChanged.connect(self.handle_params)
+        layout.addWidget(self.cent_methods_input)
+        layout.addWidget(QtWidgets.QLabel("Distances (comma separated)"))
+        self.cent_distances_input = QtWidgets.QLineEdit("")
+        self.cent_distances_input.textChanged.connect(self.handle_params)
+        layout.addWidget(self.cent_distances_input)
+        # large networks are split by source node across worker processes
+        layout.addWidget(QtWidgets.QLabel("Worker processes"))
+        self.cent_workers_input = QtWidgets.QSpinBox()
+        self.cent_workers_input.setRange(1, os.cpu_count() or 1)
+        self.cent_workers_input.setValue(os.cpu_count() or 1)
+        layout.addWidget(self.cent_workers_input)
+        self.cent_feedback = QtWidgets.QLabel("Select a network layer")
+        self.cent_feedback.setWordWrap(True)
+        layout.addWidget(self.cent_feedback)
+        # action button
+        self.cent_btn = QtWidgets.QPushButton("Compute centrality")
+        self.cent_btn.setDisabled(True)
+        self.cent_btn.pressed.connect(self.process_centrality)
+        layout.addWidget(self.cent_btn)
+        layout.addStretch(1)
+        self.handle_angular()
+
+    def update_child(self, crs_selection: QgsCoordinateReferenceSystem | None) -> None:
+        """ """
+        self.parent_crs_selection = crs_selection
+        self.handle_params()
+
+    def handle_angular(self) -> None:
+        """ """
+        self.cent_angular = self.cent_angular_input.isChecked()
+        measures = ANGULAR_MEASURES if self.cent_angular else SHORTEST_MEASURES
+        self.cent_methods_input.blockSignals(True)
+        self.cent_methods_input.clear()
+        for measure in measures:
+            item = QtWidgets.QListWidgetItem(measure)
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Unchecked)
+            self.cent_methods_input.addItem(item)
+        self.cent_methods_input.blockSignals(False)
+        self.handle_params()
+
+    def handle_params(self) -> None:
+        """ """
+        self.cent_btn.setDisabled(True)
+        self.cent_input_netw = None
+        candidate_layer = self.cent_input.currentLayer()
+        if not isinstance(candidate_layer, QgsVectorLayer):
+            self.cent_feedback.setText("Select a network layer")
+            return
+        if candidate_layer.crs().isGeographic():
+            self.cent_feedback.setText("The network layer requires a projected (not geographic) CRS.")
+            return
+        if self.parent_crs_selection is not None and candidate_layer.crs() != self.parent_crs_selection:
+            self.cent_feedback.setText("The network layer CRS must match the project CRS.")
+            return
+        self.cent_input_netw = candidate_layer
+        self.cent_methods = [
+            self.cent_methods_input.item(row_idx).text()
+            for row_idx in range(self.cent_methods_input.count())
+            if self.cent_methods_input.item(row_idx).checkState() == Qt.Checked
+        ]
+        if not self.cent_methods:
+            self.cent_feedback.setText("Select one or more measures")
+            return
+        try:
+            self.cent_distances = sorted(
+                {int(dist.strip()) for dist in self.cent_distances_input.text().split(",") if dist.strip()}
+            )
+        except Exception:
+            self.cent_distances = None
+        if not self.cent_distances or self.cent_distances[0] <= 0:
+            self.cent_feedback.setText("Specify one or more positive distances")
+            return
+        self.cent_feedback.setText("")
+        # one computation at a time
+        if self.cent_task is not None:
+            return
+        self.cent_btn.setDisabled(False)
+
+    def process_centrality(self) -> None:
+        """ """
+        from ..layer_io import LayerSource
+        from ..tasks import CentralityTask
+
+        self.cent_btn.setDisabled(True)
+        self.cent_task = CentralityTask(
+            LayerSource(self.cent_input_netw),
+            self.cent_methods,
+            self.cent_distances,
+            self.cent_angular,
+            layer_network=None if self.shared_network is None else self.shared_network(self.cent_input_netw),
+            workers=self.cent_workers_input.value(),
+        )
+        self.cent_task.taskCompleted.connect(self.handle_centrality_done)
+        self.cent_task.taskTerminated.connect(self.handle_centrality_done)
+        QgsMessageLog.logMessage(
+            f"Computing centrality for {self.cent_input_netw.name()}.", level=Qgis.Info, notifyUser=True
+        )
+        QgsApplication.taskManager().addTask(self.cent_task)
+
+    def handle_centrality_done(self) -> None:
+        """ """
+        self.cent_task = None
+        self.handle_params()
@@ -1,15 +1,252 @@
 """ """
 from __future__ import annotations
 
-from qgis.core import QgsVectorLayer
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable
+
+from qgis.core import (
+    Qgis,
+    QgsApplication,
+    QgsCoordinateReferenceSystem,
+    QgsMapLayerProxyModel,
+    QgsMessageLog,
+    QgsVectorLayer,
+)
+from qgis.gui import QgsMapLayerComboBox
 from qgis.PyQt import QtWidgets
 
+if TYPE_CHECKING:
+    from ..network import LayerNetwork
+    from ..tasks import DecomposeTask, LineImportTask
+
 
 class GraphsTab(QtWidgets.QWidget):
+    """ """
+
     decomp_input_netw: QgsVectorLayer | None
     decomp_dist: int | None
+    filename: str | None
+    parent_working_dir_path: Path | None
+    parent_crs_selection: QgsCoordinateReferenceSystem | None
+    decomp_input: QgsMapLayerComboBox
+    decomp_dist_input: QtWidgets.QLineEdit
+    filename_output: QtWidgets.QLineEdit
+    decomp_feedback: QtWidgets.QLabel
+    decomp_btn: QtWidgets.QPushButton
+    decomp_task: DecomposeTask | None
+    line_input_layer: QgsVectorLayer | None
+    snap_tolerance: float | None
+    line_filename: str | None
+    line_input: QgsMapLayerComboBox
+    snap_tolerance_input: QtWidgets.QLineEdit
+    merge_fillers_input: QtWidgets.QCheckBox
+    line_compact_input: QtWidgets.QCheckBox
+    line_filename_output: QtWidgets.QLineEdit
+    line_feedback: QtWidgets.QLabel
+    line_btn: QtWidgets.QPushButton
+    line_task: LineImportTask | None
+    shared_network: Callable[[QgsVectorLayer], LayerNetwork] | None
 
-    def __init__(self, parent: QtWidgets.QWidget | None = None):
+    def __init__(
+        self,
+        parent: QtWidgets.QWidget | None = None,
+        shared_network: Callable[[QgsVectorLayer], LayerNetwork] | None = None,
+    ):
         """ """
         super().__init__(parent)
+        self.decomp_input_netw = None
+        self.decomp_dist = None
+        self.filename = None
+        self.parent_working_dir_path = None
+        self.parent_crs_selection = None
+        self.decomp_task = None
+        self.line_input_layer = None
+        self.snap_tolerance = None
+        self.line_filename = None
+        self.line_task = None
+        # converted networks are shared with the analysis tabs through the dialog
+        self.shared_network = shared_network
         layout = QtWidgets.QVBoxLayout(self)
+        # networks from existing line layers, e.g. from PostGIS or a GeoPackage
+        line_content = QtWidgets.QGroupBox("Import from line layer")
+        line_layout = QtWidgets.QVBoxLayout(line_content)
+        line_layout.addWidget(QtWidgets.QLabel("Line layer"))
+        self.line_input = QgsMapLayerComboBox(self)
+        self.line_input.setFilters(QgsMapLayerProxyModel.LineLayer)
+        self.line_input.setShowCrs(True)
+        self.line_input.layerChanged.connect(self.handle_line_params)
+        line_layout.addWidget(self.line_input)
+        line_layout.addWidget(QtWidgets.QLabel("Endpoint snapping tolerance"))
+        self.snap_tolerance_input = QtWidgets.QLineEdit("0.5")
+        self.snap_tolerance_input.textChanged.connect(self.handle_line_params)
+        line_layout.addWidget(self.snap_tolerance_input)
+        self.merge_fillers_input = QtWidgets.QCheckBox("Simplify (remove short dead ends and merge degree two nodes)")
+        self.merge_fillers_input.setChecked(True)
+        line_layout.addWidget(self.merge_fillers_input)
+        self.line_compact_input = QtWidgets.QCheckBox("Compact schema (integer node keys)")
+        line_layout.addWidget(self.line_compact_input)
+        line_layout.addWidget(QtWidgets.QLabel("Output filename"))
+        self.line_filename_output = QtWidgets.QLineEdit("")
+        self.line_filename_output.textChanged.connect(self.handle_line_params)
+        line_layout.addWidget(self.line_filename_output)
+        self.line_feedback = QtWidgets.QLabel("Select a line layer")
+        self.line_feedback.setWordWrap(True)
+        line_layout.addWidget(self.line_feedback)
+        self.line_btn = QtWidgets.QPushButton("Import")
+        self.line_btn.setDisabled(True)
+        self.line_btn.pressed.connect(self.process_line_import)
+        line_layout.addWidget(self.line_btn)
+        layout.addWidget(line_content)
+        # decomposition
+        decomp_content = QtWidgets.QGroupBox("Decomposition")
+        decomp_layout = QtWidgets.QVBoxLayout(decomp_content)
+        layout.addWidget(decomp_content)
+        decomp_layout.addWidget(QtWidgets.QLabel("Network to decompose"))
+        self.decomp_input = QgsMapLayerComboBox(self)
+        self.decomp_input.setFilters(QgsMapLayerProxyModel.LineLayer)
+        self.decomp_input.setShowCrs(True)
+        self.decomp_input.layerChanged.connect(self.handle_params)
+        decomp_layout.addWidget(self.decomp_input)
+        decomp_layout.addWidget(QtWidgets.QLabel("Decomposition distance"))
+        self.decomp_dist_input = QtWidgets.QLineEdit("")
+        self.decomp_dist_input.textChanged.connect(self.handle_params)
+        decomp_layout.addWidget(self.decomp_dist_input)
+        decomp_layout.addWidget(QtWidgets.QLabel("Output filename"))
+        self.filename_output = QtWidgets.QLineEdit("")
+        self.filename_output.textChanged.connect(self.handle_params)
+        decomp_layout.addWidget(self.filename_output)
+        self.decomp_feedback = QtWidgets.QLabel("Select a network layer")
+        self.decomp_feedback.setWordWrap(True)
+        decomp_layout.addWidget(self.decomp_feedback)
+        # action button
+        self.decomp_btn = QtWidgets.QPushButton("Decompose")
+        self.decomp_btn.setDisabled(True)
+        self.decomp_btn.pressed.connect(self.process_decomposition)
+        decomp_layout.addWidget(self.decomp_btn)
+        layout.addStretch(1)
+
+    def update_child(self, working_dir_path: Path | None, crs_selection: QgsCoordinateReferenceSystem | None) -> None:
+        """ """
+        self.parent_working_dir_path = working_dir_path
+        self.parent_crs_selection = crs_selection
+        self.handle_line_params()
+        self.handle_params()
+
+    def handle_params(self) -> None:
+        """ """
+        self.decomp_btn.setDisabled(True)
+        self.decomp_input_netw = None
+        candidate_layer = self.decomp_input.currentLayer()
+        if not isinstance(candidate_layer, QgsVectorLayer):
+            self.decomp_feedback.setText("Select a network layer")
+            return
+        if self.parent_crs_selection is not None and candidate_layer.crs() != self.parent_crs_selection:
+            self.decomp_feedback.setText("The network layer CRS must match the project CRS.")
+            return
+        self.decomp_feedback.setText("")
+        self.decomp_input_netw = candidate_layer
+        try:
+            self.decomp_dist = int(self.decomp_dist_input.text())
+            self.filename = self.filename_output.text()
+        except Exception:
+            return
+        if self.decomp_dist <= 0 or self.filename == "":
+            return
+        # check that working directory and CRS are available via parent
+        if self.parent_working_dir_path is None:
+            return
+        if self.parent_crs_selection is None:
+            return
+        # one decomposition at a time
+        if self.decomp_task is not None:
+            return
+        self.decomp_btn.setDisabled(False)
+
+    def process_decomposition(self) -> None:
+        """ """
+        from ..layer_io import LayerSource
+        from ..tasks import DecomposeTask
+
+        self.decomp_btn.setDisabled(True)
+        out_path = f"{self.parent_working_dir_path}/{self.filename}.gpkg"
+        self.decomp_task = DecomposeTask(
+            LayerSource(self.decomp_input_netw),
+            self.decomp_dist,
+            self.parent_crs_selection,
+            out_path,
+            layer_network=None if self.shared_network is None else self.shared_network(self.decomp_input_netw),
+        )
+        self.decomp_task.taskCompleted.connect(self.handle_decomposition_done)
+        self.decomp_task.taskTerminated.connect(self.handle_decomposition_done)
+        QgsMessageLog.logMessage(
+            f"Decomposing {self.decomp_input_netw.name()} to {self.decomp_dist}m.", level=Qgis.Info, notifyUser=True
+        )
+        QgsApplication.taskManager().addTask(self.decomp_task)
+
+    def handle_decomposition_done(self) -> None:
+        """ """
+        self.decomp_task = None
+        self.handle_params()
+
+    def handle_line_params(self) -> None:
+        """ """
+        self.line_btn.setDisabled(True)
+        self.line_input_layer = None
+        candidate_layer = self.line_input.currentLayer()
+        if not isinstance(candidate_layer, QgsVectorLayer):
+            self.line_feedback.setText("Select a line layer")
+            return
+        if candidate_layer.crs().isGeographic():
+            self.line_feedback.setText("The line layer requires a projected (not geographic) CRS.")
+            return
+        if self.parent_crs_selection is not None and candidate_layer.crs() != self.parent_crs_selection:
+            self.line_feedback.setText("The line layer CRS must match the project CRS.")
+            return
+        try:
+            self.snap_tolerance = float(self.snap_tolerance_input.text())
+        except ValueError:
+            self.line_feedback.setText("Unable to parse the snapping tolerance.")
+            return
+        if self.snap_tolerance <= 0:
+            self.line_feedback.setText("The snapping tolerance must be positive.")
+            return
+        self.line_feedback.setText("")
+        self.line_input_layer = candidate_layer
+        self.line_filename = self.line_filename_output.text()
+        if self.line_filename == "":
+            return
+        # check that working directory and CRS are available via parent
+        if self.parent_working_dir_path is None:
+            return
+        if self.parent_crs_selection is None:
+            return
+        # one import at a time
+        if self.line_task is not None:
+            return
+        self.line_btn.setDisabled(False)
+
+    def process_line_import(self) -> None:
+        """ """
+        from ..layer_io import LayerSource
+        from ..tasks import LineImportTask
+
+        self.line_btn.setDisabled(True)
+        out_path = f"{self.parent_working_dir_path}/{self.line_filename}.gpkg"
+        self.line_task = LineImportTask(
+            LayerSource(self.line_input_layer),
+            out_path,
+            snap_tolerance=self.snap_tolerance,
+            merge_fillers=self.merge_fillers_input.isChecked(),
+            compact=self.line_compact_input.isChecked(),
+        )
+        self.line_task.taskCompleted.connect(self.handle_line_import_done)
+        self.line_task.taskTerminated.connect(self.handle_line_import_done)
+        QgsMessageLog.logMessage(
+            f"Building a network from {self.line_input_layer.name()}.", level=Qgis.Info, notifyUser=True
+        )
+        QgsApplication.taskManager().addTask(self.line_task)
+
+    def handle_line_import_done(self) -> None:
+        """ """
+        self.line_task = None
+        self.handle_line_params()
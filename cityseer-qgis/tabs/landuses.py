@@ -1,16 +1,250 @@
 """ """
 from __future__ import annotations
 
-from qgis.core import QgsVectorLayer
+from functools import partial
+from typing import TYPE_CHECKING, Callable
+
+from qgis.core import (
+    Qgis,
+    QgsApplication,
+    QgsCoordinateReferenceSystem,
+    QgsMapLayerProxyModel,
+    QgsMessageLog,
+    QgsVectorLayer,
+)
+from qgis.gui import QgsFieldComboBox, QgsMapLayerComboBox
 from qgis.PyQt import QtWidgets
+from qgis.PyQt.QtCore import Qt
+
+if TYPE_CHECKING:
+    from ..cache import AssignmentCache
+    from ..network import LayerNetwork
+    from ..tasks import LanduseTask
+
+# categories beyond this are not listed for selection
+MAX_CATEGORIES = 500
 
 
 class LandusesTab(QtWidgets.QWidget):
+    """ """
+
     lus_cent_input_netw: QgsVectorLayer | None
     lus_input_layer: QgsVectorLayer | None
     lus_distances: list[int]
+    lus_field: str | None
+    lus_categories: list[str]
+    lus_mixed_uses: bool
+    parent_crs_selection: QgsCoordinateReferenceSystem | None
+    assignment_cache: AssignmentCache | None
+    assignment_key: tuple | None
+    watched_layer_ids: set[str]
+    lus_netw_input: QgsMapLayerComboBox
+    lus_data_input: QgsMapLayerComboBox
+    lus_field_input: QgsFieldComboBox
+    lus_categories_input: QtWidgets.QListWidget
+    lus_mixed_uses_input: QtWidgets.QCheckBox
+    lus_distances_input: QtWidgets.QLineEdit
+    lus_feedback: QtWidgets.QLabel
+    lus_btn: QtWidgets.QPushButton
+    lus_task: LanduseTask | None
+    shared_network: Callable[[QgsVectorLayer], LayerNetwork] | None
 
-    def __init__(self, parent: QtWidgets.QWidget | None = None):
+    def __init__(
+        self,
+        parent: QtWidgets.QWidget | None = None,
+        shared_network: Callable[[QgsVectorLayer], LayerNetwork] | None = None,
+    ):
         """ """
         super().__init__(parent)
+        self.lus_cent_input_netw = None
+        self.lus_input_layer = None
+        self.lus_distances = []
+        self.lus_field = None
+        self.lus_categories = []
+        self.lus_mixed_uses = False
+        self.parent_crs_selection = None
+        # the nearest street assignment is reused across runs with other distances or categories
+        self.assignment_cache = None
+        self.assignment_key = None
+        self.watched_layer_ids = set()
+        self.lus_task = None
+        self.shared_network = shared_network
         layout = QtWidgets.QVBoxLayout(self)
+        layout.addWidget(QtWidgets.QLabel("Network"))
+        self.lus_netw_input = QgsMapLayerComboBox(self)
+        self.lus_netw_input.setFilters(QgsMapLayerProxyModel.LineLayer)
+        self.lus_netw_input.setShowCrs(True)
+        self.lus_netw_input.layerChanged.connect(self.handle_params)
+        layout.addWidget(self.lus_netw_input)
+        layout.addWidget(QtWidgets.QLabel("Land use layer"))
+        self.lus_data_input = QgsMapLayerComboBox(self)
+        self.lus_data_input.setFilters(QgsMapLayerProxyModel.PointLayer | QgsMapLayerProxyModel.PolygonLayer)
+        self.lus_data_input.setShowCrs(True)
+        self.lus_data_input.layerChanged.connect(self.handle_data_layer)
+        layout.addWidget(self.lus_data_input)
+        layout.addWidget(QtWidgets.QLabel("Land use field"))
+        self.lus_field_input = QgsFieldComboBox(self)
+        self.lus_field_input.fieldChanged.connect(self.handle_field)
+        layout.addWidget(self.lus_field_input)
+        layout.addWidget(QtWidgets.QLabel("Accessibility categories"))
+        self.lus_categories_input = QtWidgets.QListWidget()
+        self.lus_categories_input.itemChanged.connect(self.handle_params)
+        layout.addWidget(self.lus_categories_input)
+        self.lus_mixed_uses_input = QtWidgets.QCheckBox("Mixed uses (Hill diversity)")
+        self.lus_mixed_uses_input.stateChanged.connect(self.handle_params)
+        layout.addWidget(self.lus_mixed_uses_input)
+        layout.addWidget(QtWidgets.QLabel("Distances (comma separated)"))
+        self.lus_distances_input = QtWidgets.QLineEdit("")
+        self.lus_distances_input.textChanged.connect(self.handle_params)
+        layout.addWidget(self.lus_distances_input)
+        self.lus_feedback = QtWidgets.QLabel("Select a network layer")
+        self.lus_feedback.setWordWrap(True)
+        layout.addWidget(self.lus_feedback)
+        # action button
+        self.lus_btn = QtWidgets.QPushButton("Compute land uses")
+        self.lus_btn.setDisabled(True)
+        self.lus_btn.pressed.connect(self.process_landuses)
+        layout.addWidget(self.lus_btn)
+        layout.addStretch(1)
+        self.handle_data_layer()
+
+    def update_child(self, crs_selection: QgsCoordinateReferenceSystem | None) -> None:
+        """ """
+        self.parent_crs_selection = crs_selection
+        self.handle_params()
+
+    def handle_data_layer(self) -> None:
+        """ """
+        self.lus_field_input.setLayer(self.lus_data_input.currentLayer())
+        self.handle_field()
+
+    def handle_field(self) -> None:
+        """ """
+        self.lus_categories_input.blockSignals(True)
+        self.lus_categories_input.clear()
+        data_layer = self.lus_data_input.currentLayer()
+        field_name = self.lus_field_input.currentField()
+        if isinstance(data_layer, QgsVectorLayer) and field_name:
+            field_idx = data_layer.fields().indexOf(field_name)
+            categories = sorted({str(value) for value in data_layer.uniqueValues(field_idx, MAX_CATEGORIES)})
+            for category in categories:
+                item = QtWidgets.QListWidgetItem(category)
+                item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+                item.setCheckState(Qt.Unchecked)
+                self.lus_categories_input.addItem(item)
+        self.lus_categories_input.blockSignals(False)
+        self.handle_params()
+
+    def handle_params(self) -> None:
+        """ """
+        self.lus_btn.setDisabled(True)
+        self.lus_cent_input_netw = None
+        self.lus_input_layer = None
+        netw_layer = self.lus_netw_input.currentLayer()
+        if not isinstance(netw_layer, QgsVectorLayer):
+            self.lus_feedback.setText("Select a network layer")
+            return
+        if netw_layer.crs().isGeographic():
+            self.lus_feedback.setText("The network layer requires a projected (not geographic) CRS.")
+            return
+        if self.parent_crs_selection is not None and netw_layer.crs() != self.parent_crs_selection:
+            self.lus_feedback.setText("The network layer CRS must match the project CRS.")
+            return
+        data_layer = self.lus_data_input.currentLayer()
+        if not isinstance(data_layer, QgsVectorLayer):
+            self.lus_feedback.setText("Select a land use layer")
+            return
+        if data_layer.crs() != netw_layer.crs():
+            self.lus_feedback.setText("The land use layer CRS must match the network layer CRS.")
+            return
+        self.lus_field = self.lus_field_input.currentField() or None
+        if self.lus_field is None:
+            self.lus_feedback.setText("Select a land use field")
+            return
+        self.lus_cent_input_netw = netw_layer
+        self.lus_input_layer = data_layer
+        self.lus_categories = [
+            self.lus_categories_input.item(row_idx).text()
+            for row_idx in range(self.lus_categories_input.count())
+            if self.lus_categories_input.item(row_idx).checkState() == Qt.Checked
+        ]
+        self.lus_mixed_uses = self.lus_mixed_uses_input.isChecked()
+        if not self.lus_categories and not self.lus_mixed_uses:
+            self.lus_feedback.setText("Select accessibility categories and / or mixed uses")
+            return
+        try:
+            self.lus_distances = sorted(
+                {int(dist.strip()) for dist in self.lus_distances_input.text().split(",") if dist.strip()}
+            )
+        except Exception:
+            self.lus_distances = []
+        if not self.lus_distances or self.lus_distances[0] <= 0:
+            self.lus_feedback.setText("Specify one or more positive distances")
+            return
+        self.lus_feedback.setText("")
+        # one computation at a time
+        if self.lus_task is not None:
+            return
+        self.lus_btn.setDisabled(False)
+
+    def watch_layer(self, layer: QgsVectorLayer) -> None:
+        """ """
+        # geometry edits or removal invalidate cached assignments involving the layer
+        if layer.id() in self.watched_layer_ids:
+            return
+        self.watched_layer_ids.add(layer.id())
+        invalidate = partial(self.handle_layer_edit, layer.id())
+        layer.geometryChanged.connect(invalidate)
+        layer.featureAdded.connect(invalidate)
+        layer.featureDeleted.connect(invalidate)
+        layer.willBeDeleted.connect(invalidate)
+
+    def handle_layer_edit(self, layer_id: str, *_args) -> None:
+        """ """
+        if self.assignment_cache is not None:
+            self.assignment_cache.invalidate_layer(layer_id)
+
+    def process_landuses(self) -> None:
+        """ """
+        from ..cache import AssignmentCache
+        from ..layer_io import LayerSource
+        from ..network import MAX_ASSIGN_DIST
+        from ..tasks import LanduseTask
+
+        self.lus_btn.setDisabled(True)
+        if self.assignment_cache is None:
+            self.assignment_cache = AssignmentCache()
+        self.watch_layer(self.lus_cent_input_netw)
+        self.watch_layer(self.lus_input_layer)
+        self.assignment_key = AssignmentCache.make_key(
+            self.lus_cent_input_netw.id(),
+            self.lus_cent_input_netw.featureCount(),
+            self.lus_input_layer.id(),
+            self.lus_input_layer.featureCount(),
+            MAX_ASSIGN_DIST,
+        )
+        self.lus_task = LanduseTask(
+            LayerSource(self.lus_cent_input_netw),
+            LayerSource(self.lus_input_layer),
+            self.lus_field,
+            self.lus_categories,
+            self.lus_mixed_uses,
+            self.lus_distances,
+            MAX_ASSIGN_DIST,
+            self.assignment_cache.get(self.assignment_key),
+            layer_network=None if self.shared_network is None else self.shared_network(self.lus_cent_input_netw),
+        )
+        self.lus_task.taskCompleted.connect(self.handle_landuses_done)
+        self.lus_task.taskTerminated.connect(self.handle_landuses_done)
+        QgsMessageLog.logMessage(
+            f"Computing land uses for {self.lus_cent_input_netw.name()}.", level=Qgis.Info, notifyUser=True
+        )
+        QgsApplication.taskManager().addTask(self.lus_task)
+
+    def handle_landuses_done(self) -> None:
+        """ """
+        if self.lus_task is not None and self.lus_task.assignment is not None and self.assignment_key is not None:
+            self.assignment_cache.put(self.assignment_key, self.lus_task.assignment)
+        self.lus_task = None
+        self.assignment_key = None
+        self.handle_params()
@@ -1,43 +1,66 @@
 """ """
 from __future__ import annotations
 
-import os
 from pathlib import Path
+from typing import TYPE_CHECKING, Callable
 
-os.environ["CITYSEER_QUIET_MODE"] = "1"
-
-from cityseer.tools import io
 from qgis.core import (
     Qgis,
+    QgsApplication,
     QgsCoordinateReferenceSystem,
+    QgsCoordinateTransform,
+    QgsCsException,
     QgsFeature,
-    QgsField,
-    QgsFields,
-    QgsLineString,
+    QgsFeatureRequest,
+    QgsGeometry,
     QgsMapLayerProxyModel,
     QgsMessageLog,
     QgsProject,
-    QgsVectorFileWriter,
+    QgsRectangle,
     QgsVectorLayer,
     QgsWkbTypes,
 )
-from qgis.gui import QgsMapLayerComboBox
-from qgis.PyQt import QtWidgets
-from qgis.PyQt.QtCore import QVariant
-from shapely import geometry, wkt
+from qgis.gui import QgsFileWidget, QgsMapCanvas, QgsMapLayerComboBox, QgsRubberBand
+from qgis.PyQt import QtCore, QtGui, QtWidgets
+
+from ..transforms import cached_transform, clear_transforms, geometry_wkb
+
+# shapely and the cityseer pipeline are only imported once an operation requires them
+if TYPE_CHECKING:
+    from shapely import geometry
+
+    from ..tasks import BatchImportTask, OsmImportTask
+
+
+# validation runs once typing pauses - extents geometries are only built for an import
+VALIDATION_DELAY_MS = 300
+PREVIEW_COLOR = "#e8641b"
+
+
+def debounce_timer(parent: QtWidgets.QWidget, handler: Callable[[], None]) -> QtCore.QTimer:
+    """ """
+    timer = QtCore.QTimer(parent)
+    timer.setSingleShot(True)
+    timer.setInterval(VALIDATION_DELAY_MS)
+    timer.timeout.connect(handler)
+    return timer
 
 
 class ByRadiusTab(QtWidgets.QWidget):
     """ """
 
+    extentsChanged = QtCore.pyqtSignal()
     easting: int | None
     northing: int | None
     radius: int | None
+    bounds: QgsRectangle | None
     poly: geometry.Polygon | None
+    poly_key: tuple[int, int, int] | None
     easting_input: QtWidgets.QLineEdit
     northing_input: QtWidgets.QLineEdit
     radius_input: QtWidgets.QLineEdit
     extents_feedback: QtWidgets.QLabel
+    validate_timer: QtCore.QTimer
 
     def __init__(self, parent: QtWidgets.QWidget | None = None):
         """ """
@@ -45,19 +68,22 @@ class ByRadiusTab(QtWidgets.QWidget):
         self.easting = None
         self.northing = None
         self.radius = None
+        self.bounds = None
         self.poly = None
+        self.poly_key = None
+        self.validate_timer = debounce_timer(self, self.handle_extents)
         layout = QtWidgets.QVBoxLayout(self)
         layout.addWidget(QtWidgets.QLabel("Easting"))
         self.easting_input = QtWidgets.QLineEdit("")
-        self.easting_input.textChanged.connect(self.handle_extents)
+        self.easting_input.textChanged.connect(self.validate_timer.start)
         layout.addWidget(self.easting_input)
         layout.addWidget(QtWidgets.QLabel("Northing"))
         self.northing_input = QtWidgets.QLineEdit("")
-        self.northing_input.textChanged.connect(self.handle_extents)
+        self.northing_input.textChanged.connect(self.validate_timer.start)
         layout.addWidget(self.northing_input)
         layout.addWidget(QtWidgets.QLabel("Radius"))
         self.radius_input = QtWidgets.QLineEdit("")
-        self.radius_input.textChanged.connect(self.handle_extents)
+        self.radius_input.textChanged.connect(self.validate_timer.start)
         layout.addWidget(self.radius_input)
         self.extents_feedback = QtWidgets.QLabel("Specify location and radius")
         layout.addWidget(self.extents_feedback)
@@ -65,36 +91,67 @@ class ByRadiusTab(QtWidgets.QWidget):
 
     def handle_extents(self) -> None:
         """ """
+        # parsing only - the bounding square is enough for validation and the preview
+        self.bounds = None
         try:
             self.easting = round(float(self.easting_input.text()))
             self.northing = round(float(self.northing_input.text()))
             self.radius = int(self.radius_input.text())
-            self.poly = geometry.Point(self.easting, self.northing).buffer(self.radius)
-        except Exception:
+        except ValueError:
             self.easting = None
             self.northing = None
             self.radius = None
-            self.poly = None
-            QgsMessageLog.logMessage(
-                f"Unable to parse easting: {self.easting_input.text()}, "
-                f"northing: {self.northing_input.text()}, "
-                f"radius: {self.radius_input.text()} to ints",
-                level=Qgis.Warning,
-                notifyUser=True,
-            )
+            self.extents_feedback.setText("Unable to parse easting, northing and radius to numbers.")
+        else:
+            if self.radius > 0:
+                self.bounds = QgsRectangle(
+                    self.easting - self.radius,
+                    self.northing - self.radius,
+                    self.easting + self.radius,
+                    self.northing + self.radius,
+                )
+                self.extents_feedback.setText("")
+            else:
+                self.extents_feedback.setText("Radius must be positive.")
+        self.extentsChanged.emit()
+
+    def extents(self) -> geometry.Polygon | None:
+        """ """
+        from ..extents import extents_from_point
+
+        if self.bounds is None:
+            return None
+        poly_key = (self.easting, self.northing, self.radius)
+        if poly_key != self.poly_key:
+            self.poly = extents_from_point(self.easting, self.northing, self.radius)
+            self.poly_key = poly_key
+        return self.poly
 
 
 class ByPolyTab(QtWidgets.QWidget):
     """ """
 
-    poly: geometry.Polygon | None
+    extentsChanged = QtCore.pyqtSignal()
+    bounds: QgsRectangle | None
+    poly: geometry.Polygon | geometry.MultiPolygon | None
+    simplify_tolerance: float | None
     poly_input_extents: QgsMapLayerComboBox
+    poly_input_scope: QtWidgets.QComboBox
+    poly_input_simplify: QtWidgets.QLineEdit
     poly_input_feedback: QtWidgets.QLabel
+    selection_layer: QgsVectorLayer | None
+    target_crs: QgsCoordinateReferenceSystem | None
+    validate_timer: QtCore.QTimer
 
     def __init__(self, parent: QtWidgets.QWidget | None = None):
         """ """
         super().__init__(parent)
+        self.bounds = None
         self.poly = None
+        self.simplify_tolerance = None
+        self.selection_layer = None
+        self.target_crs = None
+        self.validate_timer = debounce_timer(self, self.handle_poly_extents)
         layout = QtWidgets.QVBoxLayout(self)
         layout.addWidget(QtWidgets.QLabel("Extents polygon"))
         self.poly_input_extents = QgsMapLayerComboBox(self)
@@ -102,86 +159,287 @@ class ByPolyTab(QtWidgets.QWidget):
         self.poly_input_extents.setShowCrs(True)
         self.poly_input_extents.layerChanged.connect(self.handle_poly_extents)
         layout.addWidget(self.poly_input_extents)
+        self.poly_input_scope = QtWidgets.QComboBox()
+        self.poly_input_scope.addItems(["All features", "Selected features"])
+        self.poly_input_scope.currentIndexChanged.connect(self.handle_poly_extents)
+        layout.addWidget(self.poly_input_scope)
+        layout.addWidget(QtWidgets.QLabel("Simplification tolerance (leave empty to use boundaries as is)"))
+        self.poly_input_simplify = QtWidgets.QLineEdit("")
+        self.poly_input_simplify.textChanged.connect(self.validate_timer.start)
+        layout.addWidget(self.poly_input_simplify)
         self.poly_input_feedback = QtWidgets.QLabel("Select an extents Polygon")
         layout.addWidget(self.poly_input_feedback)
         layout.addStretch(1)
 
     def handle_poly_extents(self) -> None:
         """ """
+        # feature counts and the layer or selection extent only - the union waits for an import
+        self.bounds = None
         self.poly = None
-        # check geometry
         candidate_layer: QgsVectorLayer = self.poly_input_extents.currentLayer()
+        self.watch_selection(candidate_layer)
+        self.check_extents(candidate_layer)
+        self.extentsChanged.emit()
+
+    def check_extents(self, candidate_layer: QgsVectorLayer | None) -> None:
+        """ """
+        # check geometry
         if candidate_layer is None:
             return
         geom_type: QgsWkbTypes.GeometryType = candidate_layer.geometryType()  # type: ignore
         if not isinstance(candidate_layer, QgsVectorLayer) or geom_type != QgsWkbTypes.PolygonGeometry:
             self.poly_input_feedback.setText("Polygon Layer required.")
             return
+        try:
+            simplify_text = self.poly_input_simplify.text().strip()
+            self.simplify_tolerance = float(simplify_text) if simplify_text else None
+        except ValueError:
+            self.poly_input_feedback.setText("Unable to parse simplification tolerance.")
+            return
+        if self.poly_input_scope.currentIndex() == 1:
+            n_features = candidate_layer.selectedFeatureCount()
+            bounds = candidate_layer.boundingBoxOfSelected()
+        else:
+            n_features = candidate_layer.featureCount()
+            bounds = candidate_layer.extent()
+        if n_features == 0 or bounds.isNull():
+            self.poly_input_feedback.setText("No polygon features available.")
+            return
+        transform = self.target_transform(candidate_layer)
+        if transform is not None:
+            try:
+                bounds = transform.transformBoundingBox(bounds)
+            except QgsCsException:
+                self.poly_input_feedback.setText("Unable to reproject the features to the selected CRS.")
+                return
         # success
-        self.poly_input_feedback.setText("")
+        self.poly_input_feedback.setText(f"Extents from {n_features} feature(s).")
+        self.bounds = bounds
+
+    def extents(self) -> geometry.Polygon | geometry.MultiPolygon | None:
+        """ """
+        from ..extents import extents_from_wkbs
+
+        # the union is kept until the layer, its selection or features, the scope, tolerance or CRS change
+        if self.poly is not None or self.bounds is None:
+            return self.poly
+        layer = self.poly_input_extents.currentLayer()
+        if not isinstance(layer, QgsVectorLayer):
+            return None
+        try:
+            geom_wkbs = list(self.feature_wkbs(layer).values())
+        except QgsCsException:
+            self.poly_input_feedback.setText("Unable to reproject the features to the selected CRS.")
+            return None
+        self.poly = extents_from_wkbs(geom_wkbs, self.simplify_tolerance)
+        if self.poly is None:
+            self.poly_input_feedback.setText("Unable to derive an extents polygon from the features.")
+        return self.poly
+
+    def set_target_crs(self, crs: QgsCoordinateReferenceSystem | None) -> None:
+        """ """
+        # extents are built in the output CRS, so that simplification and buffering are in output units
+        if crs == self.target_crs:
+            return
+        self.target_crs = crs
+        self.handle_poly_extents()
+
+    def target_transform(self, layer: QgsVectorLayer) -> QgsCoordinateTransform | None:
+        """ """
+        if self.target_crs is None or not self.target_crs.isValid():
+            return None
+        return cached_transform(layer.crs(), self.target_crs, QgsProject.instance().transformContext())
+
+    def feature_wkbs(self, layer: QgsVectorLayer) -> dict[int, bytes]:
+        """ """
+        # geometries only - skip attribute reads
+        request = QgsFeatureRequest().setNoAttributes()
+        if self.poly_input_scope.currentIndex() == 1:
+            features = layer.getSelectedFeatures(request)
+        else:
+            features = layer.getFeatures(request)
+        transform = self.target_transform(layer)
         feature: QgsFeature
-        for feature in candidate_layer.getFeatures():
-            geom_wkt = feature.geometry().asWkt()
-            self.poly = wkt.loads(geom_wkt)
-            break
+        return {
+            feature.id(): geometry_wkb(feature.geometry(), transform) for feature in features if feature.hasGeometry()
+        }
+
+    def feature_polys(self) -> list[tuple[int, geometry.Polygon | geometry.MultiPolygon]]:
+        """ """
+        from ..extents import extents_from_wkbs
+
+        # one extents polygon per feature for batch imports
+        layer = self.poly_input_extents.currentLayer()
+        if self.bounds is None or not isinstance(layer, QgsVectorLayer):
+            return []
+        feature_polys = []
+        for fid, geom_wkb in self.feature_wkbs(layer).items():
+            poly = extents_from_wkbs([geom_wkb], self.simplify_tolerance)
+            if poly is not None:
+                feature_polys.append((fid, poly))
+        return feature_polys
+
+    def watch_selection(self, layer: QgsVectorLayer | None) -> None:
+        """ """
+        # selection changes only matter for the current layer
+        if layer is self.selection_layer:
+            return
+        if self.selection_layer is not None:
+            try:
+                self.selection_layer.selectionChanged.disconnect(self.handle_selection)
+                self.selection_layer.crsChanged.disconnect(self.handle_poly_extents)
+                self.selection_layer.dataChanged.disconnect(self.validate_timer.start)
+            except (RuntimeError, TypeError):
+                pass
+        self.selection_layer = layer if isinstance(layer, QgsVectorLayer) else None
+        if self.selection_layer is not None:
+            self.selection_layer.selectionChanged.connect(self.handle_selection)
+            self.selection_layer.crsChanged.connect(self.handle_poly_extents)
+            # edits invalidate the cached union
+            self.selection_layer.dataChanged.connect(self.validate_timer.start)
+
+    def handle_selection(self) -> None:
+        """ """
+        if self.poly_input_scope.currentIndex() == 1:
+            self.handle_poly_extents()
 
 
 class OsmTab(QtWidgets.QWidget):
     """ """
 
     buffer_dist: int | None
+    tile_size: int | None
+    osm_file_path: Path | None
     filename: str | None
     parent_working_dir_path: Path | None
     parent_crs_selection: QgsCoordinateReferenceSystem | None
+    source_input: QtWidgets.QComboBox
+    osm_file_input: QgsFileWidget
     tabs: QtWidgets.QTabWidget
     radius_tab: ByRadiusTab
     poly_tab: ByPolyTab
     buffer_dist_input: QtWidgets.QLineEdit
+    tile_size_input: QtWidgets.QLineEdit
     filename_output: QtWidgets.QLineEdit
+    simplify_input: QtWidgets.QCheckBox
+    refresh_input: QtWidgets.QCheckBox
+    compact_input: QtWidgets.QCheckBox
+    incremental_input: QtWidgets.QCheckBox
+    dirty_input: QgsMapLayerComboBox
+    batch_input: QtWidgets.QCheckBox
+    batch_output_input: QtWidgets.QComboBox
+    batch_workers_input: QtWidgets.QSpinBox
     import_btn: QtWidgets.QPushButton
     extents_poly: geometry.Polygon | geometry.MultiPolygon | None
+    extents_key: tuple[geometry.Polygon | geometry.MultiPolygon, int] | None
+    import_task: OsmImportTask | BatchImportTask | None
+    canvas: QgsMapCanvas | None
+    preview_band: QgsRubberBand | None
+    validate_timer: QtCore.QTimer
 
-    def __init__(self, parent: QtWidgets.QWidget):
+    def __init__(self, parent: QtWidgets.QWidget, canvas: QgsMapCanvas | None = None):
         """ """
         super().__init__(parent)
+        self.canvas = canvas
+        self.preview_band = None
+        self.extents_poly = None
+        self.extents_key = None
+        self.validate_timer = debounce_timer(self, self.handle_params)
         self.buffer_dist = None
+        self.tile_size = None
+        self.osm_file_path = None
         self.filename = None
         self.parent_working_dir_path = None
         self.parent_crs_selection = None
+        self.import_task = None
         # inputs
         layout = QtWidgets.QVBoxLayout(self)
+        layout.addWidget(QtWidgets.QLabel("OSM source"))
+        self.source_input = QtWidgets.QComboBox()
+        self.source_input.addItems(["Overpass API", "Local OSM file"])
+        self.source_input.currentIndexChanged.connect(self.handle_params)
+        layout.addWidget(self.source_input)
+        self.osm_file_input = QgsFileWidget(self)
+        self.osm_file_input.setFilter("OSM extracts (*.osm.pbf *.pbf *.osm)")
+        self.osm_file_input.setEnabled(False)
+        self.osm_file_input.fileChanged.connect(self.validate_timer.start)
+        layout.addWidget(self.osm_file_input)
         layout.addWidget(QtWidgets.QLabel("Extents selection method"))
         self.tabs = QtWidgets.QTabWidget()
         self.radius_tab = ByRadiusTab()
+        self.radius_tab.extentsChanged.connect(self.handle_params)
         self.tabs.addTab(self.radius_tab, "By Radius")
         self.poly_tab = ByPolyTab()
+        self.poly_tab.extentsChanged.connect(self.handle_params)
         self.tabs.addTab(self.poly_tab, "By Poly")
         layout.addWidget(self.tabs)
         self.tabs.currentChanged.connect(self.handle_params)
         layout.addWidget(QtWidgets.QLabel("Buffer distance"))
         self.buffer_dist_input = QtWidgets.QLineEdit("")
-        self.buffer_dist_input.textChanged.connect(self.handle_params)
+        self.buffer_dist_input.textChanged.connect(self.validate_timer.start)
         layout.addWidget(self.buffer_dist_input)
+        layout.addWidget(QtWidgets.QLabel("Tile size (leave empty to import in a single request)"))
+        self.tile_size_input = QtWidgets.QLineEdit("")
+        self.tile_size_input.textChanged.connect(self.validate_timer.start)
+        layout.addWidget(self.tile_size_input)
         layout.addWidget(QtWidgets.QLabel("Output filename"))
         self.filename_output = QtWidgets.QLineEdit("")
-        self.filename_output.textChanged.connect(self.handle_params)
+        self.filename_output.textChanged.connect(self.validate_timer.start)
         layout.addWidget(self.filename_output)
+        self.simplify_input = QtWidgets.QCheckBox("Simplify network")
+        self.simplify_input.setChecked(True)
+        layout.addWidget(self.simplify_input)
+        self.refresh_input = QtWidgets.QCheckBox("Force refresh (ignore cached OSM data)")
+        layout.addWidget(self.refresh_input)
+        # integer node keys with an OSM id lookup table - smaller files and indexed joins
+        self.compact_input = QtWidgets.QCheckBox("Compact schema (integer node keys)")
+        layout.addWidget(self.compact_input)
+        # incremental mode - patches an earlier tiled import of the same extents
+        self.incremental_input = QtWidgets.QCheckBox("Incremental: only refresh tiles whose OSM data changed")
+        self.incremental_input.stateChanged.connect(self.handle_params)
+        layout.addWidget(self.incremental_input)
+        layout.addWidget(QtWidgets.QLabel("Dirty area (optional - intersecting tiles are always refreshed)"))
+        self.dirty_input = QgsMapLayerComboBox(self)
+        self.dirty_input.setFilters(QgsMapLayerProxyModel.PolygonLayer)
+        self.dirty_input.setAllowEmptyLayer(True)
+        self.dirty_input.setLayer(None)
+        layout.addWidget(self.dirty_input)
+        # batch mode - each By Poly feature is imported separately, several at a time
+        self.batch_input = QtWidgets.QCheckBox("Batch: import each polygon feature separately")
+        self.batch_input.stateChanged.connect(self.handle_params)
+        layout.addWidget(self.batch_input)
+        self.batch_output_input = QtWidgets.QComboBox()
+        self.batch_output_input.addItems(["One GeoPackage per area", "Single multi-layer GeoPackage"])
+        layout.addWidget(self.batch_output_input)
+        layout.addWidget(QtWidgets.QLabel("Areas imported in parallel (Overpass allows few concurrent requests)"))
+        self.batch_workers_input = QtWidgets.QSpinBox()
+        self.batch_workers_input.setRange(1, 8)
+        self.batch_workers_input.setValue(2)
+        layout.addWidget(self.batch_workers_input)
         # action button
         self.import_btn = QtWidgets.QPushButton("Import")
         self.import_btn.setDisabled(True)
         self.import_btn.pressed.connect(self.process_import)
         layout.addWidget(self.import_btn)
         layout.addStretch(1)
+        QgsProject.instance().transformContextChanged.connect(clear_transforms)
 
     def update_child(self, working_dir_path: Path | None, crs_selection: QgsCoordinateReferenceSystem | None) -> None:
         """ """
         self.parent_working_dir_path = working_dir_path
         self.parent_crs_selection = crs_selection
+        self.poly_tab.set_target_crs(crs_selection)
         self.handle_params()
 
     def handle_params(self) -> None:
         """ """
+        self.validate_timer.stop()
+        self.update_preview()
         self.import_btn.setDisabled(True)
+        self.osm_file_input.setEnabled(self.source_input.currentIndex() == 1)
+        self.dirty_input.setEnabled(self.incremental_input.isChecked())
+        self.batch_output_input.setEnabled(self.batch_input.isChecked())
+        self.batch_workers_input.setEnabled(self.batch_input.isChecked())
         # check if buffer distance and file name have been provided
         try:
             self.buffer_dist = int(self.buffer_dist_input.text())
@@ -190,72 +448,169 @@ class OsmTab(QtWidgets.QWidget):
             return
         if self.filename == "":
             return
-        # check that extents are available via tabs
-        current_tab = self.tabs.currentWidget()
-        if isinstance(current_tab, ByRadiusTab):
-            self.extents_poly = self.radius_tab.poly.buffer(self.buffer_dist)
-        else:
-            self.extents_poly = self.poly_tab.poly.buffer(self.buffer_dist)
-        if self.extents_poly is None:
+        # optional tiling for large extents
+        try:
+            tile_text = self.tile_size_input.text().strip()
+            self.tile_size = int(tile_text) if tile_text else None
+        except Exception:
+            return
+        if self.tile_size is not None and self.tile_size <= 0:
+            return
+        # local extracts in place of the overpass API
+        self.osm_file_path = None
+        if self.source_input.currentIndex() == 1:
+            file_path = Path(self.osm_file_input.filePath().strip())
+            if not file_path.is_file():
+                return
+            self.osm_file_path = file_path
+        # incremental imports patch tiles and don't combine with batches
+        if self.incremental_input.isChecked() and (self.tile_size is None or self.batch_input.isChecked()):
+            return
+        # batches split By Poly extents into an Overpass request per feature
+        if self.batch_input.isChecked() and (
+            self.osm_file_path is not None or not isinstance(self.tabs.currentWidget(), ByPolyTab)
+        ):
+            return
+        # check that extents are available via tabs - the geometry itself is built on import
+        if self.tabs.currentWidget().bounds is None:
             return
         # check that working directory and CRS are available via parent
         if self.parent_working_dir_path is None:
             return
         if self.parent_crs_selection is None:
             return
+        # one import at a time
+        if self.import_task is not None:
+            return
         self.import_btn.setDisabled(False)
 
     def process_import(self) -> None:
         """ """
-        QgsMessageLog.logMessage("Fetching OSM data for specified extents.", level=Qgis.Warning, notifyUser=True)
-        epsg_code = int(self.parent_crs_selection.authid().split(":")[-1])
-        osm_nx = io.osm_graph_from_poly(
-            self.extents_poly, poly_epsg_code=epsg_code, to_epsg_code=epsg_code, simplify=True
-        )
-        # fields
-        fields = QgsFields()
-        fields.append(QgsField("fid", QVariant.Int))
-        fields.append(QgsField("start_nd", QVariant.String))
-        fields.append(QgsField("end_nd", QVariant.String))
-        fields.append(QgsField("edge_key", QVariant.Int))
-        # vector writer
-        save_options = QgsVectorFileWriter.SaveVectorOptions()
-        save_options.driverName = "GPKG"
-        save_options.fileEncoding = "UTF-8"
-        save_options.layerName = "osm_network"
+        from ..tasks import BatchImportTask, OsmImportTask
+
+        if not self.batch_input.isChecked() and self.build_extents() is None:
+            QgsMessageLog.logMessage(
+                "Unable to derive an extents polygon for the import.", level=Qgis.Warning, notifyUser=True
+            )
+            return
+        self.import_btn.setDisabled(True)
+        if self.batch_input.isChecked():
+            areas = [(str(fid), poly.buffer(self.buffer_dist)) for fid, poly in self.poly_tab.feature_polys()]
+            self.import_task = BatchImportTask(
+                areas,
+                self.parent_crs_selection,
+                self.parent_working_dir_path,
+                self.filename,
+                multi_layer=self.batch_output_input.currentIndex() == 1,
+                simplify=self.simplify_input.isChecked(),
+                cache_dir_path=self.parent_working_dir_path,
+                force_refresh=self.refresh_input.isChecked(),
+                max_workers=self.batch_workers_input.value(),
+                compact=self.compact_input.isChecked(),
+            )
+            self.import_task.taskCompleted.connect(self.handle_import_done)
+            self.import_task.taskTerminated.connect(self.handle_import_done)
+            QgsMessageLog.logMessage(f"Fetching OSM data for {len(areas)} areas.", level=Qgis.Info, notifyUser=True)
+            QgsApplication.taskManager().addTask(self.import_task)
+            return
         out_path = f"{self.parent_working_dir_path}/{self.filename}.gpkg"
-        writer = QgsVectorFileWriter.create(
-            out_path,
-            fields,
-            QgsWkbTypes.LineString,
+        self.import_task = OsmImportTask(
+            self.extents_poly,
             self.parent_crs_selection,
-            QgsProject.instance().transformContext(),
-            save_options,
+            out_path,
+            simplify=self.simplify_input.isChecked(),
+            cache_dir_path=self.parent_working_dir_path,
+            force_refresh=self.refresh_input.isChecked(),
+            tile_size=self.tile_size,
+            osm_file_path=self.osm_file_path,
+            incremental=self.incremental_input.isChecked(),
+            dirty_poly=self.dirty_poly() if self.incremental_input.isChecked() else None,
+            compact=self.compact_input.isChecked(),
         )
-        if writer.hasError() != QgsVectorFileWriter.NoError:
-            QgsMessageLog.logMessage(
-                f"Unable to create output file: {out_path}: {writer.errorMessage()}",
-                level=Qgis.Warning,
-                notifyUser=True,
-            )
-        # write features
-        counter = 0
-        for start_idx, end_idx, edge_key, data in osm_nx.edges(keys=True, data=True):
-            line_geom = QgsLineString()
-            line_geom.fromWkt(data["geom"].wkt)
-            feat = QgsFeature()
-            feat.setGeometry(line_geom)
-            feat.setAttributes([counter, str(start_idx), str(end_idx), int(edge_key)])
-            writer.addFeature(feat)
-            counter += 1
-        del writer  # important!
-        # add to map
-        netw_layer = QgsVectorLayer(out_path, "osm_network", "ogr")
-        if not netw_layer.isValid():
+        self.import_task.taskCompleted.connect(self.handle_import_done)
+        self.import_task.taskTerminated.connect(self.handle_import_done)
+        if self.osm_file_path is None:
+            QgsMessageLog.logMessage("Fetching OSM data for specified extents.", level=Qgis.Info, notifyUser=True)
+        else:
+            QgsMessageLog.logMessage(f"Reading OSM data from {self.osm_file_path}.", level=Qgis.Info, notifyUser=True)
+        QgsApplication.taskManager().addTask(self.import_task)
+
+    def build_extents(self) -> geometry.Polygon | geometry.MultiPolygon | None:
+        """ """
+        # buffered once per extents geometry and buffer distance
+        poly = self.tabs.currentWidget().extents()
+        if poly is None:
+            self.extents_poly = None
+            self.extents_key = None
+            return None
+        if self.extents_key is None or self.extents_key[0] is not poly or self.extents_key[1] != self.buffer_dist:
+            self.extents_poly = poly.buffer(self.buffer_dist)
+            self.extents_key = (poly, self.buffer_dist)
+        return self.extents_poly
+
+    def update_preview(self) -> None:
+        """ """
+        # only the bounding rectangle of the buffered extents - cheap enough to redraw as the inputs change
+        bounds = self.tabs.currentWidget().bounds
+        if self.canvas is None or not self.isVisible() or bounds is None or self.parent_crs_selection is None:
+            self.clear_preview()
+            return
+        try:
+            buffer_dist = max(int(self.buffer_dist_input.text()), 0)
+        except ValueError:
+            buffer_dist = 0
+        if self.preview_band is None:
+            self.preview_band = QgsRubberBand(self.canvas, QgsWkbTypes.PolygonGeometry)
+            self.preview_band.setStrokeColor(QtGui.QColor(PREVIEW_COLOR))
+            self.preview_band.setFillColor(QtGui.QColor(0, 0, 0, 0))
+            self.preview_band.setWidth(2)
+        self.preview_band.setToGeometry(QgsGeometry.fromRect(bounds.buffered(buffer_dist)), self.parent_crs_selection)
+
+    def clear_preview(self) -> None:
+        """ """
+        if self.preview_band is None:
+            return
+        self.canvas.scene().removeItem(self.preview_band)
+        self.preview_band = None
+
+    def showEvent(self, event: QtGui.QShowEvent) -> None:
+        """ """
+        super().showEvent(event)
+        self.update_preview()
+
+    def hideEvent(self, event: QtGui.QHideEvent) -> None:
+        """ """
+        # the preview is only shown alongside the tab
+        super().hideEvent(event)
+        self.clear_preview()
+
+    def dirty_poly(self) -> geometry.Polygon | geometry.MultiPolygon | None:
+        """ """
+        from ..extents import extents_from_wkbs
+
+        dirty_layer = self.dirty_input.currentLayer()
+        if not isinstance(dirty_layer, QgsVectorLayer):
+            return None
+        transform = cached_transform(
+            dirty_layer.crs(), self.parent_crs_selection, QgsProject.instance().transformContext()
+        )
+        feature: QgsFeature
+        try:
+            geom_wkbs = [
+                geometry_wkb(feature.geometry(), transform)
+                for feature in dirty_layer.getFeatures(QgsFeatureRequest().setNoAttributes())
+                if feature.hasGeometry()
+            ]
+        except QgsCsException:
             QgsMessageLog.logMessage(
-                f"File is not valid: {out_path}",
+                "Unable to reproject the dirty area to the selected CRS - ignoring it.",
                 level=Qgis.Warning,
                 notifyUser=True,
             )
-        else:
-            QgsProject.instance().addMapLayer(netw_layer)
+            return None
+        return extents_from_wkbs(geom_wkbs) if geom_wkbs else None
+
+    def handle_import_done(self) -> None:
+        """ """
+        self.import_task = None
+        self.handle_params()
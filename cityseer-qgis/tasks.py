@@ -0,0 +1,498 @@
+""" """
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from qgis.core import (
+    Qgis,
+    QgsCoordinateReferenceSystem,
+    QgsCoordinateTransformContext,
+    QgsFeedback,
+    QgsMessageLog,
+    QgsProject,
+    QgsProviderRegistry,
+    QgsTask,
+    QgsVectorLayer,
+)
+from qgis.PyQt.QtCore import Qt
+from shapely import geometry
+
+from . import layer_io, network, workflows, writers
+from .instrumentation import RunProfile
+from .layer_io import LayerSource
+
+
+class CityseerTask(QgsTask):
+    """ """
+
+    # stage recorded around handle_result on the main thread
+    result_stage: str = "layer load"
+    feedback: QgsFeedback
+    exception: Exception | None
+    profile: RunProfile
+    stages: workflows.Stages
+
+    def __init__(self, description: str):
+        """ """
+        super().__init__(description, QgsTask.CanCancel)
+        # the overall feedback drives the task progress - workflows map their stages onto it
+        self.feedback = QgsFeedback()
+        self.feedback.progressChanged.connect(self.setProgress, Qt.DirectConnection)
+        self.exception = None
+        self.profile = RunProfile(description)
+        self.stages = workflows.Stages(self.feedback, self.profile)
+
+    def cancel(self) -> None:
+        """ """
+        self.feedback.cancel()
+        super().cancel()
+
+    def run(self) -> bool:
+        """ """
+        try:
+            self.process()
+        except Exception as err:
+            self.exception = err
+            return False
+        finally:
+            self.profile.end()
+        return not self.isCanceled()
+
+    def process(self) -> None:
+        """ """
+        # the one hook subclasses implement - sip wrapped classes cannot take ABCMeta, so a missing override fails here
+        # and run records it as the task's exception rather than reporting an empty run as completed
+        raise TypeError(f"{type(self).__name__} must implement process")
+
+    def finished(self, result: bool) -> None:
+        """ """
+        if result:
+            self.profile.begin(self.result_stage)
+            try:
+                self.handle_result()
+            except Exception as err:
+                QgsMessageLog.logMessage(f"{self.description()} failed: {err}", level=Qgis.Critical, notifyUser=True)
+                self.profile.finish("failed")
+                return
+            self.profile.finish("completed")
+        elif self.exception is not None:
+            QgsMessageLog.logMessage(
+                f"{self.description()} failed: {self.exception}",
+                level=Qgis.Critical,
+                notifyUser=True,
+            )
+            self.profile.finish("failed")
+        else:
+            QgsMessageLog.logMessage(f"{self.description()} cancelled.", level=Qgis.Info, notifyUser=True)
+            self.profile.finish("cancelled")
+
+    def handle_result(self) -> None:
+        """ """
+        pass
+
+
+class OsmImportTask(CityseerTask):
+    """ """
+
+    out_path: str
+    layer_name: str
+    incremental: bool
+    osm_import: workflows.OsmImport
+
+    def __init__(
+        self,
+        extents_poly: geometry.Polygon | geometry.MultiPolygon,
+        crs: QgsCoordinateReferenceSystem,
+        out_path: str,
+        layer_name: str = "osm_network",
+        simplify: bool = True,
+        cache_dir_path: Path | None = None,
+        force_refresh: bool = False,
+        tile_size: int | None = None,
+        tile_workers: int = 2,
+        osm_file_path: Path | None = None,
+        incremental: bool = False,
+        dirty_poly: geometry.Polygon | geometry.MultiPolygon | None = None,
+        compact: bool = False,
+    ):
+        """ """
+        super().__init__("Cityseer OSM import")
+        self.out_path = out_path
+        self.layer_name = layer_name
+        self.incremental = incremental
+        # the project is not thread safe - fetch the transform context on the main thread
+        self.osm_import = workflows.OsmImport(
+            extents_poly,
+            crs,
+            out_path,
+            QgsProject.instance().transformContext(),
+            layer_name=layer_name,
+            simplify=simplify,
+            cache_dir_path=cache_dir_path,
+            force_refresh=force_refresh,
+            tile_size=tile_size,
+            tile_workers=tile_workers,
+            osm_file_path=osm_file_path,
+            incremental=incremental,
+            dirty_poly=dirty_poly,
+            compact=compact,
+            stages=self.stages,
+        )
+
+    def process(self) -> None:
+        """ """
+        self.osm_import.run()
+
+    def handle_result(self) -> None:
+        """ """
+        # patched layers already on the map only need reloading
+        if self.incremental and reload_network_layers(self.out_path, self.layer_name):
+            return
+        add_network_layer(self.out_path, self.layer_name)
+
+
+class BatchImportTask(CityseerTask):
+    """ """
+
+    areas: list[tuple[str, geometry.Polygon | geometry.MultiPolygon]]
+    crs: QgsCoordinateReferenceSystem
+    out_dir_path: Path
+    file_name: str
+    multi_layer: bool
+    simplify: bool
+    cache_dir_path: Path | None
+    force_refresh: bool
+    max_workers: int
+    compact: bool
+    transform_context: QgsCoordinateTransformContext
+    written: list[tuple[str, str]]
+    failed: list[tuple[str, str]]
+
+    def __init__(
+        self,
+        areas: list[tuple[str, geometry.Polygon | geometry.MultiPolygon]],
+        crs: QgsCoordinateReferenceSystem,
+        out_dir_path: Path,
+        file_name: str,
+        multi_layer: bool = False,
+        simplify: bool = True,
+        cache_dir_path: Path | None = None,
+        force_refresh: bool = False,
+        max_workers: int = 2,
+        compact: bool = False,
+    ):
+        """ """
+        super().__init__("Cityseer batch OSM import")
+        self.areas = areas
+        self.crs = crs
+        self.out_dir_path = out_dir_path
+        self.file_name = file_name
+        self.multi_layer = multi_layer
+        self.simplify = simplify
+        self.cache_dir_path = cache_dir_path
+        self.force_refresh = force_refresh
+        self.max_workers = max_workers
+        self.compact = compact
+        self.transform_context = QgsProject.instance().transformContext()
+        self.written = []
+        self.failed = []
+
+    def process(self) -> None:
+        """ """
+        self.written, self.failed = workflows.import_osm_batch(
+            self.areas,
+            self.crs,
+            self.out_dir_path,
+            self.file_name,
+            self.transform_context,
+            multi_layer=self.multi_layer,
+            simplify=self.simplify,
+            cache_dir_path=self.cache_dir_path,
+            force_refresh=self.force_refresh,
+            max_workers=self.max_workers,
+            compact=self.compact,
+            stages=self.stages,
+        )
+
+    def handle_result(self) -> None:
+        """ """
+        for out_path, layer_name in self.written:
+            add_network_layer(out_path, layer_name, layer_name if self.multi_layer else Path(out_path).stem)
+        for area_name, error in self.failed:
+            QgsMessageLog.logMessage(f"Area {area_name} failed: {error}", level=Qgis.Warning, notifyUser=True)
+        QgsMessageLog.logMessage(
+            f"Imported {len(self.written)} of {len(self.areas)} areas.", level=Qgis.Info, notifyUser=True
+        )
+
+
+class DecomposeTask(CityseerTask):
+    """ """
+
+    layer_source: LayerSource
+    decompose_max: int
+    crs: QgsCoordinateReferenceSystem
+    out_path: str
+    layer_name: str
+    layer_network: network.LayerNetwork | None
+    transform_context: QgsCoordinateTransformContext
+
+    def __init__(
+        self,
+        layer_source: LayerSource,
+        decompose_max: int,
+        crs: QgsCoordinateReferenceSystem,
+        out_path: str,
+        layer_name: str = "decomposed_network",
+        layer_network: network.LayerNetwork | None = None,
+    ):
+        """ """
+        super().__init__("Cityseer network decomposition")
+        self.layer_source = layer_source
+        self.decompose_max = decompose_max
+        self.crs = crs
+        self.out_path = out_path
+        self.layer_name = layer_name
+        # shared with the dialog's network cache
+        self.layer_network = layer_network
+        self.transform_context = QgsProject.instance().transformContext()
+
+    def process(self) -> None:
+        """ """
+        workflows.decompose_network(
+            self.layer_source,
+            self.decompose_max,
+            self.crs,
+            self.out_path,
+            self.transform_context,
+            layer_name=self.layer_name,
+            layer_network=self.layer_network,
+            stages=self.stages,
+        )
+
+    def handle_result(self) -> None:
+        """ """
+        add_network_layer(self.out_path, self.layer_name)
+
+
+class LineImportTask(CityseerTask):
+    """ """
+
+    layer_source: LayerSource
+    out_path: str
+    layer_name: str
+    snap_tolerance: float
+    merge_fillers: bool
+    compact: bool
+    transform_context: QgsCoordinateTransformContext
+
+    def __init__(
+        self,
+        layer_source: LayerSource,
+        out_path: str,
+        layer_name: str = "line_network",
+        snap_tolerance: float = network.SNAP_TOLERANCE,
+        merge_fillers: bool = True,
+        compact: bool = False,
+    ):
+        """ """
+        super().__init__("Cityseer line layer import")
+        self.layer_source = layer_source
+        self.out_path = out_path
+        self.layer_name = layer_name
+        self.snap_tolerance = snap_tolerance
+        self.merge_fillers = merge_fillers
+        self.compact = compact
+        self.transform_context = QgsProject.instance().transformContext()
+
+    def process(self) -> None:
+        """ """
+        workflows.import_line_network(
+            self.layer_source,
+            self.out_path,
+            self.transform_context,
+            layer_name=self.layer_name,
+            snap_tolerance=self.snap_tolerance,
+            merge_fillers=self.merge_fillers,
+            compact=self.compact,
+            stages=self.stages,
+        )
+
+    def handle_result(self) -> None:
+        """ """
+        add_network_layer(self.out_path, self.layer_name)
+
+
+class CentralityTask(CityseerTask):
+    """ """
+
+    result_stage = "layer write"
+    layer_source: LayerSource
+    measures: list[str]
+    distances: list[int]
+    angular: bool
+    layer_network: network.LayerNetwork | None
+    workers: int
+    fids: np.ndarray | None
+    edge_values: pd.DataFrame | None
+
+    def __init__(
+        self,
+        layer_source: LayerSource,
+        measures: list[str],
+        distances: list[int],
+        angular: bool,
+        layer_network: network.LayerNetwork | None = None,
+        workers: int = 1,
+    ):
+        """ """
+        super().__init__("Cityseer centrality")
+        self.layer_source = layer_source
+        self.measures = measures
+        self.distances = distances
+        self.angular = angular
+        self.workers = workers
+        # shared with the dialog's network cache
+        self.layer_network = layer_network
+        self.fids = None
+        self.edge_values = None
+
+    def process(self) -> None:
+        """ """
+        result = workflows.network_centrality(
+            self.layer_source,
+            self.measures,
+            self.distances,
+            angular=self.angular,
+            layer_network=self.layer_network,
+            workers=self.workers,
+            stages=self.stages,
+        )
+        if result is not None:
+            self.fids, self.edge_values = result
+
+    def handle_result(self) -> None:
+        """ """
+        write_edge_values(self.layer_source, self.fids, self.edge_values, "centrality")
+
+
+class LanduseTask(CityseerTask):
+    """ """
+
+    result_stage = "layer write"
+    netw_source: LayerSource
+    data_source: LayerSource
+    landuse_field: str
+    accessibility_keys: list[str]
+    mixed_uses: bool
+    distances: list[int]
+    max_assign_dist: int
+    assignment: tuple[np.ndarray, np.ndarray, np.ndarray] | None
+    layer_network: network.LayerNetwork | None
+    fids: np.ndarray | None
+    edge_values: pd.DataFrame | None
+
+    def __init__(
+        self,
+        netw_source: LayerSource,
+        data_source: LayerSource,
+        landuse_field: str,
+        accessibility_keys: list[str],
+        mixed_uses: bool,
+        distances: list[int],
+        max_assign_dist: int = network.MAX_ASSIGN_DIST,
+        assignment: tuple[np.ndarray, np.ndarray, np.ndarray] | None = None,
+        layer_network: network.LayerNetwork | None = None,
+    ):
+        """ """
+        super().__init__("Cityseer land uses")
+        self.netw_source = netw_source
+        self.data_source = data_source
+        self.landuse_field = landuse_field
+        self.accessibility_keys = accessibility_keys
+        self.mixed_uses = mixed_uses
+        self.distances = distances
+        self.max_assign_dist = max_assign_dist
+        # a cached assignment from an earlier run against the same layers
+        self.assignment = assignment
+        # shared with the dialog's network cache
+        self.layer_network = layer_network
+        self.fids = None
+        self.edge_values = None
+
+    def process(self) -> None:
+        """ """
+        result = workflows.network_landuses(
+            self.netw_source,
+            self.data_source,
+            self.landuse_field,
+            self.accessibility_keys,
+            self.mixed_uses,
+            self.distances,
+            max_assign_dist=self.max_assign_dist,
+            assignment=self.assignment,
+            layer_network=self.layer_network,
+            stages=self.stages,
+        )
+        if result is not None:
+            self.fids, self.edge_values, self.assignment = result
+
+    def handle_result(self) -> None:
+        """ """
+        write_edge_values(self.netw_source, self.fids, self.edge_values, "land use")
+
+
+def write_edge_values(layer_source: LayerSource, fids: np.ndarray, edge_values: pd.DataFrame, label: str) -> None:
+    """ """
+    # layers can only be written from the main thread
+    layer = QgsProject.instance().mapLayer(layer_source.layer_id)
+    if layer is None:
+        QgsMessageLog.logMessage(
+            f"Layer {layer_source.layer_name} is no longer available.", level=Qgis.Warning, notifyUser=True
+        )
+        return
+    layer_io.write_columns(layer, fids, {col: edge_values[col].to_numpy() for col in edge_values.columns})
+    QgsMessageLog.logMessage(
+        f"Wrote {len(edge_values.columns)} {label} columns to {layer.name()}.", level=Qgis.Info, notifyUser=True
+    )
+
+
+def add_network_layer(out_path: str, layer_name: str, display_name: str | None = None) -> None:
+    """ """
+    # add to map
+    netw_layer = QgsVectorLayer(f"{out_path}|layername={layer_name}", display_name or layer_name, "ogr")
+    if not netw_layer.isValid():
+        QgsMessageLog.logMessage(
+            f"File is not valid: {out_path}",
+            level=Qgis.Warning,
+            notifyUser=True,
+        )
+        return
+    QgsProject.instance().addMapLayer(netw_layer)
+    # the node layer is added after the edges so that it draws above them
+    nodes_layer = QgsVectorLayer(
+        f"{out_path}|layername={writers.nodes_layer_name(layer_name)}",
+        writers.nodes_layer_name(display_name or layer_name),
+        "ogr",
+    )
+    if nodes_layer.isValid():
+        QgsProject.instance().addMapLayer(nodes_layer)
+
+
+def reload_network_layers(out_path: str, layer_name: str) -> bool:
+    """ """
+    found = False
+    layer_names = {layer_name, writers.nodes_layer_name(layer_name)}
+    for layer in QgsProject.instance().mapLayers().values():
+        if not isinstance(layer, QgsVectorLayer) or layer.providerType() != "ogr":
+            continue
+        uri_parts = QgsProviderRegistry.instance().decodeUri("ogr", layer.source())
+        if not uri_parts.get("path") or Path(uri_parts["path"]).resolve() != Path(out_path).resolve():
+            continue
+        if (uri_parts.get("layerName") or layer_name) not in layer_names:
+            continue
+        layer.reload()
+        layer.triggerRepaint()
+        found = True
+    return found
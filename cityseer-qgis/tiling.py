@@ -0,0 +1,204 @@
+""" """
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+import networkx as nx
+import numpy as np
+import shapely
+from shapely import geometry
+
+TILE_OVERLAP = 250
+SNAP_DIST = 1.0
+MANIFEST_SUFFIX = ".tiles.json"
+MANIFEST_VERSION = 4
+
+
+def extents_tiles(
+    extents_poly: geometry.Polygon | geometry.MultiPolygon, tile_size: int, tile_overlap: int = TILE_OVERLAP
+) -> list[tuple[geometry.Polygon, geometry.Polygon | geometry.MultiPolygon]]:
+    """ """
+    # each tile is returned as the core box and the overlapping fetch area clipped to the extents
+    tiles: list[tuple[geometry.Polygon, geometry.Polygon | geometry.MultiPolygon]] = []
+    min_x, min_y, max_x, max_y = extents_poly.bounds
+    n_cols = max(1, math.ceil((max_x - min_x) / tile_size))
+    n_rows = max(1, math.ceil((max_y - min_y) / tile_size))
+    for col_idx in range(n_cols):
+        for row_idx in range(n_rows):
+            core = geometry.box(
+                min_x + col_idx * tile_size,
+                min_y + row_idx * tile_size,
+                min_x + (col_idx + 1) * tile_size,
+                min_y + (row_idx + 1) * tile_size,
+            )
+            if not core.intersects(extents_poly):
+                continue
+            fetch_poly = core.buffer(tile_overlap, join_style="mitre").intersection(extents_poly)
+            if fetch_poly.is_empty or fetch_poly.geom_type not in ("Polygon", "MultiPolygon"):
+                continue
+            tiles.append((core, fetch_poly))
+    return tiles
+
+
+def nx_clip_to_core(nx_multigraph: nx.MultiGraph, core: geometry.Polygon) -> nx.MultiGraph:
+    """ """
+    # edges belong to the tile containing their midpoint - half-open bounds so that exactly one tile claims each edge
+    edges = list(nx_multigraph.edges(keys=True, data=True))
+    if not edges:
+        return nx_multigraph
+    geoms = np.empty(len(edges), dtype=object)
+    geoms[:] = [data["geom"] for _, _, _, data in edges]
+    mid_xs, mid_ys = shapely.get_coordinates(shapely.line_interpolate_point(geoms, 0.5, normalized=True)).T
+    min_x, min_y, max_x, max_y = core.bounds
+    keep = (mid_xs >= min_x) & (mid_xs < max_x) & (mid_ys >= min_y) & (mid_ys < max_y)
+    nx_multigraph.remove_edges_from(
+        (start_nd, end_nd, edge_key) for (start_nd, end_nd, edge_key, _), kept in zip(edges, keep) if not kept
+    )
+    nx_multigraph.remove_nodes_from(list(nx.isolates(nx_multigraph)))
+    return nx_multigraph
+
+
+class TileStitcher:
+    """ """
+
+    snap_dist: float
+    node_cells: dict[tuple[int, int], list[tuple[float, float, str]]]
+    edge_counts: dict[tuple[str, str], int]
+
+    def __init__(self, snap_dist: float = SNAP_DIST):
+        """ """
+        self.snap_dist = snap_dist
+        # spatial hash of written node coordinates - these are all that is retained between tiles
+        self.node_cells = {}
+        self.edge_counts = {}
+
+    def node_label(self, x: float, y: float, candidate_label: str) -> str:
+        """ """
+        cell_x = math.floor(x / self.snap_dist)
+        cell_y = math.floor(y / self.snap_dist)
+        for nb_x in (cell_x - 1, cell_x, cell_x + 1):
+            for nb_y in (cell_y - 1, cell_y, cell_y + 1):
+                for other_x, other_y, other_label in self.node_cells.get((nb_x, nb_y), []):
+                    if math.hypot(x - other_x, y - other_y) <= self.snap_dist:
+                        return other_label
+        self.node_cells.setdefault((cell_x, cell_y), []).append((x, y, candidate_label))
+        return candidate_label
+
+    def seed(self, node_keys: np.ndarray, node_xys: np.ndarray, edge_nodes: np.ndarray, edge_keys: np.ndarray) -> None:
+        """ """
+        # nodes and edges kept from an earlier import - refreshed tiles snap onto these
+        node_labels = node_keys.tolist()
+        for nd_idx in np.unique(edge_nodes).tolist():
+            x, y = node_xys[nd_idx].tolist()
+            nd_label = node_labels[nd_idx]
+            cell = (math.floor(x / self.snap_dist), math.floor(y / self.snap_dist))
+            self.node_cells.setdefault(cell, []).append((x, y, nd_label))
+        for (start_idx, end_idx), edge_key in zip(edge_nodes.tolist(), edge_keys.tolist()):
+            start_label = node_labels[start_idx]
+            end_label = node_labels[end_idx]
+            pair = (start_label, end_label) if start_label <= end_label else (end_label, start_label)
+            self.edge_counts[pair] = max(self.edge_counts.get(pair, 0), edge_key + 1)
+
+    def stitch(self, nx_multigraph: nx.MultiGraph, tile_label: int | str) -> nx.MultiGraph:
+        """ """
+        # boundary nodes already written by earlier tiles are merged onto their existing labels
+        mapping: dict[str, str] = {}
+        stitched = nx.MultiGraph()
+        for nd_key, nd_data in nx_multigraph.nodes(data=True):
+            nd_label = self.node_label(nd_data["x"], nd_data["y"], f"{tile_label}_{nd_key}")
+            mapping[nd_key] = nd_label
+            stitched.add_node(nd_label, **nd_data)
+        for start_nd, end_nd, edge_data in nx_multigraph.edges(data=True):
+            start_label = mapping[start_nd]
+            end_label = mapping[end_nd]
+            # edge keys stay unique per node pair across tiles
+            pair = (start_label, end_label) if start_label <= end_label else (end_label, start_label)
+            edge_key = self.edge_counts.get(pair, 0)
+            self.edge_counts[pair] = edge_key + 1
+            stitched.add_edge(start_label, end_label, key=edge_key, **edge_data)
+        return stitched
+
+
+def manifest_path(out_path: str | Path, layer_name: str) -> Path:
+    """ """
+    out_path = Path(out_path)
+    return out_path.with_name(f"{out_path.stem}.{layer_name}{MANIFEST_SUFFIX}")
+
+
+def content_hash(osm_json: str) -> str:
+    """ """
+    # Overpass headers carry the request time - only the elements say whether the data changed
+    elements_idx = max(osm_json.find('"elements"'), 0)
+    return hashlib.sha256(osm_json[elements_idx:].encode()).hexdigest()
+
+
+def fetch_timestamp() -> str:
+    """ """
+    # the format expected by Overpass newer filters
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class TileManifest:
+    """ """
+
+    # per tile fetch timestamps, content hashes and written fids - stored beside the network GPKG
+    path: Path
+    signature: str
+    revision: int
+    tiles: list[dict[str, Any] | None]
+
+    def __init__(self, path: Path, signature: str, n_tiles: int):
+        """ """
+        self.path = path
+        self.signature = signature
+        self.revision = 0
+        self.tiles = [None] * n_tiles
+
+    @staticmethod
+    def make_signature(
+        extents_poly: geometry.Polygon | geometry.MultiPolygon,
+        crs_code: int | str,
+        tile_size: int,
+        simplify: bool,
+        source: str,
+        compact: bool = False,
+    ) -> str:
+        """ """
+        # tiles only line up with an earlier import made with the same settings
+        hasher = hashlib.sha256()
+        hasher.update(shapely.to_wkb(extents_poly, output_dimension=2, byte_order=1))
+        hasher.update(f"|{crs_code}|{tile_size}|{simplify}|{source}|{compact}|{MANIFEST_VERSION}".encode())
+        return hasher.hexdigest()
+
+    @classmethod
+    def load(cls, path: Path, signature: str, n_tiles: int) -> TileManifest | None:
+        """ """
+        if not path.exists():
+            return None
+        try:
+            manifest_data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+        if manifest_data.get("signature") != signature or len(manifest_data.get("tiles", [])) != n_tiles:
+            return None
+        manifest = cls(path, signature, n_tiles)
+        manifest.revision = manifest_data.get("revision", 0)
+        manifest.tiles = manifest_data["tiles"]
+        return manifest
+
+    def set_tile(
+        self, tile_idx: int, fetched: str, osm_hash: str | None, way_count: int | None, fids: list[int]
+    ) -> None:
+        """ """
+        self.tiles[tile_idx] = {"fetched": fetched, "hash": osm_hash, "ways": way_count, "fids": fids}
+
+    def save(self) -> None:
+        """ """
+        temp_path = self.path.with_suffix(".tmp")
+        temp_path.write_text(json.dumps({"signature": self.signature, "revision": self.revision, "tiles": self.tiles}))
+        temp_path.replace(self.path)
@@ -0,0 +1,57 @@
+""" """
+from __future__ import annotations
+
+from qgis.core import QgsCoordinateReferenceSystem, QgsCoordinateTransform, QgsCoordinateTransformContext, QgsGeometry
+
+# transforms are costly to set up - one per CRS pair, created and used on the main thread
+TRANSFORM_CACHE: dict[tuple[str, str], QgsCoordinateTransform] = {}
+
+
+def crs_code(crs: QgsCoordinateReferenceSystem) -> int | str:
+    """ """
+    # EPSG codes as ints, other authorities by authid and custom CRSs as WKT - all accepted by pyproj, so graphs are
+    # reprojected with pyproj rather than cityseer's EPSG only conversion
+    authority, _, code = crs.authid().partition(":")
+    if authority.upper() == "EPSG" and code.isdigit():
+        return int(code)
+    if authority and code and authority.upper() != "USER":
+        return crs.authid()
+    return crs.toWkt(QgsCoordinateReferenceSystem.WKT_PREFERRED)
+
+
+def crs_key(crs: QgsCoordinateReferenceSystem) -> str:
+    """ """
+    # user CRS ids are local to a profile - the definition is the identity
+    if crs.authid() and not crs.authid().upper().startswith("USER:"):
+        return crs.authid()
+    return crs.toWkt(QgsCoordinateReferenceSystem.WKT_PREFERRED)
+
+
+def cached_transform(
+    source_crs: QgsCoordinateReferenceSystem,
+    dest_crs: QgsCoordinateReferenceSystem,
+    transform_context: QgsCoordinateTransformContext,
+) -> QgsCoordinateTransform | None:
+    """ """
+    # None when the CRSs match - geometries are then used as they are
+    if source_crs == dest_crs:
+        return None
+    cache_key = (crs_key(source_crs), crs_key(dest_crs))
+    transform = TRANSFORM_CACHE.get(cache_key)
+    if transform is None:
+        transform = QgsCoordinateTransform(source_crs, dest_crs, transform_context)
+        TRANSFORM_CACHE[cache_key] = transform
+    return transform
+
+
+def clear_transforms() -> None:
+    """ """
+    # datum transformation choices live in the project transform context
+    TRANSFORM_CACHE.clear()
+
+
+def geometry_wkb(geom: QgsGeometry, transform: QgsCoordinateTransform | None = None) -> bytes:
+    """ """
+    if transform is not None:
+        geom.transform(transform)
+    return bytes(geom.asWkb())
@@ -0,0 +1,921 @@
+""" """
+from __future__ import annotations
+
+import pickle
+import tempfile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+from qgis.core import (
+    QgsCoordinateReferenceSystem,
+    QgsCoordinateTransformContext,
+    QgsFeature,
+    QgsFeedback,
+    QgsFields,
+)
+from qgis.PyQt.QtCore import Qt
+from shapely import geometry
+
+from . import batch, graph_store, network, osm_file, osm_graph, tiling, transforms, writers
+from .cache import GraphCache
+from .instrumentation import RunProfile
+from .layer_io import LayerSource
+
+
+class Stages:
+    """ """
+
+    # GUI free progress, cancellation and instrumentation shared by the plugin's tasks and processing algorithms
+    feedback: QgsFeedback
+    profile: RunProfile | None
+
+    def __init__(self, feedback: QgsFeedback | None = None, profile: RunProfile | None = None):
+        """ """
+        self.feedback = QgsFeedback() if feedback is None else feedback
+        self.profile = profile
+
+    def stage(self, start: float, end: float, name: str | None = None) -> QgsFeedback:
+        """ """
+        # maps a stage's 0-100 progress onto the start - end range of the overall feedback
+        if name is not None:
+            self.begin(name)
+        stage_feedback = QgsFeedback()
+        # direct connections - the worker thread running the stage has no event loop
+        stage_feedback.progressChanged.connect(
+            lambda progress: self.feedback.setProgress(start + (end - start) * progress / 100), Qt.DirectConnection
+        )
+        self.feedback.canceled.connect(stage_feedback.cancel, Qt.DirectConnection)
+        if self.feedback.isCanceled():
+            stage_feedback.cancel()
+        self.feedback.setProgress(start)
+        return stage_feedback
+
+    def begin(self, name: str) -> None:
+        """ """
+        if self.profile is not None:
+            self.profile.begin(name)
+
+    def add_items(self, n_items: int) -> None:
+        """ """
+        if self.profile is not None:
+            self.profile.add_items(n_items)
+
+    def is_canceled(self) -> bool:
+        """ """
+        return self.feedback.isCanceled()
+
+
+def write_network(
+    nx_multigraph: nx.MultiGraph,
+    out_path: str,
+    layer_name: str,
+    crs: QgsCoordinateReferenceSystem,
+    transform_context: QgsCoordinateTransformContext,
+    feedback: QgsFeedback,
+    overwrite_file: bool = True,
+    release: bool = False,
+    compact: bool = False,
+) -> None:
+    """ """
+    # the graph sidecar is filled from the same edge batches as the GPKG
+    # release suits callers done with the graph - its edge data is cleared as it is written
+    arrays_writer = graph_store.GraphArraysWriter()
+    writers.write_network_edges(
+        nx_multigraph,
+        out_path,
+        layer_name,
+        crs,
+        transform_context,
+        feedback,
+        overwrite_file=overwrite_file,
+        arrays_writer=arrays_writer,
+        release=release,
+        compact=compact,
+    )
+    if feedback.isCanceled():
+        return
+    write_nodes(arrays_writer, out_path, layer_name, crs, transform_context, compact=compact)
+    arrays_writer.save(graph_store.graph_path(out_path, layer_name), crs.authid())
+
+
+def write_nodes(
+    arrays_writer: graph_store.GraphArraysWriter,
+    out_path: str,
+    layer_name: str,
+    crs: QgsCoordinateReferenceSystem,
+    transform_context: QgsCoordinateTransformContext,
+    compact: bool = False,
+) -> int:
+    """ """
+    # the node layer for a network layer, from the arrays behind its graph sidecar
+    node_keys, node_xys, degrees = arrays_writer.node_table()
+    return writers.write_network_nodes(
+        node_keys, node_xys, degrees, out_path, layer_name, crs, transform_context, compact=compact
+    )
+
+
+class OsmImport:
+    """ """
+
+    extents_poly: geometry.Polygon | geometry.MultiPolygon
+    crs: QgsCoordinateReferenceSystem
+    crs_code: int | str
+    out_path: str
+    layer_name: str
+    transform_context: QgsCoordinateTransformContext
+    simplify: bool
+    cache: GraphCache | None
+    force_refresh: bool
+    tile_size: int | None
+    tile_workers: int
+    osm_file_path: Path | None
+    incremental: bool
+    dirty_poly: geometry.Polygon | geometry.MultiPolygon | None
+    compact: bool
+    source_key: str
+    stages: Stages
+
+    def __init__(
+        self,
+        extents_poly: geometry.Polygon | geometry.MultiPolygon,
+        crs: QgsCoordinateReferenceSystem,
+        out_path: str,
+        transform_context: QgsCoordinateTransformContext,
+        layer_name: str = "osm_network",
+        simplify: bool = True,
+        cache_dir_path: Path | None = None,
+        force_refresh: bool = False,
+        tile_size: int | None = None,
+        tile_workers: int = 2,
+        osm_file_path: Path | None = None,
+        incremental: bool = False,
+        dirty_poly: geometry.Polygon | geometry.MultiPolygon | None = None,
+        compact: bool = False,
+        stages: Stages | None = None,
+    ):
+        """ """
+        if incremental and tile_size is None:
+            raise ValueError("Incremental imports require a tile size.")
+        self.extents_poly = extents_poly
+        self.crs = crs
+        self.crs_code = transforms.crs_code(crs)
+        self.out_path = out_path
+        self.layer_name = layer_name
+        self.transform_context = transform_context
+        self.simplify = simplify
+        self.cache = None if cache_dir_path is None else GraphCache(cache_dir_path)
+        self.force_refresh = force_refresh
+        self.tile_size = tile_size
+        self.tile_workers = tile_workers
+        self.osm_file_path = osm_file_path
+        self.incremental = incremental
+        self.dirty_poly = dirty_poly
+        self.compact = compact
+        if osm_file_path is None:
+            self.source_key = "overpass"
+        else:
+            # cached graphs are invalidated when the extract changes
+            file_stat = osm_file_path.stat()
+            self.source_key = f"{osm_file_path.absolute()}|{file_stat.st_size}|{file_stat.st_mtime_ns}"
+        self.stages = Stages() if stages is None else stages
+
+    def run(self) -> int:
+        """ """
+        if self.incremental:
+            return self.run_incremental()
+        if self.tile_size is not None:
+            return self.run_tiles()
+        # a full rewrite leaves nothing for a later incremental import to patch
+        tiling.manifest_path(self.out_path, self.layer_name).unlink(missing_ok=True)
+        nx_multigraph = self.prepare_graph(self.extents_poly, 0, 70)
+        if nx_multigraph is None or self.stages.is_canceled():
+            return 0
+        # write
+        feedback = self.stages.stage(70, 100, "write")
+        n_edges = nx_multigraph.number_of_edges()
+        write_network(
+            nx_multigraph,
+            self.out_path,
+            self.layer_name,
+            self.crs,
+            self.transform_context,
+            feedback,
+            release=True,
+            compact=self.compact,
+        )
+        self.stages.add_items(n_edges)
+        return n_edges
+
+    def run_tiles(self) -> int:
+        """ """
+        tiles = tiling.extents_tiles(self.extents_poly, self.tile_size)
+        manifest = tiling.TileManifest(
+            tiling.manifest_path(self.out_path, self.layer_name), self.manifest_signature(), len(tiles)
+        )
+        manifest.path.unlink(missing_ok=True)
+        stitcher = tiling.TileStitcher()
+        writer = writers.NetworkEdgeWriter(
+            self.out_path, self.layer_name, self.crs, self.transform_context, compact=self.compact
+        )
+        # the sidecar arrays of the whole region are held until saved - flat arrays and a node key index of roughly
+        # 250 bytes per edge (250 MB for a million edges), a fraction of a single tile's graph
+        arrays_writer = graph_store.GraphArraysWriter()
+        # downloads are I/O bound so a bounded number are fetched ahead while the current tile is simplified
+        # only tiles in flight are held in memory
+        executor = ThreadPoolExecutor(max_workers=self.tile_workers)
+        try:
+            pending: deque[tuple[Future[str] | None, str]] = deque()
+            next_idx = 0
+            span = 100 / len(tiles)
+            for tile_idx, (core, fetch_poly) in enumerate(tiles):
+                while next_idx < len(tiles) and next_idx <= tile_idx + self.tile_workers:
+                    ahead_poly = tiles[next_idx][1]
+                    # timestamped before the request so that later newer filters cannot miss an edit
+                    fetched = tiling.fetch_timestamp()
+                    if self.cache_hit(ahead_poly):
+                        pending.append((None, fetched))
+                    else:
+                        pending.append((executor.submit(self.fetch_osm_json, ahead_poly), fetched))
+                    next_idx += 1
+                osm_future, fetched = pending.popleft()
+                if self.stages.is_canceled():
+                    return writer.n_written
+                # tiles built from cached graphs have no hash, so a later incremental import refetches them
+                manifest.set_tile(tile_idx, None, None, None, [])
+
+                def tile_fetch(osm_future=osm_future, fetch_poly=fetch_poly, fetched=fetched) -> str:
+                    osm_json = self.fetch_osm_json(fetch_poly) if osm_future is None else osm_future.result()
+                    way_count, osm_base = osm_graph.osm_json_stats(osm_json)
+                    manifest.set_tile(tile_idx, osm_base or fetched, tiling.content_hash(osm_json), way_count, [])
+                    return osm_json
+
+                nx_multigraph = self.prepare_graph(
+                    fetch_poly, tile_idx * span, (tile_idx + 0.8) * span, fetch=tile_fetch
+                )
+                if nx_multigraph is None or self.stages.is_canceled():
+                    continue
+                self.stages.begin("stitch")
+                nx_multigraph = tiling.nx_clip_to_core(nx_multigraph, core)
+                nx_multigraph = stitcher.stitch(nx_multigraph, tile_idx)
+                self.stages.add_items(nx_multigraph.number_of_edges())
+                feedback = self.stages.stage((tile_idx + 0.8) * span, (tile_idx + 1) * span, "write")
+                start_fid = writer.n_written
+                self.stages.add_items(
+                    writer.write_graph(nx_multigraph, feedback, arrays_writer=arrays_writer, release=True)
+                )
+                manifest.tiles[tile_idx]["fids"] = list(range(start_fid, writer.n_written))
+                del nx_multigraph
+        finally:
+            # queued prefetches are dropped and running ones are left to finish in the background
+            executor.shutdown(wait=False, cancel_futures=True)
+            writer.close()
+        if self.stages.is_canceled():
+            return writer.n_written
+        if self.compact:
+            self.stages.begin("index")
+            writers.create_attribute_indexes(self.out_path, self.layer_name, ["start_nd", "end_nd"])
+        self.stages.begin("nodes write")
+        n_nodes = write_nodes(
+            arrays_writer, self.out_path, self.layer_name, self.crs, self.transform_context, compact=self.compact
+        )
+        self.stages.add_items(n_nodes)
+        self.stages.begin("graph save")
+        arrays_writer.save(graph_store.graph_path(self.out_path, self.layer_name), self.crs.authid())
+        manifest.save()
+        return writer.n_written
+
+    def run_incremental(self) -> int:
+        """ """
+        tiles = tiling.extents_tiles(self.extents_poly, self.tile_size)
+        manifest = tiling.TileManifest.load(
+            tiling.manifest_path(self.out_path, self.layer_name), self.manifest_signature(), len(tiles)
+        )
+        sidecar_path = graph_store.graph_path(self.out_path, self.layer_name)
+        # patching needs the earlier tiled import with its graph sidecar, unedited since
+        if (
+            manifest is None
+            or not Path(self.out_path).exists()
+            or not sidecar_path.exists()
+            or sidecar_path.stat().st_mtime < Path(self.out_path).stat().st_mtime
+        ):
+            return self.run_tiles()
+        feedback = self.stages.stage(0, 10, "probe")
+        refresh_idxs = self.changed_tiles(tiles, manifest, feedback)
+        if not refresh_idxs or self.stages.is_canceled():
+            return 0
+        # refetch - tiles with unchanged content only have their timestamps moved on
+        # only changed responses are held, on the premise that few tiles change between imports
+        feedback = self.stages.stage(10, 40, "fetch")
+        changed: dict[int, tuple[str, str, str]] = {}
+        executor = ThreadPoolExecutor(max_workers=self.tile_workers)
+        try:
+            futures: dict[Future[str], tuple[int, str]] = {}
+            for tile_idx in refresh_idxs:
+                fetched = tiling.fetch_timestamp()
+                futures[executor.submit(self.fetch_osm_json, tiles[tile_idx][1])] = (tile_idx, fetched)
+            for counter, future in enumerate(as_completed(futures)):
+                if self.stages.is_canceled():
+                    return 0
+                tile_idx, fetched = futures[future]
+                osm_json = future.result()
+                self.stages.add_items(len(osm_json))
+                osm_hash = tiling.content_hash(osm_json)
+                tile = manifest.tiles[tile_idx]
+                if tile is not None and tile["hash"] == osm_hash:
+                    tile["fetched"] = osm_graph.osm_json_stats(osm_json)[1] or fetched
+                else:
+                    changed[tile_idx] = (osm_json, fetched, osm_hash)
+                feedback.setProgress(100 * (counter + 1) / len(futures))
+        finally:
+            # queued fetches are dropped and running ones are left to finish in the background
+            executor.shutdown(wait=False, cancel_futures=True)
+        if not changed:
+            manifest.save()
+            return 0
+        # edges of unchanged tiles are kept and seed the stitcher so that refreshed tiles join onto them
+        self.stages.begin("graph load")
+        graph_arrays = graph_store.load_graph_arrays(sidecar_path)
+        stale_fids = [fid for tile_idx in changed for fid in (manifest.tiles[tile_idx] or {"fids": []})["fids"]]
+        keep = ~np.isin(graph_arrays["edge_fids"], stale_fids)
+        stitcher = tiling.TileStitcher()
+        stitcher.seed(
+            graph_arrays["node_keys"],
+            graph_arrays["node_xys"],
+            graph_arrays["edge_nodes"][keep],
+            graph_arrays["edge_keys"][keep],
+        )
+        arrays_writer = graph_store.GraphArraysWriter()
+        arrays_writer.add_arrays(graph_arrays, keep)
+        del graph_arrays
+        # rebuild the changed tiles before touching the GPKG, so that cancelling leaves it as it was
+        span = 50 / len(changed)
+        tile_graphs: list[tuple[int, nx.MultiGraph | None]] = []
+        for counter, tile_idx in enumerate(sorted(changed)):
+            core, fetch_poly = tiles[tile_idx]
+            osm_json, fetched, osm_hash = changed.pop(tile_idx)
+            way_count, osm_base = osm_graph.osm_json_stats(osm_json)
+            manifest.set_tile(tile_idx, osm_base or fetched, osm_hash, way_count, [])
+            nx_multigraph = self.prepare_graph(
+                fetch_poly,
+                40 + counter * span,
+                40 + (counter + 1) * span,
+                fetch=lambda osm_json=osm_json: osm_json,
+                refresh=True,
+            )
+            del osm_json
+            if self.stages.is_canceled():
+                return 0
+            if nx_multigraph is not None:
+                self.stages.begin("stitch")
+                nx_multigraph = tiling.nx_clip_to_core(nx_multigraph, core)
+                nx_multigraph = stitcher.stitch(nx_multigraph, f"r{manifest.revision + 1}_{tile_idx}")
+                self.stages.add_items(nx_multigraph.number_of_edges())
+            tile_graphs.append((tile_idx, nx_multigraph))
+        # patch - stale edges out, rebuilt edges in, then the sidecar and manifest to match
+        self.stages.stage(90, 100, "patch")
+        patcher = writers.NetworkEdgePatcher(self.out_path, self.layer_name)
+        try:
+            patcher.delete(stale_fids)
+            for tile_idx, nx_multigraph in tile_graphs:
+                if nx_multigraph is None:
+                    continue
+                start_fid = patcher.start_fid + patcher.n_written
+                patcher.write_graph(nx_multigraph, arrays_writer=arrays_writer, release=True)
+                manifest.tiles[tile_idx]["fids"] = list(range(start_fid, patcher.start_fid + patcher.n_written))
+        finally:
+            patcher.close()
+        self.stages.add_items(patcher.n_written)
+        # node degrees change around the patched tiles - the node layer is rewritten
+        self.stages.begin("nodes write")
+        n_nodes = write_nodes(
+            arrays_writer, self.out_path, self.layer_name, self.crs, self.transform_context, compact=patcher.compact
+        )
+        self.stages.add_items(n_nodes)
+        self.stages.begin("graph save")
+        arrays_writer.save(sidecar_path, self.crs.authid())
+        manifest.revision += 1
+        manifest.save()
+        return patcher.n_written
+
+    def changed_tiles(
+        self,
+        tiles: list[tuple[geometry.Polygon, geometry.Polygon | geometry.MultiPolygon]],
+        manifest: tiling.TileManifest,
+        feedback: QgsFeedback,
+    ) -> list[int]:
+        """ """
+        refresh_idxs: list[int] = []
+        probes: dict[Future[tuple[int, int]], int] = {}
+        executor = ThreadPoolExecutor(max_workers=self.tile_workers)
+        try:
+            for tile_idx, (_, fetch_poly) in enumerate(tiles):
+                tile = manifest.tiles[tile_idx]
+                if tile is None or tile["hash"] is None:
+                    refresh_idxs.append(tile_idx)
+                elif self.dirty_poly is not None and fetch_poly.intersects(self.dirty_poly):
+                    refresh_idxs.append(tile_idx)
+                elif self.osm_file_path is not None:
+                    # local extracts have no edit timestamps to probe - reading is cheap and the hash decides
+                    refresh_idxs.append(tile_idx)
+                else:
+                    probe = executor.submit(osm_graph.osm_probe_from_poly, fetch_poly, self.crs_code, tile["fetched"])
+                    probes[probe] = tile_idx
+            for counter, future in enumerate(as_completed(probes)):
+                if feedback.isCanceled():
+                    return []
+                tile_idx = probes[future]
+                total_count, newer_count = future.result()
+                if newer_count > 0 or total_count != manifest.tiles[tile_idx]["ways"]:
+                    refresh_idxs.append(tile_idx)
+                feedback.setProgress(100 * (counter + 1) / len(probes))
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        return sorted(refresh_idxs)
+
+    def manifest_signature(self) -> str:
+        """ """
+        # the extract path rather than the source key - a changed extract is what incremental imports look for
+        source = "overpass" if self.osm_file_path is None else str(self.osm_file_path.absolute())
+        return tiling.TileManifest.make_signature(
+            self.extents_poly, self.crs_code, self.tile_size, self.simplify, source, self.compact
+        )
+
+    def fetch_osm_json(
+        self, extents_poly: geometry.Polygon | geometry.MultiPolygon, feedback: QgsFeedback | None = None
+    ) -> str:
+        """ """
+        if self.osm_file_path is not None:
+            return osm_file.osm_json_from_file(self.osm_file_path, extents_poly, self.crs_code, feedback)
+        osm_request = osm_graph.osm_request_from_poly(extents_poly, self.crs_code)
+        return osm_graph.fetch_osm_json(osm_request)
+
+    def prepare_graph(
+        self,
+        extents_poly: geometry.Polygon | geometry.MultiPolygon,
+        start: float,
+        end: float,
+        fetch: Callable[[], str] | None = None,
+        refresh: bool = False,
+    ) -> nx.MultiGraph | None:
+        """ """
+        span = end - start
+        nx_multigraph = None
+        # refreshed graphs still replace their stale cache entries
+        if not refresh:
+            self.stages.begin("cache read")
+            nx_multigraph = self.cached_graph(extents_poly, simplify=self.simplify)
+            if nx_multigraph is not None:
+                return nx_multigraph
+            nx_multigraph = self.cached_graph(extents_poly, simplify=None)
+        if nx_multigraph is None:
+            # download
+            feedback = self.stages.stage(start, start + 0.4 * span, "fetch")
+            osm_json = fetch() if fetch is not None else self.fetch_osm_json(extents_poly, feedback)
+            # items are bytes of OSM JSON
+            self.stages.add_items(len(osm_json))
+            if self.stages.is_canceled():
+                return None
+            # graph build
+            self.stages.stage(start + 0.4 * span, start + 0.55 * span, "parse")
+            nx_multigraph = osm_graph.nx_from_osm_json(osm_json, self.crs_code)
+            self.stages.add_items(nx_multigraph.number_of_edges())
+            del osm_json
+            if self.stages.is_canceled():
+                return None
+            self.stages.begin("cache write")
+            self.cache_graph(nx_multigraph, extents_poly, simplify=None)
+        # tiles at the edges of the extents can be empty
+        if nx_multigraph.number_of_edges() == 0:
+            return None
+        # simplify
+        feedback = self.stages.stage(start + 0.55 * span, end, "simplify")
+        if self.simplify:
+            nx_multigraph = osm_graph.nx_simplify(nx_multigraph, feedback=feedback)
+        else:
+            nx_multigraph = osm_graph.nx_simple_geoms(nx_multigraph)
+        self.stages.add_items(nx_multigraph.number_of_edges())
+        if self.stages.is_canceled():
+            return None
+        self.stages.begin("cache write")
+        self.cache_graph(nx_multigraph, extents_poly, simplify=self.simplify)
+        return nx_multigraph
+
+    def cache_key(self, extents_poly: geometry.Polygon | geometry.MultiPolygon, simplify: bool | None) -> str:
+        """ """
+        return GraphCache.make_key(extents_poly, self.crs_code, simplify, self.source_key)
+
+    def cache_hit(self, extents_poly: geometry.Polygon | geometry.MultiPolygon) -> bool:
+        """ """
+        if self.cache is None or self.force_refresh:
+            return False
+        return any(
+            self.cache.entry_path(self.cache_key(extents_poly, simplify)).exists() for simplify in (self.simplify, None)
+        )
+
+    def cached_graph(
+        self, extents_poly: geometry.Polygon | geometry.MultiPolygon, simplify: bool | None
+    ) -> nx.MultiGraph | None:
+        """ """
+        if self.cache is None or self.force_refresh:
+            return None
+        return self.cache.get(self.cache_key(extents_poly, simplify))
+
+    def cache_graph(
+        self,
+        nx_multigraph: nx.MultiGraph,
+        extents_poly: geometry.Polygon | geometry.MultiPolygon,
+        simplify: bool | None,
+    ) -> None:
+        """ """
+        if self.cache is None:
+            return
+        self.cache.put(self.cache_key(extents_poly, simplify), nx_multigraph)
+
+
+def import_osm_network(
+    extents_poly: geometry.Polygon | geometry.MultiPolygon,
+    crs: QgsCoordinateReferenceSystem,
+    out_path: str,
+    transform_context: QgsCoordinateTransformContext,
+    layer_name: str = "osm_network",
+    simplify: bool = True,
+    cache_dir_path: Path | None = None,
+    force_refresh: bool = False,
+    tile_size: int | None = None,
+    tile_workers: int = 2,
+    osm_file_path: Path | None = None,
+    incremental: bool = False,
+    dirty_poly: geometry.Polygon | geometry.MultiPolygon | None = None,
+    compact: bool = False,
+    stages: Stages | None = None,
+) -> int:
+    """ """
+    return OsmImport(
+        extents_poly,
+        crs,
+        out_path,
+        transform_context,
+        layer_name=layer_name,
+        simplify=simplify,
+        cache_dir_path=cache_dir_path,
+        force_refresh=force_refresh,
+        tile_size=tile_size,
+        tile_workers=tile_workers,
+        osm_file_path=osm_file_path,
+        incremental=incremental,
+        dirty_poly=dirty_poly,
+        compact=compact,
+        stages=stages,
+    ).run()
+
+
+def import_osm_batch(
+    areas: list[tuple[str, geometry.Polygon | geometry.MultiPolygon]],
+    crs: QgsCoordinateReferenceSystem,
+    out_dir_path: Path,
+    file_name: str,
+    transform_context: QgsCoordinateTransformContext,
+    multi_layer: bool = False,
+    simplify: bool = True,
+    cache_dir_path: Path | None = None,
+    force_refresh: bool = False,
+    max_workers: int = batch.BATCH_WORKERS,
+    max_tries: int = batch.BATCH_TRIES,
+    compact: bool = False,
+    stages: Stages | None = None,
+) -> tuple[list[tuple[str, str]], list[tuple[str, str]]]:
+    """ """
+    # areas are fetched and simplified in worker processes, at most max_workers at a time to respect Overpass limits
+    # writes stay in this process - one at a time, as results arrive
+    stages = Stages() if stages is None else stages
+    crs_code = transforms.crs_code(crs)
+    cache = None if cache_dir_path is None else GraphCache(cache_dir_path)
+    written: list[tuple[str, str]] = []
+    failed: list[tuple[str, str]] = []
+
+    def area_output(area_name: str) -> tuple[str, str]:
+        if multi_layer:
+            return str(out_dir_path / f"{file_name}.gpkg"), area_name
+        return str(out_dir_path / f"{file_name}_{area_name}.gpkg"), "osm_network"
+
+    def write_area(area_name: str, nx_multigraph: nx.MultiGraph) -> None:
+        out_path, layer_name = area_output(area_name)
+        n_done = len(written) + len(failed)
+        feedback = stages.stage(100 * n_done / len(areas), 100 * (n_done + 1) / len(areas), "write")
+        # the first layer replaces any earlier multi-layer file
+        write_network(
+            nx_multigraph,
+            out_path,
+            layer_name,
+            crs,
+            transform_context,
+            feedback,
+            overwrite_file=not multi_layer or not written,
+            release=True,
+            compact=compact,
+        )
+        stages.add_items(nx_multigraph.number_of_edges())
+        written.append((out_path, layer_name))
+
+    pending: dict[Future[Path | None], tuple[str, str | None]] = {}
+    with tempfile.TemporaryDirectory() as temp_dir, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for area_name, poly in areas:
+            cache_key = None
+            if cache is not None:
+                cache_key = GraphCache.make_key(poly, crs_code, simplify, "overpass")
+                nx_multigraph = None if force_refresh else cache.get(cache_key)
+                if nx_multigraph is not None:
+                    write_area(area_name, nx_multigraph)
+                    continue
+            graph_path = Path(temp_dir) / f"{area_name}.pickle"
+            future = executor.submit(
+                batch.run_area_worker, poly, crs_code, simplify, graph_path, stages.feedback, max_tries
+            )
+            pending[future] = (area_name, cache_key)
+        for future in as_completed(pending):
+            area_name, cache_key = pending[future]
+            if stages.is_canceled():
+                break
+            try:
+                graph_path = future.result()
+            except Exception as err:
+                failed.append((area_name, str(err)))
+                continue
+            if graph_path is None:
+                continue
+            stages.begin("load")
+            with open(graph_path, "rb") as graph_file:
+                nx_multigraph = pickle.load(graph_file)
+            graph_path.unlink()
+            if cache is not None:
+                stages.begin("cache write")
+                cache.put(cache_key, nx_multigraph)
+            write_area(area_name, nx_multigraph)
+            del nx_multigraph
+    return written, failed
+
+
+def decompose_network(
+    layer_source: LayerSource,
+    decompose_max: int,
+    crs: QgsCoordinateReferenceSystem,
+    out_path: str,
+    transform_context: QgsCoordinateTransformContext,
+    layer_name: str = "decomposed_network",
+    layer_network: network.LayerNetwork | None = None,
+    stages: Stages | None = None,
+) -> int:
+    """ """
+    stages = Stages() if stages is None else stages
+    layer_network = network.LayerNetwork() if layer_network is None else layer_network
+    # read - or reuse a network converted by an earlier run
+    feedback = stages.stage(0, 30, "read")
+    nx_multigraph = layer_network.graph(layer_source, feedback)
+    if nx_multigraph is None or stages.is_canceled():
+        return 0
+    stages.add_items(nx_multigraph.number_of_edges())
+    # decompose
+    feedback = stages.stage(30, 60, "decompose")
+    nx_decomposed = network.nx_decompose(nx_multigraph, decompose_max, feedback)
+    # shared networks stay with their cache - otherwise released before the write
+    del nx_multigraph, layer_network
+    if nx_decomposed is None or stages.is_canceled():
+        return 0
+    stages.add_items(nx_decomposed.number_of_edges())
+    # write
+    feedback = stages.stage(60, 100, "write")
+    n_edges = nx_decomposed.number_of_edges()
+    write_network(nx_decomposed, out_path, layer_name, crs, transform_context, feedback, release=True)
+    stages.add_items(n_edges)
+    return n_edges
+
+
+def import_line_network(
+    layer_source: LayerSource,
+    out_path: str,
+    transform_context: QgsCoordinateTransformContext,
+    layer_name: str = "line_network",
+    snap_tolerance: float = network.SNAP_TOLERANCE,
+    despine: float = network.DESPINE_DIST,
+    merge_fillers: bool = True,
+    compact: bool = False,
+    stages: Stages | None = None,
+) -> int:
+    """ """
+    # a network from any line layer - topology, GPKG and graph sidecar are all built from arrays
+    stages = Stages() if stages is None else stages
+    feedback = stages.stage(0, 20, "read")
+    _, geoms, _ = layer_source.read_arrays([], feedback)
+    stages.add_items(len(geoms))
+    if stages.is_canceled():
+        return 0
+    feedback = stages.stage(20, 50, "topology")
+    line_arrays = network.line_network_arrays(geoms, snap_tolerance, despine, merge_fillers, feedback)
+    del geoms
+    if line_arrays is None or stages.is_canceled():
+        return 0
+    edge_geoms, start_nds, end_nds, node_xys = line_arrays
+    n_edges = len(edge_geoms)
+    stages.add_items(n_edges)
+    # node labels are not OSM ids
+    node_keys = np.char.add("n", np.arange(len(node_xys)).astype(str))
+    edge_nodes = np.column_stack([start_nds, end_nds])
+    edge_keys = network.parallel_edge_keys(start_nds, end_nds)
+    arrays_writer = graph_store.GraphArraysWriter()
+    arrays_writer.add_line_arrays(
+        node_keys, node_xys, edge_nodes, edge_keys, edge_geoms, np.arange(n_edges, dtype=np.int64)
+    )
+    # write
+    feedback = stages.stage(50, 100, "write")
+    writer = writers.NetworkEdgeWriter(out_path, layer_name, layer_source.crs, transform_context, compact=compact)
+    try:
+        writer.write_arrays(edge_geoms, edge_nodes, edge_keys, node_keys, feedback)
+    finally:
+        writer.close()
+    stages.add_items(writer.n_written)
+    if stages.is_canceled():
+        return writer.n_written
+    if compact:
+        stages.begin("index")
+        writers.create_attribute_indexes(out_path, layer_name, ["start_nd", "end_nd"])
+    stages.begin("nodes write")
+    n_nodes = write_nodes(arrays_writer, out_path, layer_name, layer_source.crs, transform_context, compact=compact)
+    stages.add_items(n_nodes)
+    stages.begin("graph save")
+    arrays_writer.save(graph_store.graph_path(out_path, layer_name), layer_source.crs.authid())
+    return writer.n_written
+
+
+def migrate_network(
+    layer_source: LayerSource,
+    out_path: str,
+    transform_context: QgsCoordinateTransformContext,
+    layer_name: str = "osm_network",
+    stages: Stages | None = None,
+) -> int:
+    """ """
+    # rewrites a string keyed network layer in the compact schema, with its node layer, lookup table and sidecar
+    # fids and any computed columns are carried over
+    stages = Stages() if stages is None else stages
+    feedback = stages.stage(0, 30, "read")
+    fids, geoms, values = layer_source.read_arrays(["start_nd", "end_nd", "edge_key"], feedback)
+    if "start_nd" not in values or "end_nd" not in values:
+        raise ValueError("The layer has no start_nd and end_nd node keys to migrate.")
+    if values["start_nd"].dtype.kind in "iu":
+        raise ValueError("The layer already uses integer node keys.")
+    if stages.is_canceled():
+        return 0
+    stages.stage(30, 40, "graph build")
+    start_keys = values["start_nd"].astype(str)
+    end_keys = values["end_nd"].astype(str)
+    edge_keys = values.get("edge_key")
+    nx_multigraph = network.nx_from_line_geoms(geoms, start_keys, end_keys, edge_keys, fids=fids)
+    del geoms
+    arrays_writer = graph_store.GraphArraysWriter()
+    arrays_writer.add_graph(nx_multigraph, start_fid=None)
+    del nx_multigraph
+    start_ids = [arrays_writer.node_index[start_key] for start_key in start_keys.tolist()]
+    end_ids = [arrays_writer.node_index[end_key] for end_key in end_keys.tolist()]
+    edge_key_list = [0] * len(fids) if edge_keys is None else edge_keys.tolist()
+    row_idxs = {fid: row_idx for row_idx, fid in enumerate(fids.tolist())}
+    # edges - geometries and extra columns copied feature by feature
+    feedback = stages.stage(40, 90, "write")
+    source_fields = layer_source.feature_source.fields()
+    base_names = set(writers.network_edge_fields().names())
+    extra_fields = QgsFields()
+    for field in source_fields:
+        if field.name() not in base_names:
+            extra_fields.append(field)
+    extra_idxs = [source_fields.indexOf(field.name()) for field in extra_fields]
+    writer = writers.NetworkEdgeWriter(
+        out_path, layer_name, layer_source.crs, transform_context, compact=True, extra_fields=extra_fields
+    )
+    try:
+        chunk: list[QgsFeature] = []
+        feature: QgsFeature
+        for feature in layer_source.feature_source.getFeatures():
+            row_idx = row_idxs[feature.id()]
+            attributes = feature.attributes()
+            feat = QgsFeature(writer.fields)
+            feat.setGeometry(feature.geometry())
+            feat.setAttributes(
+                [feature.id(), start_ids[row_idx], end_ids[row_idx], edge_key_list[row_idx]]
+                + [attributes[extra_idx] for extra_idx in extra_idxs]
+            )
+            chunk.append(feat)
+            if len(chunk) < writer.chunk_size:
+                continue
+            writer.add_chunk(chunk)
+            chunk = []
+            if feedback.isCanceled():
+                return writer.n_written
+            feedback.setProgress(100 * writer.n_written / len(row_idxs))
+        if chunk:
+            writer.add_chunk(chunk)
+    finally:
+        writer.close()
+    stages.add_items(writer.n_written)
+    stages.begin("index")
+    writers.create_attribute_indexes(out_path, layer_name, ["start_nd", "end_nd"])
+    stages.begin("nodes write")
+    n_nodes = write_nodes(arrays_writer, out_path, layer_name, layer_source.crs, transform_context, compact=True)
+    stages.add_items(n_nodes)
+    stages.begin("graph save")
+    arrays_writer.save(graph_store.graph_path(out_path, layer_name), layer_source.crs.authid())
+    return writer.n_written
+
+
+def network_centrality(
+    layer_source: LayerSource,
+    measures: list[str],
+    distances: list[int],
+    angular: bool = False,
+    layer_network: network.LayerNetwork | None = None,
+    workers: int = 1,
+    stages: Stages | None = None,
+) -> tuple[np.ndarray, pd.DataFrame] | None:
+    """ """
+    stages = Stages() if stages is None else stages
+    layer_network = network.LayerNetwork() if layer_network is None else layer_network
+    crs_code = transforms.crs_code(layer_source.crs)
+    # read - or reuse a network converted by an earlier run
+    feedback = stages.stage(0, 20, "read")
+    nx_multigraph = layer_network.graph(layer_source, feedback)
+    if nx_multigraph is None or stages.is_canceled():
+        return None
+    stages.add_items(nx_multigraph.number_of_edges())
+    # compute - all distances in one pass
+    feedback = stages.stage(20, 90, "centrality")
+    nodes_df = network.compute_centrality(
+        layer_network, crs_code, measures, distances, angular=angular, workers=workers, feedback=feedback
+    )
+    if nodes_df is None or stages.is_canceled():
+        return None
+    stages.add_items(len(nodes_df))
+    stages.stage(90, 100, "edge values")
+    fids, edge_values = network.edge_values_from_nodes(nx_multigraph, nodes_df)
+    stages.add_items(len(fids))
+    return fids, edge_values
+
+
+def network_landuses(
+    netw_source: LayerSource,
+    data_source: LayerSource,
+    landuse_field: str,
+    accessibility_keys: list[str],
+    mixed_uses: bool,
+    distances: list[int],
+    max_assign_dist: int = network.MAX_ASSIGN_DIST,
+    assignment: tuple[np.ndarray, np.ndarray, np.ndarray] | None = None,
+    layer_network: network.LayerNetwork | None = None,
+    stages: Stages | None = None,
+) -> tuple[np.ndarray, pd.DataFrame, tuple[np.ndarray, np.ndarray, np.ndarray]] | None:
+    """ """
+    stages = Stages() if stages is None else stages
+    layer_network = network.LayerNetwork() if layer_network is None else layer_network
+    crs_code = transforms.crs_code(netw_source.crs)
+    # read - or reuse a network converted by an earlier run
+    feedback = stages.stage(0, 15, "read")
+    nx_multigraph = layer_network.graph(netw_source, feedback)
+    if nx_multigraph is None or stages.is_canceled():
+        return None
+    stages.add_items(nx_multigraph.number_of_edges())
+    feedback = stages.stage(15, 25, "read data")
+    data_fids, data_geoms, data_values = data_source.read_arrays([landuse_field], feedback)
+    stages.add_items(len(data_fids))
+    if stages.is_canceled():
+        return None
+    # assign data to the network unless a cached assignment lines up with the data
+    stages.stage(25, 40, "assign")
+    if assignment is None or not np.array_equal(assignment[0], data_fids):
+        assignment = (data_fids, *network.assign_data_to_network(nx_multigraph, data_geoms, max_assign_dist))
+        stages.add_items(len(data_fids))
+    if stages.is_canceled():
+        return None
+    # compute - all distances in one pass
+    stages.stage(40, 90, "landuses")
+    _, nearest_keys, next_nearest_keys = assignment
+    nodes_df = network.compute_landuses(
+        layer_network,
+        crs_code,
+        data_geoms,
+        data_values[landuse_field],
+        nearest_keys,
+        next_nearest_keys,
+        accessibility_keys,
+        mixed_uses,
+        distances,
+        max_assign_dist,
+    )
+    stages.add_items(len(nodes_df))
+    if stages.is_canceled():
+        return None
+    stages.stage(90, 100, "edge values")
+    fids, edge_values = network.edge_values_from_nodes(nx_multigraph, nodes_df)
+    stages.add_items(len(fids))
+    return fids, edge_values, assignment
@@ -0,0 +1,526 @@
+""" """
+from __future__ import annotations
+
+from itertools import islice
+from typing import Generator
+
+import networkx as nx
+import numpy as np
+import shapely
+from qgis.core import (
+    QgsCoordinateReferenceSystem,
+    QgsCoordinateTransformContext,
+    QgsFeature,
+    QgsFeedback,
+    QgsField,
+    QgsFields,
+    QgsGeometry,
+    QgsVectorFileWriter,
+    QgsVectorLayer,
+    QgsWkbTypes,
+)
+from qgis.PyQt.QtCore import QVariant
+
+from . import graph_store
+
+WRITE_CHUNK_SIZE = 10000
+
+
+def network_edge_fields(compact: bool = False) -> QgsFields:
+    """ """
+    fields = QgsFields()
+    fields.append(QgsField("fid", QVariant.Int))
+    if compact:
+        # node ids in place of node key strings - the keys move to the lookup table
+        fields.append(QgsField("start_nd", QVariant.LongLong))
+        fields.append(QgsField("end_nd", QVariant.LongLong))
+        fields.append(QgsField("edge_key", QVariant.Int))
+        return fields
+    fields.append(QgsField("start_nd", QVariant.String))
+    fields.append(QgsField("end_nd", QVariant.String))
+    fields.append(QgsField("edge_key", QVariant.Int))
+    # integer references to the node layer's node_id
+    fields.append(QgsField("start_id", QVariant.Int))
+    fields.append(QgsField("end_id", QVariant.Int))
+    return fields
+
+
+def network_node_fields(compact: bool = False) -> QgsFields:
+    """ """
+    fields = QgsFields()
+    fields.append(QgsField("fid", QVariant.Int))
+    if compact:
+        fields.append(QgsField("node_id", QVariant.LongLong))
+        fields.append(QgsField("degree", QVariant.Int))
+        return fields
+    fields.append(QgsField("node_id", QVariant.Int))
+    fields.append(QgsField("node_key", QVariant.String))
+    fields.append(QgsField("degree", QVariant.Int))
+    return fields
+
+
+def node_lookup_fields() -> QgsFields:
+    """ """
+    fields = QgsFields()
+    fields.append(QgsField("node_id", QVariant.LongLong))
+    fields.append(QgsField("osm_id", QVariant.LongLong))
+    fields.append(QgsField("node_key", QVariant.String))
+    return fields
+
+
+def nodes_layer_name(layer_name: str) -> str:
+    """ """
+    # osm_network pairs with osm_nodes, other layers with a _nodes suffix
+    if layer_name.endswith("_network"):
+        return f"{layer_name[: -len('_network')]}_nodes"
+    return f"{layer_name}_nodes"
+
+
+def node_lookup_name(layer_name: str) -> str:
+    """ """
+    return f"{nodes_layer_name(layer_name)}_lookup"
+
+
+def osm_ids_from_keys(node_keys: list[str]) -> list[int | None]:
+    """ """
+    # OSM node ids survive as node keys, behind a tile prefix when tiled - merged or split nodes have none
+    osm_ids: list[int | None] = []
+    for node_key in node_keys:
+        osm_label = node_key.rsplit("_", 1)[-1]
+        osm_ids.append(int(osm_label) if osm_label.isdigit() else None)
+    return osm_ids
+
+
+def create_attribute_indexes(out_path: str, layer_name: str, field_names: list[str]) -> None:
+    """ """
+    layer = QgsVectorLayer(f"{out_path}|layername={layer_name}", layer_name, "ogr")
+    if not layer.isValid():
+        raise IOError(f"Unable to open layer: {out_path}|layername={layer_name}")
+    provider = layer.dataProvider()
+    for field_name in field_names:
+        if not provider.createAttributeIndex(layer.fields().indexOf(field_name)):
+            raise IOError(f"Unable to index {field_name} on: {out_path}|layername={layer_name}")
+
+
+def network_edge_batches(
+    nx_multigraph: nx.MultiGraph,
+    fields: QgsFields,
+    start_fid: int = 0,
+    batch_size: int = WRITE_CHUNK_SIZE,
+    arrays_writer: graph_store.GraphArraysWriter | None = None,
+    release: bool = False,
+    compact: bool = False,
+) -> Generator[list[QgsFeature], None, None]:
+    """ """
+    # one batch of geoms, WKBs and features is alive at a time rather than a copy of the whole network
+    # release clears each batch's edge data once converted, so the graph shrinks as the output grows
+    # node ids are the graph sidecar's node indices, or graph order where no sidecar is written
+    if arrays_writer is not None:
+        arrays_writer.add_nodes(nx_multigraph)
+        node_index = arrays_writer.node_index
+    else:
+        node_index = {str(nd_key): nd_idx for nd_idx, nd_key in enumerate(nx_multigraph.nodes)}
+    edge_iter = iter(nx_multigraph.edges(keys=True, data=True))
+    fid = start_fid
+    while edges := list(islice(edge_iter, batch_size)):
+        geoms = graph_store.edge_geoms(nx_multigraph, edges)
+        if arrays_writer is not None:
+            arrays_writer.add_edges(edges, geoms, np.arange(fid, fid + len(edges), dtype=np.int64))
+        # vectorised WKB conversion avoids a WKT string round-trip per edge
+        edge_wkbs = shapely.to_wkb(geoms, output_dimension=2)
+        del geoms
+        batch: list[QgsFeature] = []
+        for (start_idx, end_idx, edge_key, edge_data), edge_wkb in zip(edges, edge_wkbs):
+            start_key = str(start_idx)
+            end_key = str(end_idx)
+            batch.append(
+                edge_feature(
+                    fields,
+                    fid,
+                    edge_wkb,
+                    start_key,
+                    end_key,
+                    int(edge_key),
+                    node_index[start_key],
+                    node_index[end_key],
+                    compact,
+                )
+            )
+            fid += 1
+            if release:
+                edge_data.clear()
+        del edges, edge_wkbs
+        yield batch
+
+
+def network_edge_array_batches(
+    geoms: np.ndarray,
+    edge_nodes: np.ndarray,
+    edge_keys: np.ndarray,
+    node_keys: np.ndarray,
+    fields: QgsFields,
+    start_fid: int = 0,
+    batch_size: int = WRITE_CHUNK_SIZE,
+    compact: bool = False,
+) -> Generator[list[QgsFeature], None, None]:
+    """ """
+    # as network_edge_batches for networks built on arrays - edge nodes are node ids indexing node_keys
+    node_key_list = node_keys.tolist()
+    for batch_start in range(0, len(geoms), batch_size):
+        batch_stop = min(batch_start + batch_size, len(geoms))
+        edge_wkbs = shapely.to_wkb(geoms[batch_start:batch_stop], output_dimension=2)
+        batch: list[QgsFeature] = []
+        for fid, edge_wkb, (start_id, end_id), edge_key in zip(
+            range(start_fid + batch_start, start_fid + batch_stop),
+            edge_wkbs,
+            edge_nodes[batch_start:batch_stop].tolist(),
+            edge_keys[batch_start:batch_stop].tolist(),
+        ):
+            start_key = node_key_list[start_id]
+            end_key = node_key_list[end_id]
+            batch.append(edge_feature(fields, fid, edge_wkb, start_key, end_key, edge_key, start_id, end_id, compact))
+        del edge_wkbs
+        yield batch
+
+
+def edge_feature(
+    fields: QgsFields,
+    fid: int,
+    edge_wkb: bytes,
+    start_key: str,
+    end_key: str,
+    edge_key: int,
+    start_id: int,
+    end_id: int,
+    compact: bool = False,
+) -> QgsFeature:
+    """ """
+    geom = QgsGeometry()
+    geom.fromWkb(edge_wkb)
+    feat = QgsFeature(fields)
+    feat.setGeometry(geom)
+    if compact:
+        feat.setAttributes([fid, start_id, end_id, edge_key])
+    else:
+        feat.setAttributes([fid, start_key, end_key, edge_key, start_id, end_id])
+    return feat
+
+
+def network_edge_features(
+    nx_multigraph: nx.MultiGraph, fields: QgsFields, start_fid: int = 0
+) -> Generator[QgsFeature, None, None]:
+    """ """
+    for batch in network_edge_batches(nx_multigraph, fields, start_fid=start_fid):
+        yield from batch
+
+
+class NetworkEdgeWriter:
+    """ """
+
+    out_path: str
+    fields: QgsFields
+    compact: bool
+    chunk_size: int
+    writer: QgsVectorFileWriter | None
+    start_fid: int
+    n_written: int
+
+    def __init__(
+        self,
+        out_path: str,
+        layer_name: str,
+        crs: QgsCoordinateReferenceSystem,
+        transform_context: QgsCoordinateTransformContext,
+        chunk_size: int = WRITE_CHUNK_SIZE,
+        overwrite_file: bool = True,
+        compact: bool = False,
+        extra_fields: QgsFields | None = None,
+    ):
+        """ """
+        self.out_path = out_path
+        self.compact = compact
+        self.fields = network_edge_fields(compact)
+        # e.g. computed columns carried over by a schema migration
+        if extra_fields is not None:
+            for field in extra_fields:
+                self.fields.append(field)
+        self.chunk_size = chunk_size
+        self.start_fid = 0
+        self.n_written = 0
+        # vector writer
+        save_options = QgsVectorFileWriter.SaveVectorOptions()
+        save_options.driverName = "GPKG"
+        save_options.fileEncoding = "UTF-8"
+        save_options.layerName = layer_name
+        # multi-layer GPKGs add layers to the existing file
+        if not overwrite_file:
+            save_options.actionOnExistingFile = QgsVectorFileWriter.CreateOrOverwriteLayer
+        # the writer wraps GPKG output in a single OGR transaction, committed when the writer is deleted
+        self.writer = QgsVectorFileWriter.create(
+            out_path,
+            self.fields,
+            QgsWkbTypes.LineString,
+            crs,
+            transform_context,
+            save_options,
+        )
+        if self.writer.hasError() != QgsVectorFileWriter.NoError:
+            raise IOError(f"Unable to create output file: {out_path}: {self.writer.errorMessage()}")
+
+    def add_chunk(self, chunk: list[QgsFeature]) -> None:
+        """ """
+        if not self.writer.addFeatures(chunk):
+            raise IOError(f"Unable to write features to: {self.out_path}: {self.writer.errorMessage()}")
+        self.n_written += len(chunk)
+
+    def write_graph(
+        self,
+        nx_multigraph: nx.MultiGraph,
+        feedback: QgsFeedback | None = None,
+        arrays_writer: graph_store.GraphArraysWriter | None = None,
+        release: bool = False,
+    ) -> int:
+        """ """
+        # write features in chunks, converted as they are written
+        n_edges = nx_multigraph.number_of_edges()
+        counter = 0
+        for chunk in network_edge_batches(
+            nx_multigraph,
+            self.fields,
+            start_fid=self.start_fid + self.n_written,
+            batch_size=self.chunk_size,
+            arrays_writer=arrays_writer,
+            release=release,
+            compact=self.compact,
+        ):
+            self.add_chunk(chunk)
+            counter += len(chunk)
+            del chunk
+            if feedback is not None:
+                if feedback.isCanceled():
+                    return counter
+                feedback.setProgress(100 * counter / n_edges)
+        return counter
+
+    def write_arrays(
+        self,
+        geoms: np.ndarray,
+        edge_nodes: np.ndarray,
+        edge_keys: np.ndarray,
+        node_keys: np.ndarray,
+        feedback: QgsFeedback | None = None,
+    ) -> int:
+        """ """
+        counter = 0
+        for chunk in network_edge_array_batches(
+            geoms,
+            edge_nodes,
+            edge_keys,
+            node_keys,
+            self.fields,
+            start_fid=self.start_fid + self.n_written,
+            batch_size=self.chunk_size,
+            compact=self.compact,
+        ):
+            self.add_chunk(chunk)
+            counter += len(chunk)
+            del chunk
+            if feedback is not None:
+                if feedback.isCanceled():
+                    return counter
+                feedback.setProgress(100 * counter / len(geoms))
+        return counter
+
+    def close(self) -> None:
+        """ """
+        self.writer = None  # important! - flushes and commits
+
+
+class NetworkEdgePatcher(NetworkEdgeWriter):
+    """ """
+
+    # edits an existing network layer in place - new edges are numbered on from the highest fid
+    layer: QgsVectorLayer | None
+
+    def __init__(self, out_path: str, layer_name: str, chunk_size: int = WRITE_CHUNK_SIZE):
+        """ """
+        self.out_path = out_path
+        self.chunk_size = chunk_size
+        self.writer = None
+        self.n_written = 0
+        self.layer = QgsVectorLayer(f"{out_path}|layername={layer_name}", layer_name, "ogr")
+        if not self.layer.isValid():
+            raise IOError(f"Unable to open network layer: {out_path}|layername={layer_name}")
+        provider = self.layer.dataProvider()
+        # computed columns written since the import are kept - new edges leave them empty
+        self.fields = provider.fields()
+        self.compact = self.fields.field("start_nd").type() != QVariant.String
+        base_names = network_edge_fields(self.compact).names()
+        if self.fields.names()[: len(base_names)] != base_names:
+            raise IOError(f"Not a network layer written by the plugin: {out_path}|layername={layer_name}")
+        self.start_fid = int(provider.maximumValue(0)) + 1 if provider.featureCount() else 0
+
+    def delete(self, fids: list[int]) -> None:
+        """ """
+        if fids and not self.layer.dataProvider().deleteFeatures(fids):
+            raise IOError(f"Unable to delete features from: {self.out_path}")
+
+    def add_chunk(self, chunk: list[QgsFeature]) -> None:
+        """ """
+        for feat in chunk:
+            feat.resizeAttributes(self.fields.count())
+        provider = self.layer.dataProvider()
+        if not provider.addFeatures(chunk):
+            raise IOError(f"Unable to write features to: {self.out_path}: {provider.error().message()}")
+        self.n_written += len(chunk)
+
+    def close(self) -> None:
+        """ """
+        self.layer = None
+
+
+def gpkg_layer_writer(
+    out_path: str,
+    layer_name: str,
+    fields: QgsFields,
+    wkb_type: QgsWkbTypes.Type,
+    crs: QgsCoordinateReferenceSystem,
+    transform_context: QgsCoordinateTransformContext,
+    layer_options: list[str] | None = None,
+) -> QgsVectorFileWriter:
+    """ """
+    # an added (or replaced) layer in an existing GPKG
+    save_options = QgsVectorFileWriter.SaveVectorOptions()
+    save_options.driverName = "GPKG"
+    save_options.fileEncoding = "UTF-8"
+    save_options.layerName = layer_name
+    save_options.actionOnExistingFile = QgsVectorFileWriter.CreateOrOverwriteLayer
+    if layer_options is not None:
+        save_options.layerOptions = layer_options
+    writer = QgsVectorFileWriter.create(out_path, fields, wkb_type, crs, transform_context, save_options)
+    if writer.hasError() != QgsVectorFileWriter.NoError:
+        raise IOError(f"Unable to create output layer: {out_path}: {writer.errorMessage()}")
+    return writer
+
+
+def write_network_nodes(
+    node_keys: np.ndarray,
+    node_xys: np.ndarray,
+    degrees: np.ndarray,
+    out_path: str,
+    layer_name: str,
+    crs: QgsCoordinateReferenceSystem,
+    transform_context: QgsCoordinateTransformContext,
+    chunk_size: int = WRITE_CHUNK_SIZE,
+    compact: bool = False,
+) -> int:
+    """ """
+    # the node layer for the network layer_name, in the same GPKG
+    # ids are array positions, nodes without edges are skipped
+    fields = network_node_fields(compact)
+    # the GPKG default, stated because selections and joins by location depend on it
+    writer = gpkg_layer_writer(
+        out_path,
+        nodes_layer_name(layer_name),
+        fields,
+        QgsWkbTypes.Point,
+        crs,
+        transform_context,
+        layer_options=["SPATIAL_INDEX=YES"],
+    )
+    node_ids = np.flatnonzero(degrees > 0)
+    counter = 0
+    try:
+        for chunk_start in range(0, len(node_ids), chunk_size):
+            chunk_ids = node_ids[chunk_start : chunk_start + chunk_size]
+            point_wkbs = shapely.to_wkb(shapely.points(node_xys[chunk_ids]), output_dimension=2)
+            chunk: list[QgsFeature] = []
+            for node_id, node_key, degree, point_wkb in zip(
+                chunk_ids.tolist(), node_keys[chunk_ids].tolist(), degrees[chunk_ids].tolist(), point_wkbs
+            ):
+                geom = QgsGeometry()
+                geom.fromWkb(point_wkb)
+                feat = QgsFeature(fields)
+                feat.setGeometry(geom)
+                if compact:
+                    feat.setAttributes([node_id, node_id, degree])
+                else:
+                    feat.setAttributes([node_id, node_id, node_key, degree])
+                chunk.append(feat)
+            if not writer.addFeatures(chunk):
+                raise IOError(f"Unable to write features to: {out_path}: {writer.errorMessage()}")
+            counter += len(chunk)
+    finally:
+        writer = None  # important! - flushes and commits
+    if compact:
+        write_node_lookup(node_keys[node_ids], node_ids, out_path, layer_name, transform_context, chunk_size)
+        create_attribute_indexes(out_path, nodes_layer_name(layer_name), ["node_id"])
+    return counter
+
+
+def write_node_lookup(
+    node_keys: np.ndarray,
+    node_ids: np.ndarray,
+    out_path: str,
+    layer_name: str,
+    transform_context: QgsCoordinateTransformContext,
+    chunk_size: int = WRITE_CHUNK_SIZE,
+) -> None:
+    """ """
+    # an attribute only table from node ids to node keys and, where a key is one, the OSM node id
+    lookup_name = node_lookup_name(layer_name)
+    fields = node_lookup_fields()
+    writer = gpkg_layer_writer(
+        out_path, lookup_name, fields, QgsWkbTypes.NoGeometry, QgsCoordinateReferenceSystem(), transform_context
+    )
+    node_key_list = node_keys.tolist()
+    node_id_list = node_ids.tolist()
+    osm_ids = osm_ids_from_keys(node_key_list)
+    try:
+        for chunk_start in range(0, len(node_id_list), chunk_size):
+            chunk: list[QgsFeature] = []
+            for node_id, osm_id, node_key in zip(
+                node_id_list[chunk_start : chunk_start + chunk_size],
+                osm_ids[chunk_start : chunk_start + chunk_size],
+                node_key_list[chunk_start : chunk_start + chunk_size],
+            ):
+                feat = QgsFeature(fields)
+                feat.setAttributes([node_id, osm_id, node_key])
+                chunk.append(feat)
+            if not writer.addFeatures(chunk):
+                raise IOError(f"Unable to write features to: {out_path}: {writer.errorMessage()}")
+    finally:
+        writer = None  # important! - flushes and commits
+    create_attribute_indexes(out_path, lookup_name, ["node_id", "osm_id"])
+
+
+def write_network_edges(
+    nx_multigraph: nx.MultiGraph,
+    out_path: str,
+    layer_name: str,
+    crs: QgsCoordinateReferenceSystem,
+    transform_context: QgsCoordinateTransformContext,
+    feedback: QgsFeedback | None = None,
+    chunk_size: int = WRITE_CHUNK_SIZE,
+    overwrite_file: bool = True,
+    arrays_writer: graph_store.GraphArraysWriter | None = None,
+    release: bool = False,
+    compact: bool = False,
+) -> int:
+    """ """
+    writer = NetworkEdgeWriter(
+        out_path,
+        layer_name,
+        crs,
+        transform_context,
+        chunk_size=chunk_size,
+        overwrite_file=overwrite_file,
+        compact=compact,
+    )
+    try:
+        n_written = writer.write_graph(nx_multigraph, feedback, arrays_writer=arrays_writer, release=release)
+    finally:
+        writer.close()
+    if compact:
+        create_attribute_indexes(out_path, layer_name, ["start_nd", "end_nd"])
+    return n_written
@@ -0,0 +1,8 @@
+""" """
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+# the plugin directory is not a valid package name - modules are imported as cityseer-qgis.<module> from the repo root
+sys.path.insert(0, str(Path(__file__).parent.parent))
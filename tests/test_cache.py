@@ -0,0 +1,98 @@
+""" """
+from __future__ import annotations
+
+import importlib
+import os
+from pathlib import Path
+
+import networkx as nx
+import numpy as np
+from shapely import geometry
+
+cache = importlib.import_module("cityseer-qgis.cache")
+
+
+def small_graph(n_nodes: int) -> nx.MultiGraph:
+    nx_multigraph = nx.MultiGraph()
+    for nd_idx in range(n_nodes):
+        nx_multigraph.add_node(nd_idx, x=float(nd_idx), y=0.0)
+    nx_multigraph.add_edges_from(zip(range(n_nodes - 1), range(1, n_nodes)))
+    return nx_multigraph
+
+
+def test_graph_cache_keys():
+    poly = geometry.box(0, 0, 100, 100)
+    key = cache.GraphCache.make_key(poly, 27700, True)
+    assert key == cache.GraphCache.make_key(geometry.box(0, 0, 100, 100), 27700, True)
+    assert key != cache.GraphCache.make_key(poly, 27700, False)
+    assert key != cache.GraphCache.make_key(poly, 27700, None)
+    assert key != cache.GraphCache.make_key(poly, 3857, True)
+    assert key != cache.GraphCache.make_key(poly, 27700, True, "extract.osm.pbf")
+    assert key != cache.GraphCache.make_key(geometry.box(0, 0, 100, 101), 27700, True)
+
+
+def test_graph_cache_round_trip(tmp_path: Path):
+    graph_cache = cache.GraphCache(tmp_path)
+    assert graph_cache.get("missing") is None
+    graph_cache.put("key", small_graph(5))
+    cached = graph_cache.get("key")
+    assert cached.number_of_nodes() == 5
+    assert cached.number_of_edges() == 4
+    graph_cache.clear()
+    assert graph_cache.get("key") is None
+
+
+def test_graph_cache_drops_corrupt_entries(tmp_path: Path):
+    graph_cache = cache.GraphCache(tmp_path)
+    graph_cache.entry_path("key").write_bytes(b"not a pickle")
+    assert graph_cache.get("key") is None
+    assert not graph_cache.entry_path("key").exists()
+
+
+def test_graph_cache_evicts_least_recently_used(tmp_path: Path):
+    graph_cache = cache.GraphCache(tmp_path)
+    for key in ("a", "b", "c"):
+        graph_cache.put(key, small_graph(50))
+    for mtime, key in enumerate(("b", "c", "a")):
+        os.utime(graph_cache.entry_path(key), (mtime, mtime))
+    # reads refresh an entry - b becomes the most recently used
+    graph_cache.get("b")
+    entry_bytes = graph_cache.entry_path("a").stat().st_size
+    graph_cache.max_bytes = 2 * entry_bytes
+    graph_cache.evict()
+    assert not graph_cache.entry_path("c").exists()
+    assert graph_cache.entry_path("a").exists()
+    assert graph_cache.entry_path("b").exists()
+
+
+def test_assignment_cache_lru():
+    assignment_cache = cache.AssignmentCache(max_entries=2)
+    assignment = (np.arange(3), np.arange(3), np.arange(3))
+    keys = [cache.AssignmentCache.make_key("netw", 10, f"data_{idx}", 5, 400) for idx in range(3)]
+    assignment_cache.put(keys[0], assignment)
+    assignment_cache.put(keys[1], assignment)
+    assert assignment_cache.get(keys[0]) is assignment
+    assignment_cache.put(keys[2], assignment)
+    assert assignment_cache.get(keys[1]) is None
+    assert assignment_cache.get(keys[0]) is assignment
+    assignment_cache.invalidate_layer("netw")
+    assert not assignment_cache.entries
+
+
+def test_network_cache_supersedes_stale_signatures():
+    network_cache = cache.NetworkCache(max_entries=2)
+    stale_key = cache.NetworkCache.make_key("netw", ("source", 10))
+    fresh_key = cache.NetworkCache.make_key("netw", ("source", 11))
+    other_key = cache.NetworkCache.make_key("other", ("source", 3))
+    network_cache.put(stale_key, "stale")
+    network_cache.put(other_key, "other")
+    network_cache.put(fresh_key, "fresh")
+    assert network_cache.get(stale_key) is None
+    assert network_cache.get(other_key) == "other"
+    assert network_cache.get(fresh_key) == "fresh"
+    # other was read before fresh, so it is the least recently used
+    network_cache.put(cache.NetworkCache.make_key("third", ()), "third")
+    assert network_cache.get(other_key) is None
+    assert network_cache.get(fresh_key) == "fresh"
+    network_cache.invalidate_layer("netw")
+    assert list(network_cache.entries) == [cache.NetworkCache.make_key("third", ())]
@@ -0,0 +1,130 @@
+""" """
+from __future__ import annotations
+
+import importlib
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+import pytest
+from qgis.core import NULL, QgsFeedback, QgsField
+from qgis.PyQt.QtCore import QVariant
+
+layer_io = importlib.import_module("cityseer-qgis.layer_io")
+
+
+@pytest.fixture
+def gpkg_path(tmp_path: Path) -> str:
+    # a plain SQLite table is enough - updates go through SQLite rather than GDAL
+    path = str(tmp_path / "network.gpkg")
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute('CREATE TABLE "edges" (fid INTEGER PRIMARY KEY, "cc_a" REAL, "cc_b" REAL, name TEXT)')
+        connection.executemany(
+            'INSERT INTO "edges" VALUES (?, ?, ?, ?)', [(fid, 0.0, 0.0, f"edge {fid}") for fid in range(1, 6)]
+        )
+    connection.close()
+    return path
+
+
+def read_rows(path: str, table_name: str = "edges") -> list[tuple]:
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute(f'SELECT fid, "cc_a", "cc_b", name FROM "{table_name}" ORDER BY fid').fetchall()
+    finally:
+        connection.close()
+
+
+def test_update_gpkg_columns(gpkg_path: str):
+    fids = np.array([4, 2])
+    columns = {"cc_a": np.array([1.5, 2.5], dtype=np.float32), "cc_b": np.array([np.nan, 7.0])}
+    assert layer_io.update_gpkg_columns(gpkg_path, "edges", fids, columns)
+    rows = read_rows(gpkg_path)
+    assert rows[1] == (2, 2.5, 7.0, "edge 2")
+    # NaN is written as NULL
+    assert rows[3] == (4, 1.5, None, "edge 4")
+    assert [row[1:3] for row in rows if row[0] not in (2, 4)] == [(0.0, 0.0)] * 3
+
+
+def test_update_gpkg_columns_rejects_unknown_columns(gpkg_path: str):
+    columns = {"cc_a": np.array([1.0]), "missing": np.array([1.0])}
+    assert not layer_io.update_gpkg_columns(gpkg_path, "edges", np.array([1]), columns)
+    assert read_rows(gpkg_path)[0] == (1, 0.0, 0.0, "edge 1")
+
+
+def test_update_gpkg_columns_requires_single_primary_key(gpkg_path: str):
+    connection = sqlite3.connect(gpkg_path)
+    with connection:
+        connection.execute('CREATE TABLE "no_pk" (fid INTEGER, "cc_a" REAL, "cc_b" REAL, name TEXT)')
+    connection.close()
+    assert not layer_io.update_gpkg_columns(gpkg_path, "no_pk", np.array([1]), {"cc_a": np.array([1.0])})
+
+
+def test_update_gpkg_columns_falls_back_when_locked(gpkg_path: str, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(layer_io, "SQLITE_TIMEOUT", 0.1)
+    # another connection holding a write transaction, as QGIS does while a layer is being edited
+    connection = sqlite3.connect(gpkg_path, isolation_level=None)
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        assert not layer_io.update_gpkg_columns(gpkg_path, "edges", np.array([1]), {"cc_a": np.array([9.0])})
+    finally:
+        connection.execute("ROLLBACK")
+        connection.close()
+    assert read_rows(gpkg_path)[0] == (1, 0.0, 0.0, "edge 1")
+
+
+NULL_ROWS = [(4.5, 2, "High Street"), (None, 1, None), (6.0, 3, "Mill Lane")]
+
+
+@pytest.fixture
+def ogr_gpkg_path(tmp_path: Path) -> str:
+    ogr = pytest.importorskip("osgeo.ogr")
+    path = str(tmp_path / "nulls.gpkg")
+    data_source = ogr.GetDriverByName("GPKG").CreateDataSource(path)
+    ogr_layer = data_source.CreateLayer("edges", geom_type=ogr.wkbLineString)
+    ogr_layer.CreateField(ogr.FieldDefn("width", ogr.OFTReal))
+    ogr_layer.CreateField(ogr.FieldDefn("lanes", ogr.OFTInteger))
+    ogr_layer.CreateField(ogr.FieldDefn("name", ogr.OFTString))
+    for idx, (width, lanes, name) in enumerate(NULL_ROWS):
+        feature = ogr.Feature(ogr_layer.GetLayerDefn())
+        feature.SetGeometry(ogr.CreateGeometryFromWkt(f"LINESTRING ({idx} 0, {idx} 10)"))
+        for field_name, value in (("width", width), ("lanes", lanes), ("name", name)):
+            if value is None:
+                feature.SetFieldNull(field_name)
+            else:
+                feature.SetField(field_name, value)
+        ogr_layer.CreateFeature(feature)
+    data_source = None
+    return path
+
+
+def null_values(field_values: np.ndarray) -> list:
+    # NaN and None both read as None so that numeric and object columns compare alike
+    return [None if value is None or value != value else value for value in field_values.tolist()]
+
+
+def test_read_ogr_arrays_converts_nulls_as_field_array(ogr_gpkg_path: str):
+    arrays = layer_io.read_ogr_arrays(ogr_gpkg_path, "edges", ["width", "lanes", "name"])
+    if arrays is None:
+        pytest.skip("GDAL without arrow stream reads")
+    _, _, values = arrays
+    # the per feature fallback receives QVariant NULLs
+    fields = {"width": QgsField("width", QVariant.Double), "name": QgsField("name", QVariant.String)}
+    for field_idx, field_name in ((0, "width"), (2, "name")):
+        field_values = [NULL if row[field_idx] is None else row[field_idx] for row in NULL_ROWS]
+        expected = layer_io.field_array(field_values, fields[field_name])
+        assert values[field_name].dtype == expected.dtype
+        assert null_values(values[field_name]) == null_values(expected)
+    assert null_values(values["width"]) == [4.5, None, 6.0]
+    assert null_values(values["name"]) == ["High Street", None, "Mill Lane"]
+    assert values["lanes"].dtype == np.int64
+    assert values["lanes"].tolist() == [2, 1, 3]
+
+
+def test_read_ogr_arrays_stops_when_canceled(ogr_gpkg_path: str):
+    feedback = QgsFeedback()
+    feedback.cancel()
+    arrays = layer_io.read_ogr_arrays(ogr_gpkg_path, "edges", ["width"], feedback)
+    if arrays is None:
+        pytest.skip("GDAL without arrow stream reads")
+    assert len(arrays[0]) == 0
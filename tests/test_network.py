@@ -0,0 +1,141 @@
+""" """
+from __future__ import annotations
+
+import importlib
+
+import networkx as nx
+import numpy as np
+import pytest
+import shapely
+from cityseer.tools import graphs, mock
+from shapely import geometry
+
+network = importlib.import_module("cityseer-qgis.network")
+
+
+@pytest.fixture
+def primal_graph() -> nx.MultiGraph:
+    return graphs.nx_simple_geoms(mock.mock_graph())
+
+
+def node_xys(nx_multigraph: nx.MultiGraph) -> np.ndarray:
+    xys = np.array([(data["x"], data["y"]) for _, data in nx_multigraph.nodes(data=True)])
+    return xys[np.lexsort((xys[:, 1], xys[:, 0]))]
+
+
+@pytest.mark.parametrize("decompose_max", [20, 50, 100])
+def test_nx_decompose(primal_graph: nx.MultiGraph, decompose_max: int):
+    decomposed = network.nx_decompose(primal_graph, decompose_max)
+    expected = graphs.nx_decompose(primal_graph, decompose_max)
+    assert decomposed.number_of_nodes() == expected.number_of_nodes()
+    assert decomposed.number_of_edges() == expected.number_of_edges()
+    assert np.allclose(node_xys(decomposed), node_xys(expected))
+    lengths = sorted(data["geom"].length for _, _, data in decomposed.edges(data=True))
+    expected_lengths = sorted(data["geom"].length for _, _, data in expected.edges(data=True))
+    assert np.allclose(lengths, expected_lengths)
+    assert max(lengths) <= decompose_max + 1e-6
+    # each part runs from its start node to its end node
+    for start_nd, end_nd, data in decomposed.edges(data=True):
+        start_xy = (decomposed.nodes[start_nd]["x"], decomposed.nodes[start_nd]["y"])
+        end_xy = (decomposed.nodes[end_nd]["x"], decomposed.nodes[end_nd]["y"])
+        coords = list(data["geom"].coords)
+        assert {tuple(np.round(coords[0], 6)), tuple(np.round(coords[-1], 6))} == {
+            tuple(np.round(start_xy, 6)),
+            tuple(np.round(end_xy, 6)),
+        }
+
+
+def test_nx_decompose_keeps_short_edges(primal_graph: nx.MultiGraph):
+    decompose_max = max(data["geom"].length for _, _, data in primal_graph.edges(data=True)) + 1
+    decomposed = network.nx_decompose(primal_graph, decompose_max)
+    assert decomposed.number_of_nodes() == primal_graph.number_of_nodes()
+    assert decomposed.number_of_edges() == primal_graph.number_of_edges()
+
+
+def test_snap_points():
+    points = np.array(
+        [
+            [0.0, 0.0],
+            [0.2, 0.1],
+            # across a cell boundary from the first two
+            [0.55, 0.0],
+            [10.0, 10.0],
+            [10.3, 10.1],
+            [20.0, 0.0],
+        ]
+    )
+    node_xys, point_nodes = network.snap_points(points, 0.5)
+    assert len(node_xys) == 3
+    assert point_nodes[0] == point_nodes[1] == point_nodes[2]
+    assert point_nodes[3] == point_nodes[4]
+    assert len({point_nodes[0], point_nodes[3], point_nodes[5]}) == 3
+    # nodes sit at the mean of their points
+    assert np.allclose(node_xys[point_nodes[3]], [10.15, 10.05])
+    assert np.allclose(node_xys[point_nodes[5]], [20.0, 0.0])
+
+
+def test_snap_points_keeps_distinct_points():
+    points = np.array([[0.0, 0.0], [2.0, 0.0], [0.0, 2.0], [-2.0, -2.0]])
+    node_xys, point_nodes = network.snap_points(points, 0.5)
+    assert np.array_equal(np.sort(point_nodes), np.arange(4))
+    assert np.allclose(node_xys[point_nodes], points)
+
+
+def test_merge_filler_edges():
+    # a chain of three edges through two degree two nodes, ending at a junction with two dead ends
+    node_xys = np.array([[0.0, 0.0], [10.0, 0.0], [20.0, 0.0], [30.0, 0.0], [40.0, 10.0], [40.0, -10.0]])
+    start_nds = np.array([0, 2, 2, 3, 3])
+    end_nds = np.array([1, 1, 3, 4, 5])
+    geoms = shapely.linestrings([node_xys[[start_nd, end_nd]] for start_nd, end_nd in zip(start_nds, end_nds)])
+    merged_geoms, merged_starts, merged_ends = network.merge_filler_edges(geoms, start_nds, end_nds, node_xys)
+    assert len(merged_geoms) == 3
+    pairs = {tuple(sorted(pair)) for pair in zip(merged_starts.tolist(), merged_ends.tolist())}
+    assert pairs == {(0, 3), (3, 4), (3, 5)}
+    chain_idx = [idx for idx, pair in enumerate(zip(merged_starts, merged_ends)) if set(pair) == {0, 3}][0]
+    chain_geom = merged_geoms[chain_idx]
+    assert chain_geom.length == pytest.approx(30)
+    # geoms are oriented from their start node to their end node
+    assert np.allclose(chain_geom.coords[0], node_xys[merged_starts[chain_idx]])
+    assert np.allclose(chain_geom.coords[-1], node_xys[merged_ends[chain_idx]])
+
+
+def test_merge_filler_edges_without_fillers():
+    node_xys = np.array([[0.0, 0.0], [10.0, 0.0], [0.0, 10.0], [-10.0, 0.0]])
+    start_nds = np.array([0, 0, 0])
+    end_nds = np.array([1, 2, 3])
+    geoms = shapely.linestrings([node_xys[[start_nd, end_nd]] for start_nd, end_nd in zip(start_nds, end_nds)])
+    merged_geoms, merged_starts, merged_ends = network.merge_filler_edges(geoms, start_nds, end_nds, node_xys)
+    assert merged_geoms is geoms
+    assert np.array_equal(merged_starts, start_nds)
+    assert np.array_equal(merged_ends, end_nds)
+
+
+def test_line_network_arrays():
+    geoms = np.array(
+        [
+            geometry.LineString([(0, 0), (50, 0)]),
+            # starts within the snapping tolerance of the first line's end
+            geometry.LineString([(50.2, 0), (100, 0)]),
+            geometry.LineString([(100, 0), (100, 50)]),
+            geometry.LineString([(100, 0), (150, 0)]),
+            # a short dead end
+            geometry.LineString([(150, 0), (150, 5)]),
+            geometry.LineString([(150, 0), (200, 0)]),
+            geometry.MultiLineString([[(150, 0), (150, -50)]]),
+        ],
+        dtype=object,
+    )
+    edge_geoms, start_nds, end_nds, node_coords = network.line_network_arrays(geoms, snap_tolerance=0.5, despine=10)
+    lengths = sorted(np.round(shapely.length(edge_geoms), 1).tolist())
+    # the snapped lines merge through their degree two node, the spur is removed
+    assert lengths == [50.0, 50.0, 50.0, 50.0, 100.0]
+    assert len(node_coords) == 6
+    for edge_geom, start_nd, end_nd in zip(edge_geoms, start_nds, end_nds):
+        assert np.allclose(edge_geom.coords[0], node_coords[start_nd])
+        assert np.allclose(edge_geom.coords[-1], node_coords[end_nd])
+
+
+def test_parallel_edge_keys():
+    start_nds = np.array([0, 1, 0, 2, 3, 2])
+    end_nds = np.array([1, 0, 1, 3, 2, 4])
+    assert network.parallel_edge_keys(start_nds, end_nds).tolist() == [0, 1, 2, 0, 1, 0]
@@ -0,0 +1,100 @@
+""" """
+from __future__ import annotations
+
+import importlib
+import json
+from pathlib import Path
+
+import networkx as nx
+from cityseer.tools import graphs
+from pyproj import Transformer
+from shapely import geometry
+
+osm_file = importlib.import_module("cityseer-qgis.osm_file")
+
+CRS_CODE = 32630
+# a small block of streets - the motorway is dropped by the way filters
+WAYS = [
+    (1, [1, 2, 3], {"highway": "residential", "name": "Mill Lane"}),
+    (2, [3, 4, 5], {"highway": "primary", "name": "High Street", "ref": "A40"}),
+    (3, [2, 6, 4], {"highway": "footway"}),
+    (4, [5, 7], {"highway": "motorway", "name": "Ring Road"}),
+    (5, [1, 6, 7], {"highway": "service", "name": "Mill Lane", "surface": "gravel"}),
+]
+NODES = {
+    1: (-0.1000, 51.5000),
+    2: (-0.0990, 51.5000),
+    3: (-0.0980, 51.5000),
+    4: (-0.0980, 51.5010),
+    5: (-0.0980, 51.5020),
+    6: (-0.0990, 51.5010),
+    7: (-0.1000, 51.5020),
+}
+
+
+def extents_poly() -> geometry.Polygon:
+    transformer = Transformer.from_crs(4326, CRS_CODE, always_xy=True)
+    min_x, min_y = transformer.transform(-0.1005, 51.4995)
+    max_x, max_y = transformer.transform(-0.0975, 51.5025)
+    return geometry.box(min_x, min_y, max_x, max_y)
+
+
+def overpass_json() -> str:
+    # the same ways as an overpass response, which only returns ways passing the filters
+    elements = [
+        {"type": "way", "id": way_id, "nodes": node_refs, "tags": tags}
+        for way_id, node_refs, tags in WAYS
+        if osm_file.way_matches(tags)
+    ]
+    elements += [{"type": "node", "id": node_id, "lat": lat, "lon": lng} for node_id, (lng, lat) in NODES.items()]
+    return json.dumps({"elements": elements})
+
+
+def osm_xml() -> str:
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<osm version="0.6">']
+    for node_id, (lng, lat) in NODES.items():
+        lines.append(f'<node id="{node_id}" lat="{lat}" lon="{lng}"/>')
+    for way_id, node_refs, tags in WAYS:
+        lines.append(f'<way id="{way_id}">')
+        lines += [f'<nd ref="{node_ref}"/>' for node_ref in node_refs]
+        lines += [f'<tag k="{key}" v="{val}"/>' for key, val in tags.items()]
+        lines.append("</way>")
+    lines.append("</osm>")
+    return "\n".join(lines)
+
+
+def edge_summary(nx_multigraph: nx.MultiGraph) -> list[tuple]:
+    return sorted(
+        (
+            tuple(sorted((str(start_nd), str(end_nd)))),
+            tuple(sorted(data["names"], key=str)),
+            tuple(sorted(data["routes"], key=str)),
+            tuple(sorted(data["highways"], key=str)),
+        )
+        for start_nd, end_nd, data in nx_multigraph.edges(data=True)
+    )
+
+
+def test_osm_json_matches_overpass():
+    collector = osm_file.OsmExtractCollector((-0.11, 51.49, -0.09, 51.51))
+    for node_id, (lng, lat) in NODES.items():
+        collector.add_node(node_id, lng, lat)
+    for way_id, node_refs, tags in WAYS:
+        collector.add_way(way_id, node_refs, tags)
+    from_extract = graphs.nx_from_osm(collector.osm_json(extents_poly(), CRS_CODE))
+    from_overpass = graphs.nx_from_osm(overpass_json())
+    assert sorted(from_extract.nodes) == sorted(from_overpass.nodes)
+    assert edge_summary(from_extract) == edge_summary(from_overpass)
+    assert {"Mill Lane", "High Street"} <= {
+        name for _, _, data in from_extract.edges(data=True) for name in data["names"]
+    }
+    routes = {route for _, _, data in from_extract.edges(data=True) for route in data["routes"]}
+    assert routes - {None} == {"A40"}
+
+
+def test_osm_json_from_file_keeps_tags(tmp_path: Path):
+    file_path = tmp_path / "extract.osm"
+    file_path.write_text(osm_xml())
+    from_file = graphs.nx_from_osm(osm_file.osm_json_from_file(file_path, extents_poly(), CRS_CODE))
+    from_overpass = graphs.nx_from_osm(overpass_json())
+    assert edge_summary(from_file) == edge_summary(from_overpass)
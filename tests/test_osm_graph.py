@@ -0,0 +1,59 @@
+""" """
+from __future__ import annotations
+
+import importlib
+
+import networkx as nx
+import numpy as np
+import pytest
+from cityseer.tools import graphs
+from shapely import geometry
+
+osm_graph = importlib.import_module("cityseer-qgis.osm_graph")
+
+
+@pytest.fixture
+def wgs_graph() -> nx.MultiGraph:
+    nx_multigraph = nx.MultiGraph()
+    nx_multigraph.add_node("a", x=-0.13, y=51.5)
+    nx_multigraph.add_node("b", x=-0.129, y=51.5)
+    nx_multigraph.add_node("c", x=-0.129, y=51.501)
+    nx_multigraph.add_edge("a", "b")
+    nx_multigraph.add_edge("b", "c")
+    return graphs.nx_simple_geoms(nx_multigraph)
+
+
+def test_nx_crs_conversion_matches_cityseer(wgs_graph: nx.MultiGraph):
+    expected = graphs.nx_epsg_conversion(wgs_graph, 4326, 27700)
+    converted = osm_graph.nx_crs_conversion(wgs_graph.copy(), 4326, 27700)
+    for nd_key, nd_data in expected.nodes(data=True):
+        assert converted.nodes[nd_key]["x"] == pytest.approx(nd_data["x"])
+        assert converted.nodes[nd_key]["y"] == pytest.approx(nd_data["y"])
+    for start_nd, end_nd, edge_data in expected.edges(data=True):
+        assert np.allclose(converted[start_nd][end_nd][0]["geom"].coords, edge_data["geom"].coords)
+
+
+def test_nx_crs_conversion_accepts_non_epsg_crs(wgs_graph: nx.MultiGraph):
+    converted = osm_graph.nx_crs_conversion(wgs_graph, 4326, "ESRI:102100")
+    # web mercator eastings are negative west of Greenwich
+    assert converted.nodes["a"]["x"] < 0
+    assert converted.nodes["a"]["y"] > 6e6
+    assert np.allclose(converted["a"]["b"][0]["geom"].coords[0], (converted.nodes["a"]["x"], converted.nodes["a"]["y"]))
+
+
+def test_nx_crs_conversion_rejects_geographic_crs(wgs_graph: nx.MultiGraph):
+    with pytest.raises(ValueError):
+        osm_graph.nx_crs_conversion(wgs_graph, 4326, 4326)
+
+
+def test_osm_request_from_poly():
+    extents_poly = geometry.MultiPolygon(
+        [geometry.box(529000, 179000, 530000, 180000), geometry.box(532000, 179000, 533000, 180000)]
+    )
+    osm_request = osm_graph.osm_request_from_poly(extents_poly, 27700)
+    # one filter per polygon part, each with the exclusions of cityseer's default request
+    assert osm_request.count("(poly:") == 2
+    assert osm_request.count('["highway"!~"motorway|motorway_link|bus_guideway|escape|raceway"]') == 2
+    lat, lng = [float(coord) for coord in osm_request.split('(poly:"')[1].split()[:2]]
+    assert lat == pytest.approx(51.5, abs=0.01)
+    assert lng == pytest.approx(-0.13, abs=0.02)
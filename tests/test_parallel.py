@@ -0,0 +1,88 @@
+""" """
+from __future__ import annotations
+
+import importlib
+import re
+
+import numpy as np
+import pytest
+from cityseer.algos import centrality
+from cityseer.metrics import networks
+from cityseer.tools import graphs, mock
+from qgis.core import QgsFeedback
+
+parallel = importlib.import_module("cityseer-qgis.parallel")
+
+MEASURES = ["node_density", "node_farness", "node_harmonic", "node_beta", "node_betweenness", "node_betweenness_beta"]
+
+
+@pytest.fixture(scope="module")
+def network_structure():
+    _, network_structure = graphs.network_structure_from_nx(graphs.nx_simple_geoms(mock.mock_graph()), crs=27700)
+    return network_structure
+
+
+@pytest.mark.parametrize("angular, n_workers", [(False, 1), (False, 3), (True, 2)])
+def test_node_centrality_matches_in_process(network_structure, angular: bool, n_workers: int):
+    distances, betas = networks.pair_distances_betas([200, 800])
+    measures = ["node_harmonic_angular", "node_betweenness_angular"] if angular else MEASURES
+    expected = centrality.local_node_centrality(
+        distances,
+        betas,
+        tuple(measures),
+        network_structure.nodes.live,
+        network_structure.edges.start,
+        network_structure.edges.end,
+        network_structure.edges.length,
+        network_structure.edges.angle_sum,
+        network_structure.edges.imp_factor,
+        network_structure.edges.in_bearing,
+        network_structure.edges.out_bearing,
+        network_structure.node_edge_map,
+        angular=angular,
+    )
+    # each worker takes an interleaved share of the sources - the summed results match a single traversal
+    measures_data = parallel.node_centrality(
+        network_structure, measures, distances, betas, angular, n_workers=n_workers, feedback=QgsFeedback()
+    )
+    assert measures_data.shape == expected.shape
+    assert np.allclose(measures_data, expected, rtol=1e-5, atol=1e-3)
+
+
+def test_node_centrality_cancelled(network_structure):
+    distances, betas = networks.pair_distances_betas([200])
+    feedback = QgsFeedback()
+    feedback.cancel()
+    assert parallel.node_centrality(network_structure, MEASURES, distances, betas, False, 2, feedback) is None
+
+
+@pytest.mark.parametrize(
+    "measures, angular",
+    [
+        (["node_harmonic", "node_harmonic"], False),
+        (["node_harmonic"], True),
+        (["node_typo"], False),
+        ([], False),
+    ],
+)
+def test_compute_centrality_validates_before_spawning(
+    monkeypatch: pytest.MonkeyPatch, measures: list[str], angular: bool
+):
+    network = importlib.import_module("cityseer-qgis.network")
+    layer_network = network.LayerNetwork()
+    layer_network.nx_multigraph = graphs.nx_simple_geoms(mock.mock_graph())
+    monkeypatch.setattr(parallel, "PARALLEL_MIN_NODES", 0)
+    spawned = []
+    monkeypatch.setattr(parallel, "node_centrality", lambda *args, **kwargs: spawned.append(args))
+    # the parallel path raises the same errors as cityseer's single process path
+    with pytest.raises(ValueError) as expected:
+        networks.node_centrality(
+            measures=measures,
+            network_structure=layer_network.structure(27700)[1],
+            nodes_gdf=layer_network.structure(27700)[0],
+            distances=[400],
+            angular=angular,
+        )
+    with pytest.raises(ValueError, match=re.escape(str(expected.value))):
+        network.compute_centrality(layer_network, 27700, measures, [400], angular=angular, workers=2)
+    assert not spawned
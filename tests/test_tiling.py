@@ -0,0 +1,78 @@
+""" """
+from __future__ import annotations
+
+import importlib
+
+import networkx as nx
+import numpy as np
+import shapely
+from shapely import geometry
+
+tiling = importlib.import_module("cityseer-qgis.tiling")
+
+
+def tile_graph(nodes: dict[str, tuple[float, float]], edges: list[tuple[str, str]]) -> nx.MultiGraph:
+    nx_multigraph = nx.MultiGraph()
+    for nd_key, (x, y) in nodes.items():
+        nx_multigraph.add_node(nd_key, x=x, y=y)
+    for start_nd, end_nd in edges:
+        start_xy = nodes[start_nd]
+        end_xy = nodes[end_nd]
+        nx_multigraph.add_edge(start_nd, end_nd, geom=geometry.LineString([start_xy, end_xy]))
+    return nx_multigraph
+
+
+def test_stitch_snaps_boundary_nodes():
+    stitcher = tiling.TileStitcher(snap_dist=1.0)
+    first = stitcher.stitch(tile_graph({"a": (0, 0), "b": (100, 0)}, [("a", "b")]), 0)
+    assert set(first.nodes()) == {"0_a", "0_b"}
+    # the boundary node is fetched again by the neighbouring tile, slightly displaced
+    second = stitcher.stitch(tile_graph({"b": (100.4, 0.3), "c": (200, 0)}, [("b", "c")]), 1)
+    assert set(second.nodes()) == {"0_b", "1_c"}
+    assert list(second.edges()) == [("0_b", "1_c")]
+    # beyond the snapping distance nodes stay separate
+    third = stitcher.stitch(tile_graph({"d": (201.5, 0), "e": (300, 0)}, [("d", "e")]), 2)
+    assert set(third.nodes()) == {"2_d", "2_e"}
+
+
+def test_stitch_numbers_parallel_edges_across_tiles():
+    stitcher = tiling.TileStitcher(snap_dist=1.0)
+    first = stitcher.stitch(tile_graph({"a": (0, 0), "b": (100, 0)}, [("a", "b"), ("a", "b")]), 0)
+    assert sorted(first.edges(keys=True)) == [("0_a", "0_b", 0), ("0_a", "0_b", 1)]
+    # the same pair seen from the other direction continues the numbering
+    second = stitcher.stitch(tile_graph({"b": (100, 0), "a": (0.2, 0)}, [("b", "a")]), 1)
+    edge_keys = [edge_key for _, _, edge_key in second.edges(keys=True)]
+    assert edge_keys == [2]
+
+
+def test_seed_continues_from_existing_network():
+    stitcher = tiling.TileStitcher(snap_dist=1.0)
+    node_keys = np.array(["x", "y", "unused"], dtype=object)
+    node_xys = np.array([[0.0, 0.0], [100.0, 0.0], [500.0, 500.0]])
+    stitcher.seed(node_keys, node_xys, np.array([[0, 1], [1, 0]]), np.array([0, 1]))
+    stitched = stitcher.stitch(tile_graph({"a": (0.5, 0), "b": (100, 0.5), "c": (500, 500)}, [("a", "b")]), 3)
+    # only nodes of kept edges are seeded
+    assert set(stitched.nodes()) == {"x", "y", "3_c"}
+    assert [edge_key for _, _, edge_key in stitched.edges(keys=True)] == [2]
+
+
+def test_extents_tiles_cover_extents():
+    extents_poly = geometry.box(0, 0, 2500, 1200)
+    tiles = tiling.extents_tiles(extents_poly, 1000)
+    assert len(tiles) == 6
+    assert shapely.union_all([core for core, _ in tiles]).covers(extents_poly)
+    for core, fetch_poly in tiles:
+        assert fetch_poly.covers(core.intersection(extents_poly))
+        assert extents_poly.covers(fetch_poly)
+
+
+def test_clip_to_core_claims_each_edge_once():
+    nodes = {"a": (900, 500), "b": (1100, 500), "c": (1000, 400), "d": (1000, 600), "e": (1800, 500)}
+    edges = [("a", "b"), ("c", "d"), ("b", "e")]
+    claimed = []
+    for core in (geometry.box(0, 0, 1000, 1000), geometry.box(1000, 0, 2000, 1000)):
+        clipped = tiling.nx_clip_to_core(tile_graph(nodes, edges), core)
+        claimed += [tuple(sorted(edge)) for edge in clipped.edges()]
+        # nodes without a claimed edge are dropped
+        assert not list(nx.isolates(clipped))
+    assert sorted(claimed) == [("a", "b"), ("b", "e"), ("c", "d")]